@@ -1,10 +1,10 @@
 """
 对话API路由
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
-from ...core.database import get_db
+from ...core.database import SessionLocal, get_db
 from ...schemas.conversation import (
     StartConversationRequest,
     ContinueConversationRequest,
@@ -12,21 +12,33 @@ from ...schemas.conversation import (
     ConversationHistoryResponse,
     ConversationListResponse,
     MessageResponse,
-    ConversationListItem
+    ConversationListItem,
+    JobStatusResponse
 )
 from ...services.conversation_service import ConversationService
+from ...services.llm_service import LLMService
+from ...services.rag_service import RAGService
+from ...services.registry import get_llm_service, get_rag_service, service_registry
+from .sse import open_event_stream
 
 router = APIRouter(prefix="", tags=["conversations"])
 
 
+def get_conversation_service(
+    db: Session = Depends(get_db),
+    llm_service: LLMService = Depends(get_llm_service),
+    rag_service: RAGService = Depends(get_rag_service)
+) -> ConversationService:
+    """构造使用共享服务实例的ConversationService"""
+    return ConversationService(db, llm_service=llm_service, rag_service=rag_service)
+
+
 @router.post("/start", response_model=ConversationResponse)
 async def start_conversation(
     request: StartConversationRequest,
-    db: Session = Depends(get_db)
+    service: ConversationService = Depends(get_conversation_service)
 ):
     """开始新对话"""
-    service = ConversationService(db)
-    
     try:
         result = await service.start_conversation(
             request.student_id,
@@ -43,11 +55,9 @@ async def start_conversation(
 async def continue_conversation(
     conversation_id: str,
     request: ContinueConversationRequest,
-    db: Session = Depends(get_db)
+    service: ConversationService = Depends(get_conversation_service)
 ):
     """继续对话"""
-    service = ConversationService(db)
-    
     try:
         result = await service.continue_conversation(
             conversation_id,
@@ -60,14 +70,72 @@ async def continue_conversation(
         raise HTTPException(status_code=500, detail=f"对话继续失败: {str(e)}")
 
 
+@router.post("/{conversation_id}/continue/stream")
+async def continue_conversation_stream(
+    conversation_id: str,
+    request: ContinueConversationRequest,
+    llm_service: LLMService = Depends(get_llm_service),
+    rag_service: RAGService = Depends(get_rag_service)
+):
+    """流式继续对话（SSE）：逐段推送生成的文本，生成完成后保存完整响应"""
+    # 依赖注入的数据库会话在响应推送前就会关闭，流式接口自行管理会话
+    db = SessionLocal()
+    service = ConversationService(db, llm_service=llm_service, rag_service=rag_service)
+    try:
+        return await open_event_stream(
+            service.stream_continue_conversation(conversation_id, request.message),
+            on_close=db.close
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"对话继续失败: {str(e)}")
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job_status(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=30, description="任务未结束时最多等待的秒数（长轮询）")
+):
+    """查询后台任务（如学习计划生成）的状态"""
+    job_runner = service_registry.get_job_runner()
+    job = await job_runner.wait(job_id, wait) if wait else job_runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return JobStatusResponse(**job)
+
+
+@router.get("/jobs/{job_id}/events")
+async def subscribe_job(job_id: str):
+    """订阅后台任务（SSE）：先推送当前状态，任务结束时推送done事件"""
+    job_runner = service_registry.get_job_runner()
+    
+    async def events():
+        job = job_runner.get(job_id)
+        if job is None:
+            raise ValueError(f"Job {job_id} not found")
+        while True:
+            finished = job["finished_at"] is not None
+            yield {"event": "done" if finished else "status", "data": JobStatusResponse(**job).model_dump()}
+            if finished:
+                return
+            # 每隔一段时间推送一次状态，避免代理因连接空闲而断开
+            job = await job_runner.wait(job_id, 15)
+            if job is None:
+                return
+    
+    try:
+        return await open_event_stream(events())
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
 @router.get("/{conversation_id}/history", response_model=ConversationHistoryResponse)
 async def get_conversation_history(
     conversation_id: str,
-    db: Session = Depends(get_db)
+    service: ConversationService = Depends(get_conversation_service)
 ):
     """获取对话历史"""
-    service = ConversationService(db)
-    
     try:
         messages = service.get_conversation_history(conversation_id)
         return ConversationHistoryResponse(
@@ -81,11 +149,9 @@ async def get_conversation_history(
 @router.get("/student/{student_id}", response_model=ConversationListResponse)
 async def get_student_conversations(
     student_id: str,
-    db: Session = Depends(get_db)
+    service: ConversationService = Depends(get_conversation_service)
 ):
     """获取学生的所有对话"""
-    service = ConversationService(db)
-    
     try:
         conversations = service.get_student_conversations(student_id)
         return ConversationListResponse(
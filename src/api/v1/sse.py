@@ -0,0 +1,45 @@
+"""
+Server-Sent Events 流式响应工具
+"""
+import json
+from typing import AsyncIterator, Callable, Dict, Optional
+
+from fastapi.responses import StreamingResponse
+
+
+def format_sse(event: str, data: Dict) -> str:
+    """格式化为一条SSE消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def open_event_stream(events: AsyncIterator[Dict],
+                            on_close: Optional[Callable[[], None]] = None) -> StreamingResponse:
+    """
+    把服务产出的事件（{"event": ..., "data": ...}）包装为SSE响应
+    先取出第一个事件，参数错误等异常在开始推送前抛出，可正常返回HTTP错误码；
+    推送过程中的异常以error事件发送。on_close在流结束（包括客户端断开）时调用
+    """
+    try:
+        first = await events.__anext__()
+    except BaseException:
+        if on_close:
+            on_close()
+        raise
+
+    async def stream():
+        try:
+            yield format_sse(first["event"], first["data"])
+            async for item in events:
+                yield format_sse(item["event"], item["data"])
+        except Exception as e:
+            yield format_sse("error", {"detail": str(e)})
+        finally:
+            await events.aclose()
+            if on_close:
+                on_close()
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -10,12 +10,17 @@ from ...core.database import get_db
 from ...models import Student, LearningPlan
 from ...schemas.student import StudentCreate, StudentUpdate, StudentResponse, StudentWithPlans
 from ...services.rag_service import RAGService
+from ...services.registry import get_rag_service
 
 router = APIRouter()
 
 
 @router.post("", response_model=StudentResponse)
-def create_student(student: StudentCreate, db: Session = Depends(get_db)):
+def create_student(
+    student: StudentCreate,
+    db: Session = Depends(get_db),
+    rag_service: RAGService = Depends(get_rag_service)
+):
     """创建新学生"""
     # 创建学生对象
     db_student = Student(
@@ -30,7 +35,6 @@ def create_student(student: StudentCreate, db: Session = Depends(get_db)):
     
     # 将学生档案存储到向量数据库
     try:
-        rag_service = RAGService()
         rag_service.store_student_profile(
             db_student.id,
             db_student.to_dict()
@@ -68,7 +72,8 @@ def read_student(student_id: str, db: Session = Depends(get_db)):
 def update_student(
     student_id: str,
     student_update: StudentUpdate,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    rag_service: RAGService = Depends(get_rag_service)
 ):
     """更新学生信息"""
     db_student = db.query(Student).filter(Student.id == student_id).first()
@@ -86,7 +91,6 @@ def update_student(
     
     # 更新向量数据库中的学生档案
     try:
-        rag_service = RAGService()
         rag_service.store_student_profile(
             db_student.id,
             db_student.to_dict()
@@ -114,7 +118,8 @@ def delete_student(student_id: str, db: Session = Depends(get_db)):
 def find_similar_students(
     student_id: str,
     k: int = 3,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    rag_service: RAGService = Depends(get_rag_service)
 ):
     """查找相似的学生"""
     # 确认学生存在
@@ -124,7 +129,6 @@ def find_similar_students(
     
     # 使用RAG服务查找相似学生
     try:
-        rag_service = RAGService()
         similar_students = rag_service.find_similar_students(student_id, k)
         
         # 获取相似学生的详细信息
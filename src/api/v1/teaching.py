@@ -4,27 +4,40 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
-from ...core.database import get_db
+from ...core.database import SessionLocal, get_db
 from ...schemas.teaching import (
     StartTeachingRequest,
     ContinueTeachingRequest,
     TeachingSessionResponse,
     TeachingContinuationResponse,
-    LearningRecommendationsResponse
+    LearningRecommendationsResponse,
+    MaterialSearchBatchRequest,
+    MaterialSearchBatchResponse
 )
 from ...services.teaching_service import TeachingService
+from ...services.llm_service import LLMService
+from ...services.rag_service import RAGService
+from ...services.registry import get_llm_service, get_rag_service
+from .sse import open_event_stream
 
 router = APIRouter(prefix="", tags=["teaching"])
 
 
+def get_teaching_service(
+    db: Session = Depends(get_db),
+    llm_service: LLMService = Depends(get_llm_service),
+    rag_service: RAGService = Depends(get_rag_service)
+) -> TeachingService:
+    """构造使用共享服务实例的TeachingService"""
+    return TeachingService(db, llm_service=llm_service, rag_service=rag_service)
+
+
 @router.post("/start", response_model=TeachingSessionResponse)
 async def start_teaching_session(
     request: StartTeachingRequest,
-    db: Session = Depends(get_db)
+    service: TeachingService = Depends(get_teaching_service)
 ):
     """开始教学会话"""
-    service = TeachingService(db)
-    
     try:
         result = await service.start_teaching_session(
             student_id=request.student_id,
@@ -41,11 +54,9 @@ async def start_teaching_session(
 @router.post("/continue", response_model=TeachingContinuationResponse)
 async def continue_teaching(
     request: ContinueTeachingRequest,
-    db: Session = Depends(get_db)
+    service: TeachingService = Depends(get_teaching_service)
 ):
     """继续教学对话"""
-    service = TeachingService(db)
-    
     try:
         result = await service.continue_teaching(
             session_id=request.session_id,
@@ -59,14 +70,60 @@ async def continue_teaching(
         raise HTTPException(status_code=500, detail=f"继续教学失败: {str(e)}")
 
 
+@router.post("/continue/stream")
+async def continue_teaching_stream(
+    request: ContinueTeachingRequest,
+    llm_service: LLMService = Depends(get_llm_service),
+    rag_service: RAGService = Depends(get_rag_service)
+):
+    """流式继续教学对话（SSE）：逐段推送生成的文本"""
+    # 依赖注入的数据库会话在响应推送前就会关闭，流式接口自行管理会话
+    db = SessionLocal()
+    service = TeachingService(db, llm_service=llm_service, rag_service=rag_service)
+    try:
+        return await open_event_stream(
+            service.stream_continue_teaching(
+                session_id=request.session_id,
+                student_response=request.student_response,
+                conversation_history=request.conversation_history
+            ),
+            on_close=db.close
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"继续教学失败: {str(e)}")
+
+
+@router.post("/materials/search", response_model=MaterialSearchBatchResponse)
+async def search_materials_batch(
+    request: MaterialSearchBatchRequest,
+    service: TeachingService = Depends(get_teaching_service)
+):
+    """批量检索教学材料"""
+    try:
+        results = await service.search_materials_batch(
+            queries=request.queries,
+            learning_plan_id=request.learning_plan_id,
+            subject=request.subject,
+            grade=request.grade,
+            material_type=request.material_type,
+            k=request.k,
+            deduplicate=request.deduplicate
+        )
+        return MaterialSearchBatchResponse(results=results)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"检索教学材料失败: {str(e)}")
+
+
 @router.get("/{student_id}/recommendations", response_model=LearningRecommendationsResponse)
 async def get_learning_recommendations(
     student_id: str,
-    db: Session = Depends(get_db)
+    service: TeachingService = Depends(get_teaching_service)
 ):
     """获取学习建议"""
-    service = TeachingService(db)
-    
     try:
         recommendations = await service.get_learning_recommendations(student_id)
         return LearningRecommendationsResponse(**recommendations)
@@ -64,6 +64,28 @@ class Settings(BaseSettings):
     claude_api_key: str = Field(default="", env="CLAUDE_API_KEY")
     claude_model: str = Field(default="claude-3-opus-20240229", env="CLAUDE_MODEL")
     
+    # LLM HTTP连接池配置（进程内共享，跨请求保持长连接）
+    llm_max_connections: int = Field(default=100, env="LLM_MAX_CONNECTIONS")
+    llm_max_keepalive_connections: int = Field(default=20, env="LLM_MAX_KEEPALIVE_CONNECTIONS")
+    llm_keepalive_expiry: float = Field(default=60, env="LLM_KEEPALIVE_EXPIRY")  # 空闲连接保持秒数
+    llm_http2: bool = Field(default=True, env="LLM_HTTP2")  # 需安装h2，未安装时使用HTTP/1.1
+    llm_connect_timeout: float = Field(default=10, env="LLM_CONNECT_TIMEOUT")
+    llm_request_timeout: float = Field(default=120, env="LLM_REQUEST_TIMEOUT")
+    llm_max_retries: int = Field(default=2, env="LLM_MAX_RETRIES")
+    # 课程开场等回答可共享的调用中，相同的并发LLM请求（如全班同时开始同一课程）合并为一次上游调用
+    llm_coalesce_enabled: bool = Field(default=True, env="LLM_COALESCE_ENABLED")
+    
+    # LLM提供商池：首选LLM_PROVIDER，之后按顺序为备用提供商（逗号分隔，需配置对应的API Key）
+    llm_fallback_providers: str = Field(default="", env="LLM_FALLBACK_PROVIDERS")
+    # 对冲请求：首选提供商超过其最近延迟的分位数仍未返回时，向下一个提供商补发请求，采用先返回的结果
+    llm_hedge_enabled: bool = Field(default=False, env="LLM_HEDGE_ENABLED")
+    llm_hedge_quantile: float = Field(default=0.95, env="LLM_HEDGE_QUANTILE")
+    llm_hedge_min_delay: float = Field(default=0.5, env="LLM_HEDGE_MIN_DELAY")  # 对冲等待时间下限（秒）
+    llm_hedge_default_delay: float = Field(default=5, env="LLM_HEDGE_DEFAULT_DELAY")  # 延迟样本不足时的对冲等待时间
+    llm_health_ewma_alpha: float = Field(default=0.2, env="LLM_HEALTH_EWMA_ALPHA")  # 延迟和错误率EWMA的平滑系数
+    llm_circuit_failure_threshold: int = Field(default=5, env="LLM_CIRCUIT_FAILURE_THRESHOLD")  # 连续失败次数达到后熔断
+    llm_circuit_open_seconds: float = Field(default=30, env="LLM_CIRCUIT_OPEN_SECONDS")  # 熔断持续时间
+    
     # 本地向量数据库配置
     vector_db_path: str = Field(
         default="./data/chroma_db",
@@ -71,7 +93,7 @@ class Settings(BaseSettings):
     )
     
     # 嵌入模型配置（使用本地或远程）
-    embeddings_provider: Literal["openai", "local"] = Field(
+    embeddings_provider: Literal["openai", "local", "onnx"] = Field(
         default="openai",
         env="EMBEDDINGS_PROVIDER"
     )
@@ -80,6 +102,53 @@ class Settings(BaseSettings):
         default="sentence-transformers/all-MiniLM-L6-v2",
         env="LOCAL_EMBEDDINGS_MODEL"
     )
+    # ONNX Runtime推理（EMBEDDINGS_PROVIDER=onnx，使用与local相同的模型）
+    onnx_model_dir: str = Field(default="./data/onnx_models", env="ONNX_MODEL_DIR")  # 导出的ONNX模型缓存目录
+    onnx_quantize: bool = Field(default=True, env="ONNX_QUANTIZE")  # 是否使用int8动态量化模型
+    onnx_num_threads: int = Field(default=0, env="ONNX_NUM_THREADS")  # 推理线程数，0为onnxruntime默认值
+    onnx_batch_size: int = Field(default=32, env="ONNX_BATCH_SIZE")  # 每次推理的文本数
+    onnx_max_length: int = Field(default=256, env="ONNX_MAX_LENGTH")  # 最大token数（与模型max_seq_length一致）
+    
+    # 向量化入库配置
+    embedding_batch_size: int = Field(default=64, env="EMBEDDING_BATCH_SIZE")  # 每次embed_documents的文本数
+    embedding_max_concurrency: int = Field(default=4, env="EMBEDDING_MAX_CONCURRENCY")  # 并发嵌入批次数上限
+    vector_db_add_batch_size: int = Field(default=1000, env="VECTOR_DB_ADD_BATCH_SIZE")  # 每次写入向量库的记录数
+    
+    material_manifest_path: str = Field(
+        default="./data/material_manifests.db",
+        env="MATERIAL_MANIFEST_PATH"
+    )
+    stream_block_size: int = Field(default=64 * 1024, env="STREAM_BLOCK_SIZE")  # 流式入库每次读取的字符数
+    stream_window_chunks: int = Field(default=256, env="STREAM_WINDOW_CHUNKS")  # 流式入库每个写入窗口的文本块数
+    rag_executor_workers: int = Field(default=4, env="RAG_EXECUTOR_WORKERS")  # 异步RAG接口的线程池大小
+    
+    # 教学材料分片：按该元数据字段（如subject）拆分为多个集合，为空时不分片
+    teaching_shard_key: Optional[str] = Field(default=None, env="TEACHING_SHARD_KEY")
+    shard_query_workers: int = Field(default=8, env="SHARD_QUERY_WORKERS")  # 跨分片并行查询的线程数
+    
+    # 向量存储后端：列出的集合（逗号分隔的逻辑集合名，如student_profiles）使用NumPy内存映射后端，其余使用ChromaDB
+    numpy_vector_collections: str = Field(default="", env="NUMPY_VECTOR_COLLECTIONS")
+    numpy_vector_dtype: Literal["float32", "float16"] = Field(default="float32", env="NUMPY_VECTOR_DTYPE")
+    
+    # 近重复检测：存储学习计划和新教学材料时与最相近的已有条目比较
+    dedup_enabled: bool = Field(default=False, env="DEDUP_ENABLED")
+    dedup_similarity_threshold: float = Field(default=0.95, env="DEDUP_SIMILARITY_THRESHOLD")  # 余弦相似度阈值
+    # skip：不入库；link：不入库并记录与已有条目的重复关系；replace：删除已有条目后入库
+    dedup_action: Literal["skip", "link", "replace"] = Field(default="skip", env="DEDUP_ACTION")
+    dedup_min_chunk_ratio: float = Field(default=0.9, env="DEDUP_MIN_CHUNK_RATIO")  # 材料中近重复文本块的最低占比
+    duplicate_links_path: str = Field(
+        default="./data/duplicate_links.db",
+        env="DUPLICATE_LINKS_PATH"
+    )
+    
+    # 嵌入向量缓存配置
+    embedding_cache_enabled: bool = Field(default=True, env="EMBEDDING_CACHE_ENABLED")
+    embedding_cache_path: str = Field(
+        default="./data/embedding_cache.db",
+        env="EMBEDDING_CACHE_PATH"
+    )
+    embedding_cache_memory_size: int = Field(default=10000, env="EMBEDDING_CACHE_MEMORY_SIZE")  # 内存缓存条目数
+    embedding_cache_max_disk_mb: int = Field(default=1024, env="EMBEDDING_CACHE_MAX_DISK_MB")  # 磁盘缓存上限
     
     # 日志配置
     log_level: str = Field(default="INFO", env="LOG_LEVEL")
@@ -88,6 +157,62 @@ class Settings(BaseSettings):
         env="LOG_FILE"
     )
     
+    # 紧凑向量存储配置（切换后使用独立的集合，需要重新入库）
+    vector_compact_mode: bool = Field(default=False, env="VECTOR_COMPACT_MODE")
+    vector_compact_dimensions: int = Field(default=256, env="VECTOR_COMPACT_DIMENSIONS")  # 向量库中保存的截断维度
+    vector_quantization: Literal["float16", "int8"] = Field(default="int8", env="VECTOR_QUANTIZATION")
+    vector_rescore_multiplier: int = Field(default=4, env="VECTOR_RESCORE_MULTIPLIER")  # 重排候选数倍数
+    vector_rescore_store_path: str = Field(
+        default="./data/rescore_vectors.db",
+        env="VECTOR_RESCORE_STORE_PATH"
+    )
+    
+    # 教学材料检索配置
+    teaching_search_mode: Literal["vector", "lexical", "hybrid", "auto"] = Field(
+        default="vector",
+        env="TEACHING_SEARCH_MODE"
+    )
+    lexical_index_enabled: bool = Field(default=True, env="LEXICAL_INDEX_ENABLED")
+    lexical_index_path: str = Field(
+        default="./data/lexical_index.db",
+        env="LEXICAL_INDEX_PATH"
+    )
+    hybrid_rrf_k: int = Field(default=60, env="HYBRID_RRF_K")  # RRF融合常数
+    hybrid_candidate_multiplier: int = Field(default=4, env="HYBRID_CANDIDATE_MULTIPLIER")  # 混合检索每路候选数倍数
+    lexical_fast_path_max_chars: int = Field(default=12, env="LEXICAL_FAST_PATH_MAX_CHARS")  # auto模式下走词法检索的最大查询长度
+    
+    # 检索结果缓存配置
+    query_cache_enabled: bool = Field(default=True, env="QUERY_CACHE_ENABLED")
+    query_cache_max_entries: int = Field(default=2000, env="QUERY_CACHE_MAX_ENTRIES")
+    query_cache_ttl_seconds: float = Field(default=300, env="QUERY_CACHE_TTL_SECONDS")
+    
+    # 教学回答语义缓存：相同主题、教学策略、学生水平和对话历史下，语义相近的学生问题复用已有回答
+    teaching_cache_enabled: bool = Field(default=False, env="TEACHING_CACHE_ENABLED")
+    teaching_cache_similarity_threshold: float = Field(default=0.92, env="TEACHING_CACHE_SIMILARITY_THRESHOLD")
+    teaching_cache_max_entries: int = Field(default=5000, env="TEACHING_CACHE_MAX_ENTRIES")
+    teaching_cache_ttl_seconds: float = Field(default=86400, env="TEACHING_CACHE_TTL_SECONDS")
+    # 参与缓存的教学策略（逗号分隔），默认只缓存澄清和答疑类回答
+    teaching_cache_strategies: str = Field(default="clarify,answer_question", env="TEACHING_CACHE_STRATEGIES")
+    
+    # 后台任务配置
+    plan_job_max_concurrency: int = Field(default=2, env="PLAN_JOB_MAX_CONCURRENCY")  # 同时生成学习计划的任务数
+    job_result_ttl_seconds: float = Field(default=3600, env="JOB_RESULT_TTL_SECONDS")  # 已结束任务的保留时间
+    
+    # 对话上下文窗口：最近若干轮保留原文，更早的消息由后台任务折叠进对话摘要
+    context_summary_enabled: bool = Field(default=True, env="CONTEXT_SUMMARY_ENABLED")
+    context_keep_turns: int = Field(default=6, env="CONTEXT_KEEP_TURNS")  # 保留原文的轮数（一问一答为一轮）
+    # 各LLM提供商的对话历史token预算（摘要+保留的消息+本轮消息，不含系统提示词）
+    context_token_budgets: str = Field(
+        default="openai:6000,azure:6000,deepseek:12000,qwen:6000,claude:12000",
+        env="CONTEXT_TOKEN_BUDGETS"
+    )
+    context_summary_max_chars: int = Field(default=800, env="CONTEXT_SUMMARY_MAX_CHARS")  # 摘要长度上限
+    
+    # 服务生命周期配置
+    warmup_services_on_startup: bool = Field(default=True, env="WARMUP_SERVICES_ON_STARTUP")
+    # 在后台线程中预热，应用启动不等待SDK导入和模型加载（关闭时启动阶段同步预热）
+    warmup_in_background: bool = Field(default=True, env="WARMUP_IN_BACKGROUND")
+    
     # 教学配置
     max_conversation_turns: int = 10  # 最大对话轮数
     min_conversation_turns: int = 3   # 最小对话轮数
@@ -111,8 +236,4 @@ def ensure_directories():
     ]
     
     for directory in directories:
-        os.makedirs(directory, exist_ok=True)
-
-
-# 初始化时创建目录
-ensure_directories() 
\ No newline at end of file
+        os.makedirs(directory, exist_ok=True) 
\ No newline at end of file
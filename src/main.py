@@ -7,12 +7,11 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 import os
 
-from .core.config import settings
+from .core.config import settings, ensure_directories
 from .core.database import engine, Base
 from .api.v1 import students, conversations, teaching
-
-# 创建数据库表
-Base.metadata.create_all(bind=engine)
+from .services.registry import service_registry
+from .services.llm_clients import llm_clients
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -35,6 +34,28 @@ app.include_router(students.router, prefix="/api/v1/students", tags=["students"]
 app.include_router(conversations.router, prefix="/api/v1/conversations", tags=["conversations"])
 app.include_router(teaching.router, prefix="/api/v1/teaching", tags=["teaching"])
 
+@app.on_event("startup")
+def startup_services():
+    """启动时创建目录和数据库表，并预热共享服务（导入模块时不产生副作用）"""
+    ensure_directories()
+    Base.metadata.create_all(bind=engine)
+    
+    if not settings.warmup_services_on_startup:
+        # 服务在首个请求使用时才创建
+        return
+    if settings.warmup_in_background:
+        service_registry.start_background_warmup()
+    else:
+        service_registry.warmup()
+
+
+@app.on_event("shutdown")
+async def shutdown_services():
+    """关闭时等待后台任务结束，再释放共享服务资源和LLM连接池"""
+    await service_registry.shutdown_jobs()
+    service_registry.shutdown()
+    await llm_clients.aclose()
+
 # 挂载静态文件目录
 static_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
 if os.path.exists(static_path):
@@ -52,6 +73,11 @@ async def read_index():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def metrics():
+    """缓存命中率等运行指标"""
+    return service_registry.get_metrics()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("src.main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
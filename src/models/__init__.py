@@ -2,11 +2,13 @@
 from .student import Student
 from .conversation import Conversation, Message
 from .learning_plan import LearningPlan, LearningProgress
+from .job import BackgroundJob
 
 __all__ = [
     "Student",
     "Conversation",
     "Message",
     "LearningPlan",
-    "LearningProgress"
+    "LearningProgress",
+    "BackgroundJob"
 ] 
\ No newline at end of file
@@ -0,0 +1,46 @@
+"""
+后台任务数据模型
+"""
+from sqlalchemy import Column, String, Float, Text, JSON
+
+from ..core.database import Base
+
+
+class BackgroundJob(Base):
+    """后台任务模型（保存任务状态和结果，任一worker进程都可查询）"""
+    __tablename__ = "background_jobs"
+    
+    id = Column(String(36), primary_key=True)
+    
+    # 任务类型和所属对象（如对话ID）
+    kind = Column(String(50), nullable=False)
+    key = Column(String(100), index=True)
+    
+    # 任务状态：pending、running、succeeded、failed、cancelled
+    status = Column(String(20), nullable=False)
+    
+    # 时间戳（Unix时间）
+    created_at = Column(Float)
+    started_at = Column(Float)
+    finished_at = Column(Float, index=True)
+    
+    # 任务结果和错误信息
+    result = Column(JSON)
+    error = Column(Text)
+    
+    def __repr__(self):
+        return f"<BackgroundJob(id={self.id}, kind={self.kind}, status={self.status})>"
+    
+    def to_dict(self):
+        """转换为与JobRunner一致的任务状态字典"""
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "key": self.key,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error
+        }
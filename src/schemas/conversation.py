@@ -1,7 +1,7 @@
 """
 对话相关的Pydantic模式
 """
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 from pydantic import BaseModel, Field
 
@@ -24,6 +24,7 @@ class ConversationResponse(BaseModel):
     status: str
     turn_count: int
     has_learning_plan: Optional[bool] = False
+    plan_job_id: Optional[str] = Field(None, description="学习计划生成任务ID，可通过 /jobs/{job_id} 查询进度")
     error: Optional[str] = None
 
 
@@ -55,4 +56,16 @@ class ConversationListItem(BaseModel):
 class ConversationListResponse(BaseModel):
     """对话列表响应"""
     conversations: List[ConversationListItem]
-    total: int 
\ No newline at end of file
+    total: int
+
+
+class JobStatusResponse(BaseModel):
+    """后台任务状态响应"""
+    id: str
+    kind: str
+    status: str = Field(..., description="pending、running、succeeded、failed或cancelled")
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
@@ -33,6 +33,29 @@ class TeachingContinuationResponse(BaseModel):
     analysis: Dict[str, Any]
     strategy: str
     mastery_level: int
+    usage: Optional[Dict[str, Any]] = Field(None, description="token用量；命中语义缓存时包含本次节省的tokens和耗时")
+
+
+class MaterialSearchBatchRequest(BaseModel):
+    """批量检索教学材料请求"""
+    queries: List[str] = Field(default_factory=list, description="查询列表")
+    learning_plan_id: Optional[str] = Field(None, description="学习计划ID，提供时将计划的各学习目标加入查询")
+    subject: Optional[str] = Field(None, description="学科")
+    grade: Optional[str] = Field(None, description="年级（如初二、八年级、7-9年级），默认使用学习计划所属学生的年级")
+    material_type: Optional[str] = Field(None, description="材料类型")
+    k: int = Field(3, ge=1, le=20, description="每个查询返回的材料数")
+    deduplicate: bool = Field(False, description="是否跨查询去重")
+
+
+class QueryMaterials(BaseModel):
+    """单个查询的检索结果"""
+    query: str
+    materials: List[Dict[str, Any]]
+
+
+class MaterialSearchBatchResponse(BaseModel):
+    """批量检索教学材料响应"""
+    results: List[QueryMaterials]
 
 
 class LearningRecommendation(BaseModel):
@@ -0,0 +1,120 @@
+"""
+紧凑向量存储基准测试
+
+读取现有（全维度）集合中的向量，对比不同截断维度与量化方式下的内存占用和 recall@k：
+    python -m src.scripts.benchmark_compact --dimensions 128,256,512 --k 5
+
+以集合内的向量作为查询，全维度float32精确检索的结果为基准，
+紧凑模式流程为：截断维度粗召回 k*重排倍数 个候选，再用全精度查询向量与反量化的全维度向量重排。
+"""
+import argparse
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import numpy as np
+
+from src.core.config import settings
+from src.services.rag_service import RAGService
+from src.services.vector_compression import quantize, dequantize
+
+
+COLLECTIONS = ["learning_plans", "teaching_materials", "student_profiles"]
+
+
+def load_embeddings(collection, page_size: int = 1000) -> np.ndarray:
+    """分页读取集合中的全部向量"""
+    vectors = []
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings"], limit=page_size, offset=offset)
+        if not page['ids']:
+            break
+        vectors.extend(page['embeddings'])
+        offset += len(page['ids'])
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def top_k(queries: np.ndarray, matrix: np.ndarray, k: int, exclude: np.ndarray) -> np.ndarray:
+    """平方欧氏距离最小的k个下标（exclude为各查询自身的下标，不计入结果）"""
+    distances = (
+        np.sum(queries ** 2, axis=1, keepdims=True)
+        - 2 * queries @ matrix.T
+        + np.sum(matrix ** 2, axis=1)
+    )
+    distances[np.arange(len(queries)), exclude] = np.inf
+    return np.argsort(distances, axis=1)[:, :k]
+
+
+def compact_top_k(queries: np.ndarray, matrix: np.ndarray, dimensions: int,
+                  method: str, k: int, multiplier: int, exclude: np.ndarray) -> np.ndarray:
+    """模拟紧凑模式检索：截断维度粗召回后用反量化的全维度向量重排"""
+    truncated = normalize(matrix[:, :dimensions])
+    truncated_queries = normalize(queries[:, :dimensions])
+    candidates = top_k(truncated_queries, truncated, k * multiplier, exclude)
+
+    restored = np.stack([dequantize(*quantize(vector, method), method) for vector in matrix])
+    results = []
+    for query, row in zip(queries, candidates):
+        diff = restored[row] - query
+        order = np.argsort(np.sum(diff * diff, axis=1))
+        results.append(row[order[:k]])
+    return np.asarray(results)
+
+
+def recall(expected: np.ndarray, actual: np.ndarray) -> float:
+    hits = sum(len(set(e) & set(a)) for e, a in zip(expected, actual))
+    return hits / expected.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="紧凑向量存储基准测试")
+    parser.add_argument("--dimensions", default="128,256,512", help="截断维度，逗号分隔")
+    parser.add_argument("--k", type=int, default=5, help="recall@k中的k")
+    parser.add_argument("--queries", type=int, default=200, help="每个集合抽样的查询数")
+    parser.add_argument("--multiplier", type=int, default=settings.vector_rescore_multiplier, help="重排候选数倍数")
+    args = parser.parse_args()
+
+    # 基准数据读取自全维度集合
+    settings.vector_compact_mode = False
+    rag_service = RAGService()
+    rng = np.random.default_rng(42)
+
+    for name in COLLECTIONS:
+        matrix = load_embeddings(getattr(rag_service, f"{name}_collection"))
+        count = len(matrix)
+        if count <= args.k + 1:
+            print(f"{name}: 向量数不足（{count}），跳过")
+            continue
+
+        full_dim = matrix.shape[1]
+        sample = rng.choice(count, size=min(args.queries, count), replace=False)
+        queries = matrix[sample]
+        expected = top_k(queries, matrix, args.k, sample)
+
+        full_bytes = count * full_dim * 4
+        print(f"\n{name}: {count} 个向量，{full_dim} 维，全精度 {full_bytes / 1024 / 1024:.2f} MB")
+        print(f"{'维度':>6}{'量化':>10}{'索引(MB)':>12}{'重排存储(MB)':>14}{'节省':>8}{'召回率':>10}")
+
+        for dimensions in [int(d) for d in args.dimensions.split(",") if d.strip()]:
+            if dimensions >= full_dim:
+                continue
+            for method in ["float16", "int8"]:
+                actual = compact_top_k(queries, matrix, dimensions, method, args.k, args.multiplier, sample)
+                index_bytes = count * dimensions * 4
+                rescore_bytes = count * full_dim * (2 if method == "float16" else 1)
+                # 重排向量存放在磁盘，常驻内存的只有截断后的索引
+                saved = 1 - index_bytes / full_bytes
+                print(f"{dimensions:>6}{method:>10}{index_bytes / 1024 / 1024:>12.2f}"
+                      f"{rescore_bytes / 1024 / 1024:>14.2f}{saved:>8.0%}"
+                      f"{recall(expected, actual):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+本地嵌入模型一致性与吞吐量测试
+
+对比HuggingFaceEmbeddings（PyTorch）与OnnxEmbeddings（fp32 / int8）：
+    python -m src.scripts.benchmark_embeddings --texts 512 --min-cosine 0.98
+
+- 一致性：同一文本两种后端生成的向量余弦相似度，以及以PyTorch结果为基准的检索 recall@k
+- 吞吐量：每秒嵌入的文本数
+任一ONNX后端的最小余弦相似度低于 --min-cosine 时以非零状态码退出，可用于切换前的校验
+"""
+import argparse
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import numpy as np
+from langchain_community.embeddings import HuggingFaceEmbeddings
+
+from src.core.config import settings
+from src.services.onnx_embeddings import OnnxEmbeddings
+
+
+SAMPLE_TEXTS = [
+    "一元二次方程的求根公式是什么？",
+    "勾股定理：直角三角形两条直角边的平方和等于斜边的平方。",
+    "光合作用是绿色植物利用光能把二氧化碳和水合成有机物并释放氧气的过程。",
+    "The mitochondria is the powerhouse of the cell.",
+    "牛顿第二定律指出物体的加速度与所受合力成正比，与质量成反比。",
+    "How do I solve a system of linear equations by substitution?",
+    "文言文阅读要注意实词、虚词和特殊句式的积累。",
+    "Photosynthesis converts light energy into chemical energy stored in glucose.",
+]
+
+
+def build_corpus(size: int) -> list:
+    """由样例文本组合出长度不一的测试语料"""
+    rng = np.random.default_rng(0)
+    corpus = []
+    for i in range(size):
+        count = int(rng.integers(1, 6))
+        picked = rng.choice(len(SAMPLE_TEXTS), size=count)
+        corpus.append(f"{i} " + " ".join(SAMPLE_TEXTS[j] for j in picked))
+    return corpus
+
+
+def timed_embed(embeddings, texts: list) -> tuple:
+    """返回(向量矩阵, 每秒文本数)"""
+    embeddings.embed_documents(texts[:8])  # 预热
+    started = time.perf_counter()
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    elapsed = time.perf_counter() - started
+    return vectors, len(texts) / elapsed if elapsed > 0 else float("inf")
+
+
+def recall_at_k(expected: np.ndarray, actual: np.ndarray, k: int) -> float:
+    """以expected的余弦近邻为基准，计算actual的recall@k"""
+    def neighbors(matrix):
+        scores = matrix @ matrix.T
+        np.fill_diagonal(scores, -np.inf)
+        return np.argsort(-scores, axis=1)[:, :k]
+
+    truth, found = neighbors(expected), neighbors(actual)
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    return hits / truth.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地嵌入模型一致性与吞吐量测试")
+    parser.add_argument("--model", default=settings.local_embeddings_model, help="sentence-transformers模型")
+    parser.add_argument("--texts", type=int, default=512, help="测试文本数")
+    parser.add_argument("--k", type=int, default=10, help="recall@k中的k")
+    parser.add_argument("--threads", type=int, default=settings.onnx_num_threads, help="ONNX推理线程数")
+    parser.add_argument("--batch-size", type=int, default=settings.onnx_batch_size, help="ONNX每批文本数")
+    parser.add_argument("--min-cosine", type=float, default=0.98, help="允许的最小余弦相似度")
+    args = parser.parse_args()
+
+    texts = build_corpus(args.texts)
+
+    baseline = HuggingFaceEmbeddings(
+        model_name=args.model,
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={'normalize_embeddings': True}
+    )
+    expected, baseline_rate = timed_embed(baseline, texts)
+
+    print(f"模型: {args.model}，{len(texts)} 条文本，{expected.shape[1]} 维")
+    print(f"{'后端':>12}{'文本/秒':>10}{'加速':>8}{'最小余弦':>10}{'平均余弦':>10}{'召回率':>10}")
+    print(f"{'pytorch':>12}{baseline_rate:>10.1f}{1.0:>8.2f}{1.0:>10.4f}{1.0:>10.4f}{1.0:>10.3f}")
+
+    passed = True
+    for quantize in [False, True]:
+        backend = OnnxEmbeddings(
+            model_name=args.model,
+            cache_dir=settings.onnx_model_dir,
+            quantize=quantize,
+            num_threads=args.threads,
+            batch_size=args.batch_size,
+            max_length=settings.onnx_max_length
+        )
+        actual, rate = timed_embed(backend, texts)
+
+        # 两边均已归一化，点积即余弦相似度
+        cosine = np.sum(expected * actual, axis=1)
+        name = "onnx-int8" if quantize else "onnx-fp32"
+        print(f"{name:>12}{rate:>10.1f}{rate / baseline_rate:>8.2f}{cosine.min():>10.4f}"
+              f"{cosine.mean():>10.4f}{recall_at_k(expected, actual, args.k):>10.3f}")
+
+        if cosine.min() < args.min_cosine:
+            passed = False
+            print(f"  {name} 最小余弦相似度低于 {args.min_cosine}，与现有集合的向量不兼容")
+
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+教学材料检索基准测试
+
+对比 vector / lexical / hybrid / auto 四种检索模式的延迟与召回率：
+    python -m src.scripts.benchmark_retrieval --samples 200 --k 5
+
+未提供标注查询文件时，从集合中随机抽取文本块，截取其中一段作为查询，
+该文本块即为唯一相关结果（自检索召回率）。
+标注查询文件为JSON Lines格式，每行 {"query": "...", "relevant_ids": ["chunk_id", ...]}。
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.core.config import settings
+from src.services.rag_service import RAGService
+
+
+MODES = ["vector", "lexical", "hybrid", "auto"]
+
+
+def load_labelled_queries(path: str) -> list:
+    """读取标注查询"""
+    queries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                item = json.loads(line)
+                queries.append((item["query"], set(item["relevant_ids"])))
+    return queries
+
+
+def sample_queries(rag_service: RAGService, samples: int, query_chars: int, seed: int) -> list:
+    """从集合中抽样生成自检索查询"""
+    collection = rag_service.teaching_materials_collection
+    total = collection.count()
+    if total == 0:
+        return []
+
+    rng = random.Random(seed)
+    queries = []
+    for offset in rng.sample(range(total), min(samples, total)):
+        page = collection.get(include=["documents"], limit=1, offset=offset)
+        document = page["documents"][0].strip()
+        if len(document) <= query_chars:
+            query = document
+        else:
+            start = rng.randrange(0, len(document) - query_chars)
+            query = document[start:start + query_chars]
+        queries.append((query, {page["ids"][0]}))
+    return queries
+
+
+def run_benchmark(rag_service: RAGService, queries: list, k: int) -> dict:
+    """对每种检索模式测量延迟与recall@k"""
+    report = {}
+    for mode in MODES:
+        latencies = []
+        hits = 0
+        for query, relevant_ids in queries:
+            started = time.perf_counter()
+            results = rag_service.search_teaching_materials(query, k=k, mode=mode)
+            latencies.append((time.perf_counter() - started) * 1000)
+            returned = {result["id"] for result in results}
+            hits += len(returned & relevant_ids) / len(relevant_ids)
+
+        latencies.sort()
+        report[mode] = {
+            "mean_ms": statistics.mean(latencies),
+            "p50_ms": latencies[len(latencies) // 2],
+            "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            f"recall@{k}": hits / len(queries)
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="教学材料检索基准测试")
+    parser.add_argument("--queries", help="标注查询文件（JSON Lines）")
+    parser.add_argument("--samples", type=int, default=100, help="自检索抽样数量")
+    parser.add_argument("--query-chars", type=int, default=20, help="自检索查询截取长度")
+    parser.add_argument("--k", type=int, default=5, help="返回结果数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--rebuild-index", action="store_true", help="测试前根据集合重建词法索引")
+    parser.add_argument("--with-embedding-cache", action="store_true",
+                        help="启用嵌入缓存（默认关闭，避免各模式间重复查询命中缓存影响延迟对比）")
+    args = parser.parse_args()
+
+    settings.embedding_cache_enabled = args.with_embedding_cache
+    # 检索结果缓存始终关闭，否则同一查询在后面的模式中直接命中缓存，延迟和结果都不可比
+    settings.query_cache_enabled = False
+    rag_service = RAGService()
+    if not rag_service.lexical_index:
+        print("词法索引未启用（LEXICAL_INDEX_ENABLED=false），无法对比")
+        return
+
+    if args.rebuild_index:
+        print(f"已重建词法索引，共 {rag_service.rebuild_lexical_index()} 个文本块")
+
+    if args.queries:
+        queries = load_labelled_queries(args.queries)
+    else:
+        queries = sample_queries(rag_service, args.samples, args.query_chars, args.seed)
+
+    if not queries:
+        print("没有可用的查询，请先导入教学材料")
+        return
+
+    print(f"查询数: {len(queries)}, k={args.k}")
+    report = run_benchmark(rag_service, queries, args.k)
+
+    print(f"{'模式':<10}{'平均(ms)':>12}{'P50(ms)':>12}{'P95(ms)':>12}{'召回率':>10}")
+    for mode, metrics in report.items():
+        print(f"{mode:<10}{metrics['mean_ms']:>12.1f}{metrics['p50_ms']:>12.1f}"
+              f"{metrics['p95_ms']:>12.1f}{metrics[f'recall@{args.k}']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
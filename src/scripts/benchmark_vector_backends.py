@@ -0,0 +1,157 @@
+"""
+向量存储后端基准测试（ChromaDB vs NumPy内存映射）
+
+用随机生成的归一化向量模拟学生档案集合，对比两种后端的写入耗时、查询延迟和内存占用：
+    python -m src.scripts.benchmark_vector_backends --count 50000 --dimensions 384
+
+每个后端在独立子进程中运行，内存占用为加载并查询后进程峰值RSS相对启动时的增量；
+同时报告NumPy精确检索结果对ChromaDB（HNSW近似检索）结果的重合率。
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import numpy as np
+
+
+def peak_rss_mb() -> float:
+    """进程峰值常驻内存（MB，Linux下ru_maxrss单位为KB）"""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage / 1024 if sys.platform != "darwin" else usage / 1024 / 1024
+
+
+def make_dataset(count: int, dimensions: int, queries: int, seed: int = 42):
+    """生成向量、元数据和查询向量（固定随机种子，保证各子进程数据一致）"""
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, dimensions)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    metadatas = [{"type": "student_profile", "grade": int(rng.integers(1, 13))} for _ in range(count)]
+    query_vectors = vectors[rng.choice(count, size=queries, replace=False)]
+    return vectors, metadatas, query_vectors
+
+
+def open_backend(backend: str, directory: str, dtype: str):
+    if backend == "numpy":
+        from src.services.numpy_vector_store import NumpyCollection
+        return NumpyCollection(os.path.join(directory, "numpy"), "benchmark", dtype=dtype)
+
+    import chromadb
+    from chromadb.config import Settings as ChromaSettings
+    client = chromadb.PersistentClient(
+        path=os.path.join(directory, "chroma"),
+        settings=ChromaSettings(anonymized_telemetry=False)
+    )
+    return client.get_or_create_collection("benchmark")
+
+
+def run_backend(args):
+    """子进程：写入数据并测量查询延迟，结果以JSON输出到stdout"""
+    baseline_rss = peak_rss_mb()
+    vectors, metadatas, query_vectors = make_dataset(args.count, args.dimensions, args.queries)
+    dataset_rss = peak_rss_mb()
+
+    with tempfile.TemporaryDirectory() as directory:
+        collection = open_backend(args.backend, directory, args.dtype)
+        ids = [f"student_{i}" for i in range(args.count)]
+
+        started = time.perf_counter()
+        for start in range(0, args.count, 1000):
+            end = start + 1000
+            collection.add(
+                ids=ids[start:end],
+                embeddings=vectors[start:end].tolist(),
+                documents=[f"学生档案 {i}" for i in range(start, min(end, args.count))],
+                metadatas=metadatas[start:end]
+            )
+        insert_seconds = time.perf_counter() - started
+
+        report = {"backend": args.backend, "insert_seconds": insert_seconds}
+        for label, where in [("all", {"type": "student_profile"}), ("filtered", {"grade": 8})]:
+            latencies = []
+            neighbors = []
+            for query in query_vectors:
+                started = time.perf_counter()
+                result = collection.query(
+                    query_embeddings=[query.tolist()],
+                    where=where,
+                    n_results=args.k,
+                    include=["distances"]
+                )
+                latencies.append((time.perf_counter() - started) * 1000)
+                neighbors.append(result["ids"][0])
+            latencies.sort()
+            report[label] = {
+                "p50_ms": statistics.median(latencies),
+                "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+                "neighbors": neighbors
+            }
+
+        # 峰值RSS扣除测试数据本身占用的内存
+        report["memory_mb"] = peak_rss_mb() - dataset_rss
+        report["baseline_mb"] = baseline_rss
+        if hasattr(collection, "close"):
+            collection.close()
+
+    print(json.dumps(report))
+
+
+def overlap(expected: list, actual: list) -> float:
+    hits = sum(len(set(e) & set(a)) for e, a in zip(expected, actual))
+    total = sum(len(e) for e in expected)
+    return hits / total if total else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量存储后端基准测试")
+    parser.add_argument("--count", type=int, default=20000, help="向量数")
+    parser.add_argument("--dimensions", type=int, default=384, help="向量维度")
+    parser.add_argument("--queries", type=int, default=200, help="查询次数")
+    parser.add_argument("--k", type=int, default=5, help="每次查询返回的结果数")
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"], help="NumPy后端的存储精度")
+    parser.add_argument("--backend", choices=["chroma", "numpy"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.backend:
+        run_backend(args)
+        return
+
+    reports = {}
+    for backend in ["chroma", "numpy"]:
+        command = [
+            sys.executable, "-m", "src.scripts.benchmark_vector_backends",
+            "--backend", backend,
+            "--count", str(args.count),
+            "--dimensions", str(args.dimensions),
+            "--queries", str(args.queries),
+            "--k", str(args.k),
+            "--dtype", args.dtype
+        ]
+        output = subprocess.run(command, capture_output=True, text=True)
+        if output.returncode != 0:
+            print(f"{backend} 测试失败:\n{output.stderr}")
+            continue
+        reports[backend] = json.loads(output.stdout.strip().splitlines()[-1])
+
+    print(f"{args.count} 个 {args.dimensions} 维向量，{args.queries} 次查询，k={args.k}，NumPy精度 {args.dtype}")
+    print(f"{'后端':>8}{'写入(秒)':>10}{'P50(ms)':>10}{'P95(ms)':>10}{'过滤P50':>10}{'过滤P95':>10}{'内存(MB)':>10}")
+    for backend, report in reports.items():
+        print(f"{backend:>8}{report['insert_seconds']:>10.2f}"
+              f"{report['all']['p50_ms']:>10.2f}{report['all']['p95_ms']:>10.2f}"
+              f"{report['filtered']['p50_ms']:>10.2f}{report['filtered']['p95_ms']:>10.2f}"
+              f"{report['memory_mb']:>10.1f}")
+
+    if len(reports) == 2:
+        for label in ["all", "filtered"]:
+            rate = overlap(reports["numpy"][label]["neighbors"], reports["chroma"][label]["neighbors"])
+            print(f"ChromaDB结果与精确检索的重合率（{label}）: {rate:.3f}")
+
+
+if __name__ == "__main__":
+    main()
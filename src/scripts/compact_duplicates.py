@@ -0,0 +1,54 @@
+"""
+近重复条目离线压缩
+
+先扫描查看会删除哪些条目（默认只扫描不删除）：
+    python -m src.scripts.compact_duplicates --threshold 0.95
+
+确认后删除近重复条目，并记录其与保留条目的重复关系：
+    python -m src.scripts.compact_duplicates --apply
+"""
+import argparse
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.core.config import settings
+from src.services.rag_service import RAGService
+
+
+def main():
+    parser = argparse.ArgumentParser(description="近重复学习计划和教学材料的离线压缩")
+    parser.add_argument("--collections", default="learning_plans,teaching_materials",
+                        help="要压缩的集合，逗号分隔")
+    parser.add_argument("--threshold", type=float, help="余弦相似度阈值（默认使用DEDUP_SIMILARITY_THRESHOLD）")
+    parser.add_argument("--min-chunk-ratio", type=float, help="材料中近重复文本块的最低占比（默认使用DEDUP_MIN_CHUNK_RATIO）")
+    parser.add_argument("--apply", action="store_true", help="删除近重复条目（默认只扫描）")
+    parser.add_argument("--no-links", action="store_true", help="删除时不记录重复关系")
+    args = parser.parse_args()
+
+    if args.threshold is not None:
+        settings.dedup_similarity_threshold = args.threshold
+    if args.min_chunk_ratio is not None:
+        settings.dedup_min_chunk_ratio = args.min_chunk_ratio
+
+    rag_service = RAGService()
+    try:
+        for name in [item.strip() for item in args.collections.split(",") if item.strip()]:
+            duplicates = rag_service.compact_duplicates(
+                name,
+                record_links=not args.no_links,
+                dry_run=not args.apply
+            )
+            for item in duplicates:
+                print(f"  {item['id']} -> {item['duplicate_of']}（相似度 {item['similarity']:.3f}）")
+            verb = "已删除" if args.apply else "发现"
+            print(f"{name}: {verb} {len(duplicates)} 个近重复条目")
+    finally:
+        rag_service.close()
+
+    if not args.apply:
+        print("仅扫描，未做修改；确认后使用 --apply 删除")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+教学材料批量入库脚本
+
+用法：
+    python -m src.scripts.ingest_materials ./materials --subject 数学 --level 初二
+
+- 递归读取目录下的文本材料（默认 .txt / .md）
+- 文本块按批次并发嵌入，并分批写入 teaching_materials 集合
+- 入库进度记录在状态文件中，中断后重新运行会跳过已完成且未修改的材料
+- 超过 --stream-threshold-mb 的大文件以流式方式逐窗口入库，内存占用不随文件大小增长
+- --level 会被解析为年级范围（grade_min/grade_max）写入文本块元数据，供检索时按年级过滤；
+  年级过滤上线前入库的材料可运行 python -m src.scripts.ingest_materials --refresh-metadata 补全
+- 配置 TEACHING_SHARD_KEY 后，可运行 python -m src.scripts.ingest_materials --reshard 把已有材料迁移到分片集合
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.core.config import settings
+from src.services.rag_service import RAGService
+
+
+DEFAULT_STATE_FILE = "./data/ingest_state.json"
+
+
+def load_state(state_file: str) -> dict:
+    """读取入库状态（material_id -> 内容哈希）"""
+    if not os.path.exists(state_file):
+        return {}
+    with open(state_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(state_file: str, state: dict):
+    """原子地写入入库状态"""
+    os.makedirs(os.path.dirname(os.path.abspath(state_file)), exist_ok=True)
+    tmp_file = state_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, state_file)
+
+
+def discover_materials(directory: str, extensions: list) -> list:
+    """查找目录下的所有材料文件，返回相对路径列表"""
+    paths = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if os.path.splitext(name)[1].lower() in extensions:
+                paths.append(os.path.relpath(os.path.join(root, name), directory))
+    return sorted(paths)
+
+
+def file_hash(path: str) -> str:
+    """流式计算文件内容哈希"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_metadata(rel_path: str, subject: str = None, level: str = None) -> tuple:
+    """根据相对路径生成(material_id, 元数据)"""
+    parts = rel_path.split(os.sep)
+    material_id = os.path.splitext(rel_path)[0].replace(os.sep, "__")
+
+    metadata = {
+        "source": rel_path.replace(os.sep, "/"),
+        "title": os.path.splitext(parts[-1])[0],
+        # 未指定学科时使用一级目录名
+        "subject": subject or (parts[0] if len(parts) > 1 else ""),
+    }
+    if level:
+        metadata["level"] = level
+
+    return material_id, metadata
+
+
+def build_material(directory: str, rel_path: str, subject: str = None, level: str = None) -> dict:
+    """读取材料文件并构造入库记录"""
+    with open(os.path.join(directory, rel_path), "r", encoding="utf-8") as f:
+        content = f.read()
+
+    material_id, metadata = build_metadata(rel_path, subject, level)
+    return {
+        "material_id": material_id,
+        "content": content,
+        "metadata": metadata,
+        "content_hash": hashlib.sha256(content.encode("utf-8")).hexdigest()
+    }
+
+
+def ingest_large_file(rag_service: RAGService, directory: str, rel_path: str,
+                      subject: str = None, level: str = None) -> dict:
+    """流式入库单个大文件"""
+    material_id, metadata = build_metadata(rel_path, subject, level)
+
+    def report(totals):
+        print(f"\r  {rel_path}: 已切分 {totals['chunks']} 块，写入 {totals['upserted']} 块",
+              end="", flush=True)
+
+    result = rag_service.store_teaching_material_stream(
+        material_id,
+        os.path.join(directory, rel_path),
+        metadata,
+        progress_callback=report
+    )
+    print()
+    return result
+
+
+def ingest_directory(directory: str,
+                     subject: str = None,
+                     level: str = None,
+                     extensions: list = None,
+                     state_file: str = DEFAULT_STATE_FILE,
+                     files_per_round: int = 20,
+                     restart: bool = False,
+                     stream_threshold_mb: float = 20):
+    """入库目录下的所有教学材料"""
+    extensions = extensions or [".txt", ".md"]
+    state = {} if restart else load_state(state_file)
+
+    rel_paths = discover_materials(directory, extensions)
+    print(f"发现 {len(rel_paths)} 个材料文件")
+
+    rag_service = RAGService()
+    started = time.time()
+    total_chunks = 0
+    total_embedded = 0
+    skipped = 0
+
+    for round_start in range(0, len(rel_paths), files_per_round):
+        round_paths = rel_paths[round_start:round_start + files_per_round]
+
+        pending = []
+        for rel_path in round_paths:
+            path = os.path.join(directory, rel_path)
+            if os.path.getsize(path) > stream_threshold_mb * 1024 * 1024:
+                # 大文件不整体读入内存，单独流式入库
+                material_id, _ = build_metadata(rel_path, subject, level)
+                digest = file_hash(path)
+                if state.get(material_id) == digest:
+                    skipped += 1
+                    continue
+                result = ingest_large_file(rag_service, directory, rel_path, subject, level)
+                total_chunks += result["upserted"]
+                total_embedded += result["embedded"]
+                state[material_id] = digest
+                save_state(state_file, state)
+                continue
+
+            material = build_material(directory, rel_path, subject, level)
+            if state.get(material["material_id"]) == material["content_hash"]:
+                skipped += 1
+                continue
+            # 已修改的材料由store_teaching_materials按文本块增量更新
+            pending.append(material)
+
+        if pending:
+            def report(done, total):
+                print(f"\r  嵌入进度: {done}/{total}", end="", flush=True)
+
+            result = rag_service.store_teaching_materials(pending, progress_callback=report)
+            print()
+            total_chunks += result["upserted"]
+            total_embedded += result["embedded"]
+            for item in result["duplicates"]:
+                print(f"  {item['material_id']} 与已有材料 {item['duplicate_of']} 近重复"
+                      f"（相似度 {item['similarity']:.3f}，{item['action']}）")
+
+            for material in pending:
+                state[material["material_id"]] = material["content_hash"]
+            save_state(state_file, state)
+
+        finished = min(round_start + files_per_round, len(rel_paths))
+        elapsed = time.time() - started
+        rate = total_chunks / elapsed if elapsed > 0 else 0
+        print(f"[{finished}/{len(rel_paths)}] 已写入 {total_chunks} 个文本块（新生成嵌入 {total_embedded} 个），"
+              f"跳过 {skipped} 个未修改文件，{rate:.1f} 块/秒")
+
+    print(f"入库完成，共写入 {total_chunks} 个文本块，用时 {time.time() - started:.1f} 秒")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量导入教学材料到向量数据库")
+    parser.add_argument("directory", nargs="?", help="材料目录")
+    parser.add_argument("--subject", help="学科（默认使用一级目录名）")
+    parser.add_argument("--level", help="适用年级/水平")
+    parser.add_argument("--extensions", default=".txt,.md", help="文件扩展名，逗号分隔")
+    parser.add_argument("--state-file", default=DEFAULT_STATE_FILE, help="入库状态文件")
+    parser.add_argument("--files-per-round", type=int, default=20, help="每轮处理的文件数")
+    parser.add_argument("--batch-size", type=int, help="每批嵌入的文本块数")
+    parser.add_argument("--concurrency", type=int, help="并发嵌入批次数")
+    parser.add_argument("--restart", action="store_true", help="忽略状态文件，重新入库全部材料")
+    parser.add_argument("--stream-threshold-mb", type=float, default=20, help="超过该大小的文件流式入库")
+    parser.add_argument("--refresh-metadata", action="store_true", help="为已入库的文本块补全规范化元数据")
+    parser.add_argument("--reshard", action="store_true", help="把未分片集合中的材料迁移到分片集合")
+    args = parser.parse_args()
+
+    if args.refresh_metadata or args.reshard:
+        rag_service = RAGService()
+        if args.reshard:
+            moved = rag_service.reshard_teaching_materials()
+            print(f"已迁移 {moved} 个文本块，各分片记录数: {rag_service.teaching_materials_collection.shard_counts()}")
+        if args.refresh_metadata:
+            updated = rag_service.refresh_material_metadata()
+            print(f"已更新 {updated} 个文本块的元数据")
+        rag_service.close()
+        if not args.directory:
+            return
+    elif not args.directory:
+        parser.error("需要指定材料目录")
+
+    if args.batch_size:
+        settings.embedding_batch_size = args.batch_size
+    if args.concurrency:
+        settings.embedding_max_concurrency = args.concurrency
+
+    ingest_directory(
+        args.directory,
+        subject=args.subject,
+        level=args.level,
+        extensions=[ext.strip().lower() for ext in args.extensions.split(",") if ext.strip()],
+        state_file=args.state_file,
+        files_per_round=args.files_per_round,
+        restart=args.restart,
+        stream_threshold_mb=args.stream_threshold_mb
+    )
+
+
+if __name__ == "__main__":
+    main()
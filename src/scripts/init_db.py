@@ -5,13 +5,15 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
+from src.core.config import ensure_directories
 from src.core.database import Base, engine
-from src.models import Student, Conversation, Message, LearningPlan, LearningProgress
+from src.models import Student, Conversation, Message, LearningPlan, LearningProgress, BackgroundJob
 
 
 def init_database():
     """初始化数据库"""
     print("开始初始化数据库...")
+    ensure_directories()
     
     # 创建所有表
     Base.metadata.create_all(bind=engine)
@@ -23,6 +25,7 @@ def init_database():
     print("- messages: 消息记录表")
     print("- learning_plans: 学习计划表")
     print("- learning_progress: 学习进度表")
+    print("- background_jobs: 后台任务表")
 
 
 if __name__ == "__main__":
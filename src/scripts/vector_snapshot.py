@@ -0,0 +1,85 @@
+"""
+向量集合快照导出/导入
+
+导出当前节点的集合（id、向量、文档、元数据）：
+    python -m src.scripts.vector_snapshot export ./snapshots/2024-06-01
+
+在新节点上复制快照目录后批量导入（直接写入向量，不重新生成嵌入）：
+    python -m src.scripts.vector_snapshot import ./snapshots/2024-06-01
+
+向量保存为可内存映射的 .npy 文件（可选 float16 减半体积），其余字段按列保存为 JSON；
+manifest.json 记录嵌入模型和各集合的记录数，最后写入，存在即表示快照完整。
+"""
+import argparse
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.services.rag_service import RAGService
+from src.services.vector_snapshot import read_manifest, snapshot_size
+
+
+def parse_collections(value: str) -> list:
+    return [name.strip() for name in value.split(",") if name.strip()] if value else None
+
+
+def export_command(args):
+    rag_service = RAGService()
+    started = time.time()
+    counts = rag_service.export_snapshot(
+        args.directory,
+        collections=parse_collections(args.collections),
+        dtype=args.dtype
+    )
+    rag_service.close()
+
+    for name, count in counts.items():
+        print(f"{name}: {count} 条记录，{snapshot_size(args.directory, name) / 1024 / 1024:.2f} MB")
+    print(f"导出完成，用时 {time.time() - started:.1f} 秒")
+
+
+def import_command(args):
+    manifest = read_manifest(args.directory)
+    print(f"快照嵌入模型: {manifest['embedding_model']}，精度: {manifest['dtype']}")
+
+    rag_service = RAGService()
+    started = time.time()
+    try:
+        counts = rag_service.import_snapshot(
+            args.directory,
+            collections=parse_collections(args.collections),
+            replace=not args.merge,
+            force=args.force
+        )
+    finally:
+        rag_service.close()
+
+    for name, count in counts.items():
+        print(f"{name}: 导入 {count} 条记录")
+    print(f"导入完成，用时 {time.time() - started:.1f} 秒")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量集合快照导出/导入")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="导出集合快照")
+    export_parser.add_argument("directory", help="快照目录")
+    export_parser.add_argument("--collections", help="要导出的集合，逗号分隔（默认全部）")
+    export_parser.add_argument("--dtype", default="float32", choices=["float32", "float16"], help="向量存储精度")
+    export_parser.set_defaults(func=export_command)
+
+    import_parser = subparsers.add_parser("import", help="从快照导入集合")
+    import_parser.add_argument("directory", help="快照目录")
+    import_parser.add_argument("--collections", help="要导入的集合，逗号分隔（默认快照中的全部集合）")
+    import_parser.add_argument("--merge", action="store_true", help="保留目标集合中已有的记录（默认先清空）")
+    import_parser.add_argument("--force", action="store_true", help="忽略嵌入模型不一致检查")
+    import_parser.set_defaults(func=import_command)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+对话上下文窗口 - 保留最近若干轮原文，更早的消息折叠进增量更新的摘要
+"""
+import json
+from typing import Callable, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+
+def parse_token_budgets(value: str) -> Dict[str, int]:
+    """解析"provider:tokens"逗号分隔的预算配置"""
+    budgets = {}
+    for item in value.split(","):
+        if ":" in item:
+            provider, tokens = item.split(":", 1)
+            budgets[provider.strip()] = int(tokens)
+    return budgets
+
+
+def load_summary(raw: Optional[str]) -> Dict:
+    """
+    读取Conversation.summary
+    存储格式为{"text": 摘要, "covered": 已折叠进摘要的消息数}；兼容纯文本摘要（视为未覆盖任何消息）
+    """
+    if not raw:
+        return {"text": "", "covered": 0}
+    try:
+        summary = json.loads(raw)
+        if isinstance(summary, dict) and "text" in summary:
+            return {"text": summary["text"], "covered": int(summary.get("covered", 0))}
+    except ValueError:
+        pass
+    return {"text": raw, "covered": 0}
+
+
+def dump_summary(text: str, covered: int) -> str:
+    return json.dumps({"text": text, "covered": covered}, ensure_ascii=False)
+
+
+class ContextWindow:
+    """
+    上下文窗口
+    最近keep_turns轮（每轮一问一答）保留原文；加上摘要后仍超出token预算时，继续把最早的消息移出窗口。
+    窗口之外的消息由后台任务合并进摘要，合并之前仍以原文发送，不会同时缺席摘要和原文；
+    后台摘要落后过多或未合并的消息超出预算时由调用方同步合并。keep_turns和token_budget为None时不限制
+    """
+    
+    def __init__(self,
+                 keep_turns: Optional[int],
+                 token_budget: Optional[int],
+                 count_tokens: Callable[[str], int]):
+        self.keep_turns = keep_turns
+        self.token_budget = token_budget
+        self.count_tokens = count_tokens
+    
+    def window_start(self, history: List[Dict], summary: Dict, reserved_tokens: int = 0) -> int:
+        """返回保留原文的第一条消息在history中的位置"""
+        start = summary["covered"]
+        if self.keep_turns is not None:
+            start = max(start, len(history) - self.keep_turns * 2)
+        if self.token_budget is None:
+            return start
+        
+        used = reserved_tokens + self.count_tokens(summary["text"])
+        tokens = [self.count_tokens(message["content"]) for message in history[start:]]
+        used += sum(tokens)
+        # 超出预算时从最早的消息开始移出窗口（至少保留最近一条）
+        for message_tokens in tokens[:-1]:
+            if used <= self.token_budget:
+                break
+            used -= message_tokens
+            start += 1
+        return start
+    
+    def needs_sync_fold(self, history: List[Dict], summary: Dict, reserved_tokens: int = 0) -> bool:
+        """
+        是否需要在本轮同步更新摘要：窗口外未合并的消息超过一个窗口（后台摘要落后过多），
+        或摘要加全部未合并消息超出token预算
+        """
+        covered = summary["covered"]
+        if self.window_start(history, summary, reserved_tokens) <= covered:
+            return False
+        if self.keep_turns is not None and len(history) - covered > self.keep_turns * 4:
+            return True
+        if self.token_budget is None:
+            return False
+        used = reserved_tokens + self.count_tokens(summary["text"])
+        used += sum(self.count_tokens(message["content"]) for message in history[covered:])
+        return used > self.token_budget
+    
+    def build_messages(self, history: List[Dict], summary: Dict, user_message: str) -> List[BaseMessage]:
+        """构建发给LLM的对话消息：摘要 + 尚未合并进摘要的历史消息 + 本轮用户消息"""
+        messages: List[BaseMessage] = []
+        if summary["text"]:
+            messages.append(SystemMessage(content=f"此前对话的摘要：\n{summary['text']}"))
+        for message in history[summary["covered"]:]:
+            if message["role"] == "user":
+                messages.append(HumanMessage(content=message["content"]))
+            elif message["role"] == "assistant":
+                messages.append(AIMessage(content=message["content"]))
+        messages.append(HumanMessage(content=user_message))
+        return messages
+    
+    def pending_fold(self, history: List[Dict], summary: Dict) -> Tuple[int, int]:
+        """下一轮对话时将移出窗口、需要折叠进摘要的消息范围[start, end)"""
+        return summary["covered"], self.window_start(history, summary)
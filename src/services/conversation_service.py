@@ -2,24 +2,44 @@
 对话管理服务
 """
 import json
-from typing import List, Dict, Optional, Tuple
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from sqlalchemy.orm import Session
-from langchain.schema import HumanMessage, AIMessage, SystemMessage
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 
 from ..models import Student, Conversation, Message, LearningPlan
 from ..models.conversation import ConversationStatus, MessageRole
 from .llm_service import LLMService
 from .rag_service import RAGService
-from ..core.database import get_db
+from .registry import service_registry
+from .context_window import ContextWindow, dump_summary, load_summary, parse_token_budgets
+from ..core.config import settings
+from ..core.database import SessionLocal
 
 
 class ConversationService:
     """对话管理服务类"""
     
-    def __init__(self, db: Session):
+    def __init__(self,
+                 db: Session,
+                 llm_service: Optional[LLMService] = None,
+                 rag_service: Optional[RAGService] = None):
         self.db = db
-        self.llm_service = LLMService()
-        self.rag_service = RAGService()
+        # 默认使用进程内共享的服务实例
+        self.llm_service = llm_service or service_registry.get_llm_service()
+        self.rag_service = rag_service or service_registry.get_rag_service()
+        self.job_runner = service_registry.get_job_runner()
+        self.context_window = self._build_context_window()
+    
+    def _build_context_window(self) -> ContextWindow:
+        """按配置和当前LLM提供商的token预算创建上下文窗口，关闭摘要时不限制历史长度"""
+        if not settings.context_summary_enabled:
+            return ContextWindow(None, None, self.llm_service.count_tokens)
+        budgets = parse_token_budgets(settings.context_token_budgets)
+        return ContextWindow(
+            settings.context_keep_turns,
+            budgets.get(settings.llm_provider),
+            self.llm_service.count_tokens
+        )
     
     async def start_conversation(self, student_id: str, initial_message: str) -> Dict:
         """开始新对话"""
@@ -80,6 +100,63 @@ class ConversationService:
     
     async def continue_conversation(self, conversation_id: str, user_message: str) -> Dict:
         """继续对话"""
+        turn = await self._prepare_continuation(conversation_id, user_message)
+        if "result" in turn:
+            return turn["result"]
+        
+        # 如果还没有生成响应，获取AI响应
+        if turn["response"] is None:
+            ai_response, usage_info = await self.llm_service.get_response(turn["messages"])
+        else:
+            ai_response, usage_info = turn["response"], {}
+        
+        result = self._finish_continuation(turn["conversation"], ai_response, usage_info, turn["plan_job_id"])
+        self._schedule_summary_update(conversation_id, turn["history_length"], turn["window_start"])
+        return result
+    
+    async def stream_continue_conversation(self,
+                                           conversation_id: str,
+                                           user_message: str) -> AsyncIterator[Dict]:
+        """
+        流式继续对话，依次产出事件：start（对话状态）、token（生成的文本片段）、done（与continue_conversation相同的结果）
+        生成完成后才保存AI响应；客户端中途断开时本轮对话不保存
+        """
+        turn = await self._prepare_continuation(conversation_id, user_message)
+        if "result" in turn:
+            yield {"event": "done", "data": turn["result"]}
+            return
+        
+        conversation = turn["conversation"]
+        yield {"event": "start", "data": {
+            "conversation_id": conversation_id,
+            "status": conversation.status.value,
+            "turn_count": conversation.turn_count
+        }}
+        
+        if turn["response"] is not None:
+            # 无需调用LLM的固定回复整段发送
+            ai_response, usage_info = turn["response"], {}
+            yield {"event": "token", "data": {"content": ai_response}}
+        else:
+            parts = []
+            route = {}
+            async for token in self.llm_service.stream_response(turn["messages"], route=route):
+                parts.append(token)
+                yield {"event": "token", "data": {"content": token}}
+            ai_response = "".join(parts)
+            usage_info = self.llm_service.estimate_usage(turn["messages"], ai_response, route.get("provider"))
+        
+        result = self._finish_continuation(conversation, ai_response, usage_info, turn["plan_job_id"])
+        self._schedule_summary_update(conversation_id, turn["history_length"], turn["window_start"])
+        yield {"event": "done", "data": result}
+    
+    async def _prepare_continuation(self, conversation_id: str, user_message: str) -> Dict:
+        """
+        准备一轮对话：保存用户消息、推进对话状态
+        返回conversation、messages（发给LLM的消息）、response（无需调用LLM时的固定回复，否则为None），
+        以及history_length（本轮之前的消息数）和window_start（窗口起点，此前的消息应合并进摘要）；
+        对话已结束时只返回result
+        """
         # 获取对话信息
         conversation = self.db.query(Conversation).filter(
             Conversation.id == conversation_id
@@ -89,44 +166,49 @@ class ConversationService:
         
         # 检查对话状态
         if conversation.status == ConversationStatus.COMPLETED:
-            return {
+            return {"result": {
                 "error": "对话已结束",
                 "status": conversation.status.value
-            }
+            }}
         
         # 获取学生信息
         student = conversation.student
         
-        # 保存用户消息
-        user_msg = Message(
-            conversation_id=conversation_id,
-            role=MessageRole.USER,
-            content=user_message
-        )
-        self.db.add(user_msg)
-        
-        # 获取对话历史
+        # 获取对话历史（本轮用户消息保存前查询）
         messages = self.db.query(Message).filter(
             Message.conversation_id == conversation_id
         ).order_by(Message.created_at).all()
         
         # 构建对话历史
         conversation_history = []
-        langchain_messages = []
-        
         for msg in messages:
             conversation_history.append({
                 "role": msg.role.value,
                 "content": msg.content
             })
-            
-            if msg.role == MessageRole.USER:
-                langchain_messages.append(HumanMessage(content=msg.content))
-            elif msg.role == MessageRole.ASSISTANT:
-                langchain_messages.append(AIMessage(content=msg.content))
+        history_length = len(conversation_history)
+        
+        # 发给LLM的消息：对话摘要 + 尚未合并进摘要的原文 + 本轮用户消息
+        summary = load_summary(conversation.summary) if settings.context_summary_enabled else load_summary(None)
+        reserved_tokens = self.llm_service.count_tokens(user_message)
+        window_start = self.context_window.window_start(conversation_history, summary, reserved_tokens)
+        if self.context_window.needs_sync_fold(conversation_history, summary, reserved_tokens):
+            summary = await self._fold_summary(conversation, conversation_history, summary, window_start)
+        langchain_messages = self.context_window.build_messages(conversation_history, summary, user_message)
+        
+        # 保存用户消息
+        user_msg = Message(
+            conversation_id=conversation_id,
+            role=MessageRole.USER,
+            content=user_message
+        )
+        self.db.add(user_msg)
+        conversation_history.append({"role": MessageRole.USER.value, "content": user_message})
         
         # 增加轮数
         conversation.turn_count += 1
+        ai_response = None
+        plan_job_id = None
         
         # 根据对话阶段生成不同的提示
         if conversation.status == ConversationStatus.ACTIVE:
@@ -146,64 +228,42 @@ class ConversationService:
             
         elif conversation.status == ConversationStatus.PLANNING:
             # 如果已经在计划制定阶段，检查是否应该生成计划
-            if "好的" in user_message or "可以" in user_message or "开始" in user_message:
-                # 生成学习计划
-                plan_dict = await self._generate_learning_plan(student, conversation_history)
-                
-                # 保存学习计划
-                learning_plan = LearningPlan(
-                    student_id=student.id,
-                    title=plan_dict.get("title", "个性化学习计划"),
-                    description=plan_dict.get("description", ""),
-                    objectives=plan_dict.get("objectives", []),
-                    content=plan_dict.get("content", {}),
-                    estimated_days=plan_dict.get("estimated_days", 30),
-                    difficulty_level=plan_dict.get("difficulty_level", 3)
-                )
-                self.db.add(learning_plan)
-                
-                # 更新对话状态
-                conversation.has_learning_plan = True
-                conversation.status = ConversationStatus.COMPLETED
-                
-                # 存储学习计划到RAG
-                self.rag_service.store_learning_plan(
-                    student.id,
-                    learning_plan.id,
-                    plan_dict
-                )
+            active_job_id = self.job_runner.find_active("learning_plan", conversation_id)
+            if active_job_id:
+                plan_job_id = active_job_id
+                ai_response = "学习计划正在生成中，请稍候，完成后我会立即通知您。"
                 
-                # 生成计划完成的响应
-                ai_response = f"""太好了！我已经为您制定了个性化的学习计划。
-
-计划标题：{plan_dict.get('title')}
-预计学习时长：{plan_dict.get('estimated_days')}天
-难度级别：{plan_dict.get('difficulty_level')}/5
-
-主要学习目标：
-{chr(10).join([f"- {obj}" for obj in plan_dict.get('objectives', [])])}
-
-现在您可以开始学习了！如果您需要开始具体的学习内容，请告诉我您想学习哪个部分。"""
+            elif "好的" in user_message or "可以" in user_message or "开始" in user_message:
+                # 学习计划在后台任务中生成，本轮对话立即返回任务ID
+                plan_job_id = self._submit_learning_plan_job(student, conversation_id, conversation_history)
+                ai_response = "好的！我正在根据我们的对话为您制定个性化的学习计划，这需要一点时间，完成后会立即通知您。"
                 
             else:
                 # 继续确认是否要制定计划
                 prompt = "我理解您可能还有疑问。请告诉我您还想了解什么，或者如果您准备好了，我们可以开始制定学习计划。"
                 langchain_messages.insert(0, SystemMessage(content=prompt))
-                ai_response, usage_info = await self.llm_service.get_response(langchain_messages)
         
         else:
             # 已完成状态
             ai_response = "我们的初步评估对话已经完成。如果您想开始学习，请告诉我您想学习的具体内容。"
         
-        # 如果还没有生成响应，获取AI响应
-        if 'ai_response' not in locals():
-            ai_response, usage_info = await self.llm_service.get_response(langchain_messages)
-        else:
-            usage_info = {}
-        
-        # 保存AI响应
+        return {
+            "conversation": conversation,
+            "messages": langchain_messages,
+            "response": ai_response,
+            "plan_job_id": plan_job_id,
+            "history_length": history_length,
+            "window_start": window_start
+        }
+    
+    def _finish_continuation(self,
+                             conversation: Conversation,
+                             ai_response: str,
+                             usage_info: Dict,
+                             plan_job_id: Optional[str] = None) -> Dict:
+        """保存AI响应并提交本轮对话，返回对话结果"""
         ai_msg = Message(
-            conversation_id=conversation_id,
+            conversation_id=conversation.id,
             role=MessageRole.ASSISTANT,
             content=ai_response,
             meta_data=json.dumps(usage_info) if usage_info else None
@@ -213,20 +273,162 @@ class ConversationService:
         self.db.commit()
         
         return {
-            "conversation_id": conversation_id,
+            "conversation_id": conversation.id,
             "response": ai_response,
             "status": conversation.status.value,
             "turn_count": conversation.turn_count,
-            "has_learning_plan": conversation.has_learning_plan
+            "has_learning_plan": conversation.has_learning_plan,
+            "plan_job_id": plan_job_id
+        }
+    
+    def _schedule_summary_update(self, conversation_id: str, history_length: int, window_start: int):
+        """
+        本轮结束后，若有消息已经或即将移出上下文窗口，提交后台任务把它们折叠进对话摘要
+        摘要更新不在请求路径上，下一轮对话开始前通常已经完成
+        """
+        if not settings.context_summary_enabled:
+            return
+        # 本轮新增一问一答后的消息数超出保留轮数，或本轮已有消息因token预算移出窗口
+        overflow = history_length + 2 - settings.context_keep_turns * 2
+        if max(overflow, window_start) <= 0:
+            return
+        if self.job_runner.find_active("conversation_summary", conversation_id):
+            return
+        
+        async def run():
+            return await self._run_summary_job(conversation_id)
+        
+        self.job_runner.submit("conversation_summary", run, key=conversation_id)
+    
+    async def _fold_summary(self,
+                            conversation: Conversation,
+                            history: List[Dict],
+                            summary: Dict,
+                            end: int) -> Dict:
+        """同步把history[covered:end]合并进摘要（随本轮对话一起提交），返回新的摘要"""
+        text = await self.llm_service.asummarize_conversation(
+            summary["text"], history[summary["covered"]:end], settings.context_summary_max_chars
+        )
+        conversation.summary = dump_summary(text, end)
+        return {"text": text, "covered": end}
+    
+    async def _run_summary_job(self, conversation_id: str) -> Optional[Dict]:
+        """后台更新对话摘要：把下一轮将移出窗口且尚未摘要的消息合并进摘要（使用独立的数据库会话）"""
+        db = SessionLocal()
+        try:
+            conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
+            if not conversation:
+                return None
+            history = [
+                {"role": msg.role.value, "content": msg.content}
+                for msg in db.query(Message).filter(
+                    Message.conversation_id == conversation_id
+                ).order_by(Message.created_at).all()
+            ]
+            summary = load_summary(conversation.summary)
+        finally:
+            db.close()
+        
+        start, end = self.context_window.pending_fold(history, summary)
+        if end <= start:
+            return {"covered": start}
+        
+        text = await self.llm_service.asummarize_conversation(
+            summary["text"], history[start:end], settings.context_summary_max_chars
+        )
+        
+        db = SessionLocal()
+        try:
+            conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
+            # 生成期间摘要已被其他进程更新时放弃本次结果
+            if load_summary(conversation.summary)["covered"] != start:
+                return None
+            conversation.summary = dump_summary(text, end)
+            db.commit()
+        finally:
+            db.close()
+        
+        return {"covered": end, "summary_chars": len(text)}
+    
+    def _submit_learning_plan_job(self, student: Student, conversation_id: str, conversation_history: List[Dict]) -> str:
+        """提交学习计划生成任务，返回任务ID"""
+        student_id = student.id
+        student_info = student.to_dict()
+        conversation_summary = self._summarize_for_plan(conversation_history)
+        
+        async def run():
+            return await self._run_learning_plan_job(student_id, student_info, conversation_id, conversation_summary)
+        
+        return self.job_runner.submit("learning_plan", run, key=conversation_id)
+    
+    async def _run_learning_plan_job(self,
+                                     student_id: str,
+                                     student_info: Dict,
+                                     conversation_id: str,
+                                     conversation_summary: Dict) -> Dict:
+        """
+        后台生成学习计划：调用LLM生成计划，保存计划并结束对话，把计划介绍作为AI消息追加到对话中
+        任务在请求结束后运行，使用独立的数据库会话
+        """
+        plan_dict = await self.llm_service.acreate_learning_plan(student_info, conversation_summary)
+        
+        db = SessionLocal()
+        try:
+            # 保存学习计划
+            learning_plan = LearningPlan(
+                student_id=student_id,
+                title=plan_dict.get("title", "个性化学习计划"),
+                description=plan_dict.get("description", ""),
+                objectives=plan_dict.get("objectives", []),
+                content=plan_dict.get("content", {}),
+                estimated_days=plan_dict.get("estimated_days", 30),
+                difficulty_level=plan_dict.get("difficulty_level", 3)
+            )
+            db.add(learning_plan)
+            
+            # 更新对话状态
+            conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
+            conversation.has_learning_plan = True
+            conversation.status = ConversationStatus.COMPLETED
+            
+            # 生成计划完成的响应
+            ai_response = f"""太好了！我已经为您制定了个性化的学习计划。
+
+计划标题：{plan_dict.get('title')}
+预计学习时长：{plan_dict.get('estimated_days')}天
+难度级别：{plan_dict.get('difficulty_level')}/5
+
+主要学习目标：
+{chr(10).join([f"- {obj}" for obj in plan_dict.get('objectives', [])])}
+
+现在您可以开始学习了！如果您需要开始具体的学习内容，请告诉我您想学习哪个部分。"""
+            db.add(Message(
+                conversation_id=conversation_id,
+                role=MessageRole.ASSISTANT,
+                content=ai_response
+            ))
+            db.commit()
+            learning_plan_id = learning_plan.id
+        finally:
+            db.close()
+        
+        # 存储学习计划到RAG
+        await self.rag_service.astore_learning_plan(student_id, learning_plan_id, plan_dict)
+        
+        return {
+            "learning_plan_id": learning_plan_id,
+            "conversation_id": conversation_id,
+            "response": ai_response,
+            "plan": plan_dict
         }
     
-    async def _generate_learning_plan(self, student: Student, conversation_history: List[Dict]) -> Dict:
-        """生成学习计划"""
+    def _summarize_for_plan(self, conversation_history: List[Dict]) -> Dict:
+        """从对话历史中提取制定学习计划所需的对话总结"""
         # 分析对话历史，提取关键信息
         key_info = self.llm_service._analyze_conversation(conversation_history)
         
         # 创建对话总结
-        conversation_summary = {
+        return {
             "learning_goals": key_info.get("learning_goals", []),
             "background": key_info.get("background", ""),
             "preferred_style": key_info.get("preferred_style", ""),
@@ -234,14 +436,6 @@ class ConversationService:
             "current_level": key_info.get("current_level", ""),
             "challenges": key_info.get("challenges", [])
         }
-        
-        # 生成学习计划
-        plan_dict = self.llm_service.create_learning_plan(
-            student.to_dict(),
-            conversation_summary
-        )
-        
-        return plan_dict
     
     def get_conversation_history(self, conversation_id: str) -> List[Dict]:
         """获取对话历史"""
@@ -0,0 +1,96 @@
+"""
+近重复检测 - 相似度换算与重复关系记录
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+def similarity_from_distance(distance: float) -> float:
+    """
+    由平方欧氏距离换算余弦相似度
+    嵌入向量均已归一化，此时 ||a - b||^2 = 2 - 2cos(a, b)
+    """
+    return 1 - distance / 2
+
+
+class DuplicateLinkStore:
+    """重复关系存储（SQLite）：记录被判定为近重复、未单独入库的条目及其对应的保留条目"""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS links (
+                collection TEXT NOT NULL,
+                id TEXT NOT NULL,
+                canonical_id TEXT NOT NULL,
+                similarity REAL NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (collection, id)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_links_canonical ON links (collection, canonical_id)")
+        self._conn.commit()
+
+    def put(self, collection: str, item_id: str, canonical_id: str, similarity: float):
+        """记录item_id是canonical_id的近重复（已链接到canonical_id的条目一并改为指向新的保留条目）"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE links SET canonical_id = ? WHERE collection = ? AND canonical_id = ?",
+                (canonical_id, collection, item_id)
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO links (collection, id, canonical_id, similarity, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (collection, item_id, canonical_id, similarity, time.time())
+            )
+            self._conn.commit()
+
+    def resolve(self, collection: str, item_id: str) -> Optional[str]:
+        """返回条目对应的保留条目ID，未记录时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT canonical_id FROM links WHERE collection = ? AND id = ?",
+                (collection, item_id)
+            ).fetchone()
+        return row[0] if row else None
+
+    def linked_ids(self, collection: str, canonical_id: str) -> List[str]:
+        """链接到某保留条目的全部条目ID"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM links WHERE collection = ? AND canonical_id = ? ORDER BY created_at",
+                (collection, canonical_id)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def delete(self, collection: str, item_id: str):
+        """删除条目自身的链接及指向它的链接"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM links WHERE collection = ? AND (id = ? OR canonical_id = ?)",
+                (collection, item_id, item_id)
+            )
+            self._conn.commit()
+
+    def clear(self, collection: str):
+        """清空某集合的全部链接"""
+        with self._lock:
+            self._conn.execute("DELETE FROM links WHERE collection = ?", (collection,))
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """各集合的链接数"""
+        with self._lock:
+            rows = self._conn.execute("SELECT collection, COUNT(*) FROM links GROUP BY collection").fetchall()
+        return dict(rows)
+
+    def close(self):
+        """关闭连接"""
+        with self._lock:
+            self._conn.close()
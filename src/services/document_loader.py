@@ -0,0 +1,156 @@
+"""
+流式文档加载 - 按块读取大型文档并惰性切分文本
+"""
+from typing import Iterable, Iterator, List
+
+
+def iter_file_blocks(path: str, block_size: int = 64 * 1024, encoding: str = "utf-8") -> Iterator[str]:
+    """按固定大小逐块读取文本文件"""
+    with open(path, "r", encoding=encoding) as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            yield block
+
+
+class _StreamingMerger:
+    """
+    逐个接收小于chunk_size的片段并合并为重叠的文本块
+    与RecursiveCharacterTextSplitter._merge_splits的合并规则一致（分隔符保留在片段开头，按空串拼接）
+    """
+
+    def __init__(self, chunk_size: int, chunk_overlap: int):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.current: List[str] = []
+        self.total = 0
+
+    def add(self, split: str) -> Iterator[str]:
+        length = len(split)
+        if self.total + length > self.chunk_size and self.current:
+            chunk = "".join(self.current).strip()
+            if chunk:
+                yield chunk
+            # 保留末尾不超过chunk_overlap的片段作为下一个文本块的重叠部分
+            while self.total > self.chunk_overlap or (self.total + length > self.chunk_size and self.total > 0):
+                self.total -= len(self.current[0])
+                self.current = self.current[1:]
+        self.current.append(split)
+        self.total += length
+
+    def flush(self) -> Iterator[str]:
+        chunk = "".join(self.current).strip()
+        if chunk:
+            yield chunk
+        self.current = []
+        self.total = 0
+
+
+class _StreamingSplitter:
+    """
+    按分隔符流式切分文本，规则与RecursiveCharacterTextSplitter一致：
+    以首选分隔符切出片段（分隔符保留在片段开头），小片段交给合并器，超长片段用后续分隔符递归切分。
+    当前未结束的片段达到chunk_size时已可确定它是超长片段，此后的文本直接流入下一级分隔符的切分器，
+    缓冲区只保留可能构成分隔符的末尾几个字符
+    """
+
+    def __init__(self, chunk_size: int, chunk_overlap: int, separators: List[str]):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separator = separators[0]
+        self.rest = separators[1:]
+        self.merger = _StreamingMerger(chunk_size, chunk_overlap)
+        self.buffer = ""
+        self.scan_from = 0  # 缓冲区中尚未查找分隔符的起始位置
+        self.found = False
+        self.child = None  # 当前超长片段的下一级切分器
+
+    def _child(self) -> "_StreamingSplitter":
+        return _StreamingSplitter(self.chunk_size, self.chunk_overlap, self.rest)
+
+    def _process(self, piece: str) -> Iterator[str]:
+        """处理一个完整的片段"""
+        if not piece:
+            return
+        if len(piece) < self.chunk_size:
+            yield from self.merger.add(piece)
+            return
+        yield from self.merger.flush()
+        if not self.rest:
+            yield piece
+            return
+        child = self._child()
+        yield from child.feed(piece)
+        yield from child.finish()
+
+    def _end_piece(self, tail: str) -> Iterator[str]:
+        """当前片段在tail处结束"""
+        if self.child is None:
+            yield from self._process(tail)
+            return
+        yield from self.child.feed(tail)
+        yield from self.child.finish()
+        self.child = None
+
+    def feed(self, text: str) -> Iterator[str]:
+        if not self.separator:
+            # 逐字符切分
+            for char in text:
+                yield from self._process(char)
+            return
+
+        buffer = self.buffer + text
+        start = 0
+        while True:
+            position = buffer.find(self.separator, self.scan_from)
+            if position < 0:
+                break
+            yield from self._end_piece(buffer[start:position])
+            self.found = True
+            start = position
+            self.scan_from = position + len(self.separator)
+        self.buffer = buffer[start:]
+        self.scan_from -= start
+
+        if self.child is None and self.rest and len(self.buffer) >= self.chunk_size:
+            # 当前片段已确定超长（全文不含首选分隔符时同样按后续分隔符切分）
+            yield from self.merger.flush()
+            self.child = self._child()
+        # 之后的分隔符只可能从这里开始
+        cut = max(self.scan_from, len(self.buffer) - len(self.separator) + 1)
+        if self.child is not None:
+            yield from self.child.feed(self.buffer[:cut])
+            self.buffer = self.buffer[cut:]
+            self.scan_from = 0
+        else:
+            self.scan_from = cut
+
+    def finish(self) -> Iterator[str]:
+        if self.child is not None:
+            yield from self._end_piece(self.buffer)
+        elif not self.found and self.rest:
+            # 全文不含首选分隔符，与一次性切分一样改用后续分隔符
+            child = self._child()
+            yield from child.feed(self.buffer)
+            yield from child.finish()
+        else:
+            yield from self._process(self.buffer)
+        yield from self.merger.flush()
+        self.buffer = ""
+
+
+def iter_chunks(blocks: Iterable[str],
+                chunk_size: int = 1000,
+                chunk_overlap: int = 200,
+                separators: List[str] = None) -> Iterator[str]:
+    """
+    将文本块流切分为重叠的文本片段（生成器），结果与RecursiveCharacterTextSplitter一次性切分完全相同
+    每个文本块只查找一次分隔符；没有段落分隔的长文本按后续分隔符逐级流式切分，
+    内存占用与chunk_size和读取块大小相关，与文档大小无关
+    """
+    separators = separators or ["\n\n", "\n", "。", "！", "？", ".", "!", "?", " ", ""]
+    splitter = _StreamingSplitter(chunk_size, chunk_overlap, separators)
+    for block in blocks:
+        yield from splitter.feed(block)
+    yield from splitter.finish()
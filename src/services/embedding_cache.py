@@ -0,0 +1,222 @@
+"""
+嵌入向量缓存 - 按(嵌入模型, 文本哈希)缓存向量，避免重复计算
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import List, Dict, Optional
+
+
+class EmbeddingCache:
+    """两级嵌入向量缓存：内存LRU + SQLite磁盘"""
+
+    def __init__(self, path: str, memory_size: int = 10000, max_disk_mb: int = 1024):
+        self.memory_size = memory_size
+        self.max_disk_bytes = max_disk_mb * 1024 * 1024
+
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)")
+        self._conn.commit()
+
+        row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()
+        self._disk_bytes = row[0]
+
+        # 命中统计
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        """生成缓存键"""
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _serialize(vector: List[float]) -> bytes:
+        return array("f", vector).tobytes()
+
+    @staticmethod
+    def _deserialize(blob: bytes) -> List[float]:
+        vector = array("f")
+        vector.frombytes(blob)
+        return vector.tolist()
+
+    def _remember(self, key: str, vector: List[float]):
+        """写入内存LRU（调用方需持有锁）"""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: List[str]) -> List[Optional[List[float]]]:
+        """批量查询，未命中的位置返回None"""
+        results: List[Optional[List[float]]] = [None] * len(keys)
+        disk_lookup: Dict[str, List[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    results[i] = vector
+                    self.memory_hits += 1
+                else:
+                    disk_lookup.setdefault(key, []).append(i)
+
+            if not disk_lookup:
+                return results
+
+            found = {}
+            pending = list(disk_lookup.keys())
+            # SQLite单条语句的参数个数有限，分批查询
+            for start in range(0, len(pending), 500):
+                batch = pending[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = self._deserialize(blob)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+            for key, positions in disk_lookup.items():
+                vector = found.get(key)
+                if vector is None:
+                    self.misses += len(positions)
+                    continue
+                self.disk_hits += len(positions)
+                self._remember(key, vector)
+                for i in positions:
+                    results[i] = vector
+
+        return results
+
+    def put_many(self, keys: List[str], vectors: List[List[float]]):
+        """批量写入缓存"""
+        if not keys:
+            return
+
+        now = time.time()
+        rows = []
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector)
+                blob = self._serialize(vector)
+                rows.append((key, blob, len(blob), now))
+
+            for key, _, size, _ in rows:
+                existing = self._conn.execute("SELECT size FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if existing:
+                    self._disk_bytes -= existing[0]
+                self._disk_bytes += size
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, size, last_access) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _evict_disk(self):
+        """按最近访问时间淘汰磁盘缓存，直到降到上限的90%（调用方需持有锁）"""
+        target = int(self.max_disk_bytes * 0.9)
+        while self._disk_bytes > target:
+            rows = self._conn.execute(
+                "SELECT key, size FROM embeddings ORDER BY last_access LIMIT 1000"
+            ).fetchall()
+            if not rows:
+                self._disk_bytes = 0
+                break
+
+            evicted = []
+            for key, size in rows:
+                if self._disk_bytes <= target:
+                    break
+                evicted.append((key,))
+                self._disk_bytes -= size
+
+            self._conn.executemany("DELETE FROM embeddings WHERE key = ?", evicted)
+            self.evictions += len(evicted)
+        self._conn.commit()
+
+    def stats(self) -> Dict:
+        """缓存命中统计"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+                "evictions": self.evictions
+            }
+
+    def close(self):
+        """关闭磁盘缓存连接"""
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings:
+    """
+    带缓存的嵌入模型包装器，接口与LangChain Embeddings一致
+    embed_query与embed_documents共享缓存（当前使用的OpenAI与sentence-transformers模型两者结果相同）
+    """
+
+    def __init__(self, embeddings, model_name: str, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [EmbeddingCache.make_key(self.model_name, text) for text in texts]
+        results = self.cache.get_many(keys)
+
+        # 收集未命中的文本（同一批次内的重复文本只计算一次）
+        missing: Dict[str, str] = {}
+        for key, text, vector in zip(keys, texts, results):
+            if vector is None and key not in missing:
+                missing[key] = text
+
+        if missing:
+            missing_keys = list(missing.keys())
+            vectors = self.embeddings.embed_documents([missing[key] for key in missing_keys])
+            self.cache.put_many(missing_keys, vectors)
+            computed = dict(zip(missing_keys, vectors))
+            results = [vector if vector is not None else computed[key] for key, vector in zip(keys, results)]
+
+        return results
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
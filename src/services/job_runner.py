@@ -0,0 +1,177 @@
+"""
+后台任务执行器 - 在事件循环中异步执行耗时任务（如学习计划生成），客户端轮询或订阅任务状态
+"""
+import asyncio
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class JobRunner:
+    """
+    进程内异步任务执行器
+    任务以asyncio.Task在后台运行，按任务类型限制并发数；结束的任务保留result_ttl_seconds供查询。
+    提供store时任务状态同时写入存储，其他worker进程或重启后的进程可通过get、wait查询；
+    并发限制和find_active只对本进程提交的任务生效。
+    """
+
+    def __init__(self, result_ttl_seconds: float = 3600, store=None, poll_interval: float = 1.0):
+        self.result_ttl_seconds = result_ttl_seconds
+        self.store = store
+        self.poll_interval = poll_interval  # 等待其他进程的任务时查询存储的间隔
+
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._events: Dict[str, asyncio.Event] = {}
+        self._limits: Dict[str, int] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def set_limit(self, kind: str, max_concurrency: int):
+        """设置某类任务的最大并发数"""
+        self._limits[kind] = max_concurrency
+
+    def _semaphore(self, kind: str) -> Optional[asyncio.Semaphore]:
+        if kind not in self._limits:
+            return None
+        if kind not in self._semaphores:
+            self._semaphores[kind] = asyncio.Semaphore(self._limits[kind])
+        return self._semaphores[kind]
+
+    def _purge(self):
+        """清理超过保留时间的已结束任务"""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished_at"] and now - job["finished_at"] > self.result_ttl_seconds
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+            self._events.pop(job_id, None)
+        if self.store is not None:
+            try:
+                self.store.purge(now - self.result_ttl_seconds)
+            except Exception as e:
+                print(f"清理任务记录失败: {str(e)}")
+
+    def _save(self, job_id: str):
+        """把任务状态写入存储（写入失败不影响任务执行）"""
+        if self.store is None:
+            return
+        try:
+            self.store.save(self._jobs[job_id])
+        except Exception as e:
+            print(f"保存任务状态失败: {str(e)}")
+
+    def submit(self, kind: str, func: Callable[[], Awaitable[Any]], key: Optional[str] = None) -> str:
+        """
+        提交任务（须在事件循环中调用），立即返回任务ID
+        key用于标识任务所属对象（如对话ID），可通过find_active查询该对象是否有未结束的任务
+        """
+        self._purge()
+        job_id = str(uuid.uuid4())
+        self._jobs[job_id] = {
+            "id": job_id,
+            "kind": kind,
+            "key": key,
+            "status": "pending",
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None
+        }
+        self._events[job_id] = asyncio.Event()
+        self._save(job_id)
+        task = asyncio.get_running_loop().create_task(self._run(job_id, kind, func))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+        return job_id
+
+    async def _run(self, job_id: str, kind: str, func: Callable[[], Awaitable[Any]]):
+        job = self._jobs[job_id]
+        semaphore = self._semaphore(kind)
+        try:
+            if semaphore:
+                await semaphore.acquire()
+            try:
+                job["status"] = "running"
+                job["started_at"] = time.time()
+                self._save(job_id)
+                job["result"] = await func()
+                job["status"] = "succeeded"
+            finally:
+                if semaphore:
+                    semaphore.release()
+        except asyncio.CancelledError:
+            job["status"] = "cancelled"
+            raise
+        except Exception as e:
+            print(f"后台任务 {kind} 失败: {str(e)}")
+            job["status"] = "failed"
+            job["error"] = str(e)
+        finally:
+            job["finished_at"] = time.time()
+            self._save(job_id)
+            self._events[job_id].set()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """查询任务状态（不是本进程提交的任务从存储中读取）"""
+        job = self._jobs.get(job_id)
+        if job:
+            return dict(job)
+        if self.store is None:
+            return None
+        try:
+            return self.store.load(job_id)
+        except Exception as e:
+            print(f"读取任务状态失败: {str(e)}")
+            return None
+
+    def find_active(self, kind: str, key: str) -> Optional[str]:
+        """查找某对象未结束的任务ID"""
+        for job_id, job in self._jobs.items():
+            if job["kind"] == kind and job["key"] == key and job["status"] in ("pending", "running"):
+                return job_id
+        return None
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """等待任务结束（最多timeout秒），返回任务状态"""
+        event = self._events.get(job_id)
+        if event is None:
+            return await self._poll(job_id, timeout)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.get(job_id)
+
+    async def _poll(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """按poll_interval查询存储，等待其他进程的任务结束"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        job = self.get(job_id)
+        while job is not None and job["finished_at"] is None:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(self.poll_interval, remaining))
+            job = self.get(job_id)
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        """各状态的任务数"""
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return counts
+
+    async def shutdown(self, timeout: float = 30):
+        """等待运行中的任务结束，超时后取消"""
+        tasks = list(self._tasks.values())
+        if not tasks:
+            return
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
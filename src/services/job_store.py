@@ -0,0 +1,50 @@
+"""
+后台任务状态存储 - 把任务状态和结果写入数据库，供其他worker进程和重启后的进程查询
+"""
+import json
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from ..core.database import SessionLocal
+from ..models import BackgroundJob
+
+
+class DatabaseJobStore:
+    """任务状态存储（background_jobs表）"""
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+
+    def save(self, job: Dict[str, Any]):
+        """写入任务的当前状态（结果须可序列化为JSON，否则按字符串保存）"""
+        values = dict(job)
+        values["result"] = json.loads(json.dumps(values["result"], ensure_ascii=False, default=str))
+        db = self.session_factory()
+        try:
+            db.merge(BackgroundJob(**values))
+            db.commit()
+        finally:
+            db.close()
+
+    def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """读取任务状态，不存在时返回None"""
+        db = self.session_factory()
+        try:
+            job = db.query(BackgroundJob).filter(BackgroundJob.id == job_id).first()
+            return job.to_dict() if job else None
+        finally:
+            db.close()
+
+    def purge(self, finished_before: float) -> int:
+        """删除在指定时间之前结束的任务，返回删除数"""
+        db = self.session_factory()
+        try:
+            deleted = db.query(BackgroundJob).filter(
+                BackgroundJob.finished_at.isnot(None),
+                BackgroundJob.finished_at < finished_before
+            ).delete(synchronize_session=False)
+            db.commit()
+            return deleted
+        finally:
+            db.close()
@@ -0,0 +1,187 @@
+"""
+词法检索索引 - 基于SQLite倒排表的BM25检索，支持中文
+"""
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from typing import List, Dict, Any, Optional
+
+from .metadata_filter import matches_where
+
+
+# 中文（含扩展区与兼容区）连续片段，或英文/数字单词
+TOKEN_PATTERN = re.compile(r'[㐀-䶿一-鿿豈-﫿]+|[A-Za-z0-9_]+')
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    分词：中文片段切分为字符二元组（单字片段保留单字），英文和数字按单词切分并转小写
+    """
+    tokens = []
+    for segment in TOKEN_PATTERN.findall(text):
+        if segment[0].isascii():
+            tokens.append(segment.lower())
+        elif len(segment) == 1:
+            tokens.append(segment)
+        else:
+            tokens.extend(segment[i:i + 2] for i in range(len(segment) - 1))
+    return tokens
+
+
+class BM25Index:
+    """持久化的BM25倒排索引"""
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id TEXT PRIMARY KEY,
+                length INTEGER NOT NULL,
+                document TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS postings (
+                token TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (token, doc_id)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_doc_id ON postings(doc_id)")
+        self._conn.commit()
+
+        # 文档长度常驻内存，用于BM25长度归一化
+        self._lengths: Dict[str, int] = dict(
+            self._conn.execute("SELECT doc_id, length FROM documents").fetchall()
+        )
+        self._total_length = sum(self._lengths.values())
+
+    def count(self) -> int:
+        """索引中的文档数"""
+        return len(self._lengths)
+
+    def _delete_locked(self, ids: List[str]):
+        """删除文档（调用方需持有锁）"""
+        existing = [doc_id for doc_id in ids if doc_id in self._lengths]
+        if not existing:
+            return
+        self._conn.executemany("DELETE FROM postings WHERE doc_id = ?", [(doc_id,) for doc_id in existing])
+        self._conn.executemany("DELETE FROM documents WHERE doc_id = ?", [(doc_id,) for doc_id in existing])
+        for doc_id in existing:
+            self._total_length -= self._lengths.pop(doc_id)
+
+    def add_documents(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]):
+        """添加或覆盖文档"""
+        with self._lock:
+            self._delete_locked(ids)
+
+            document_rows = []
+            posting_rows = []
+            for doc_id, document, metadata in zip(ids, documents, metadatas):
+                term_counts = Counter(tokenize(document))
+                length = sum(term_counts.values())
+                document_rows.append((doc_id, length, document, json.dumps(metadata, ensure_ascii=False)))
+                posting_rows.extend((token, doc_id, tf) for token, tf in term_counts.items())
+                self._lengths[doc_id] = length
+                self._total_length += length
+
+            self._conn.executemany(
+                "INSERT INTO documents (doc_id, length, document, metadata) VALUES (?, ?, ?, ?)",
+                document_rows
+            )
+            self._conn.executemany(
+                "INSERT INTO postings (token, doc_id, tf) VALUES (?, ?, ?)",
+                posting_rows
+            )
+            self._conn.commit()
+
+    def delete(self, ids: List[str]):
+        """删除文档"""
+        with self._lock:
+            self._delete_locked(ids)
+            self._conn.commit()
+
+    def clear(self):
+        """清空索引"""
+        with self._lock:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM documents")
+            self._conn.commit()
+            self._lengths = {}
+            self._total_length = 0
+
+    def _load_documents(self, ids: List[str]) -> Dict[str, tuple]:
+        """批量读取文档内容和元数据（调用方需持有锁）"""
+        rows = {}
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            for doc_id, document, metadata in self._conn.execute(
+                f"SELECT doc_id, document, metadata FROM documents WHERE doc_id IN ({placeholders})",
+                batch
+            ):
+                rows[doc_id] = (document, json.loads(metadata))
+        return rows
+
+    def search(self, query: str, k: int = 5, where: Optional[Dict[str, Any]] = None) -> List[Dict]:
+        """BM25检索，where为ChromaDB风格的元数据过滤条件"""
+        query_tokens = set(tokenize(query))
+
+        with self._lock:
+            doc_count = len(self._lengths)
+            if not query_tokens or doc_count == 0:
+                return []
+            avg_length = self._total_length / doc_count
+
+            scores: Dict[str, float] = {}
+            for token in query_tokens:
+                rows = self._conn.execute(
+                    "SELECT doc_id, tf FROM postings WHERE token = ?", (token,)
+                ).fetchall()
+                if not rows:
+                    continue
+                df = len(rows)
+                idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+                for doc_id, tf in rows:
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+            # 按得分从高到低分批读取文档并过滤，凑满k个为止
+            results = []
+            batch_size = max(k * 4, 50)
+            for start in range(0, len(ranked), batch_size):
+                batch = ranked[start:start + batch_size]
+                documents = self._load_documents([doc_id for doc_id, _ in batch])
+                for doc_id, score in batch:
+                    document, metadata = documents[doc_id]
+                    if not matches_where(metadata, where):
+                        continue
+                    results.append({
+                        'id': doc_id,
+                        'content': document,
+                        'metadata': metadata,
+                        'score': score
+                    })
+                    if len(results) >= k:
+                        return results
+
+        return results
+
+    def close(self):
+        """关闭索引连接"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,184 @@
+"""
+LLM HTTP客户端 - 进程内共享的连接池（长连接、可选HTTP/2），并统计连接复用情况
+"""
+import importlib.util
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from ..core.config import settings
+
+
+class ConnectionStats:
+    """连接复用统计：通过httpcore的trace扩展记录新建连接、TLS握手和请求数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+
+    def record(self, event_name: str):
+        with self._lock:
+            if event_name in ("http11.send_request_headers.started", "http2.send_request_headers.started"):
+                self.requests += 1
+            elif event_name == "connection.connect_tcp.complete":
+                self.connections += 1
+            elif event_name == "connection.start_tls.complete":
+                self.tls_handshakes += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            reused = max(self.requests - self.connections, 0)
+            return {
+                "requests": self.requests,
+                "connections": self.connections,
+                "tls_handshakes": self.tls_handshakes,
+                "reused": reused,
+                "reuse_rate": round(reused / self.requests, 3) if self.requests else None
+            }
+
+
+class LLMClientPool:
+    """
+    进程级LLM客户端工厂
+    每个提供商共享一组httpx同步/异步客户端（连接池大小、keep-alive、超时由配置决定），
+    以及基于它们创建的SDK客户端，避免每次创建服务或调用时重新建立TCP+TLS连接
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._http_clients: Dict[str, Tuple[Any, Any]] = {}
+        self._sdk_clients: Dict[str, Tuple[Any, Any]] = {}
+        self._stats: Dict[str, ConnectionStats] = {}
+
+    @staticmethod
+    def http2_enabled() -> bool:
+        """HTTP/2需要安装h2，未安装时退回HTTP/1.1"""
+        return settings.llm_http2 and importlib.util.find_spec("h2") is not None
+
+    def _create_http_clients(self, name: str) -> Tuple[Any, Any]:
+        import httpx
+
+        stats = self._stats.setdefault(name, ConnectionStats())
+
+        def trace(event_name: str, info: Dict[str, Any]):
+            stats.record(event_name)
+
+        async def atrace(event_name: str, info: Dict[str, Any]):
+            stats.record(event_name)
+
+        def on_request(request):
+            request.extensions["trace"] = trace
+
+        async def aon_request(request):
+            request.extensions["trace"] = atrace
+
+        limits = httpx.Limits(
+            max_connections=settings.llm_max_connections,
+            max_keepalive_connections=settings.llm_max_keepalive_connections,
+            keepalive_expiry=settings.llm_keepalive_expiry
+        )
+        timeout = httpx.Timeout(settings.llm_request_timeout, connect=settings.llm_connect_timeout)
+        http2 = self.http2_enabled()
+        return (
+            httpx.Client(limits=limits, timeout=timeout, http2=http2, event_hooks={"request": [on_request]}),
+            httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2, event_hooks={"request": [aon_request]})
+        )
+
+    def get_http_clients(self, name: str) -> Tuple[Any, Any]:
+        """获取提供商共享的(httpx.Client, httpx.AsyncClient)"""
+        clients = self._http_clients.get(name)
+        if clients is None:
+            with self._lock:
+                clients = self._http_clients.get(name)
+                if clients is None:
+                    clients = self._create_http_clients(name)
+                    self._http_clients[name] = clients
+        return clients
+
+    def _get_sdk_clients(self, name: str, factory) -> Tuple[Any, Any]:
+        """factory接收共享的(httpx.Client, httpx.AsyncClient)创建SDK客户端"""
+        clients = self._sdk_clients.get(name)
+        if clients is None:
+            # httpx客户端在加锁前获取（get_http_clients自身也会加锁，锁不可重入）
+            http_client, async_http_client = self.get_http_clients(name)
+            with self._lock:
+                clients = self._sdk_clients.get(name)
+                if clients is None:
+                    clients = factory(http_client, async_http_client)
+                    self._sdk_clients[name] = clients
+        return clients
+
+    def openai_clients(self, name: str, api_key: str, base_url: Optional[str] = None) -> Tuple[Any, Any]:
+        """OpenAI兼容接口（OpenAI、DeepSeek、Qwen）的(OpenAI, AsyncOpenAI)客户端"""
+        def factory(http_client, async_http_client):
+            import openai
+            options = {
+                "api_key": api_key,
+                "base_url": base_url,
+                "max_retries": settings.llm_max_retries,
+                "timeout": settings.llm_request_timeout
+            }
+            return (
+                openai.OpenAI(http_client=http_client, **options),
+                openai.AsyncOpenAI(http_client=async_http_client, **options)
+            )
+
+        return self._get_sdk_clients(name, factory)
+
+    def azure_clients(self, name: str, api_key: str, endpoint: str, api_version: str,
+                      deployment: str) -> Tuple[Any, Any]:
+        """Azure OpenAI的(AzureOpenAI, AsyncAzureOpenAI)客户端"""
+        def factory(http_client, async_http_client):
+            import openai
+            options = {
+                "api_key": api_key,
+                "azure_endpoint": endpoint,
+                "api_version": api_version,
+                "azure_deployment": deployment,
+                "max_retries": settings.llm_max_retries,
+                "timeout": settings.llm_request_timeout
+            }
+            return (
+                openai.AzureOpenAI(http_client=http_client, **options),
+                openai.AsyncAzureOpenAI(http_client=async_http_client, **options)
+            )
+
+        return self._get_sdk_clients(name, factory)
+
+    def anthropic_clients(self, name: str, api_key: str) -> Tuple[Any, Any]:
+        """Anthropic的(Anthropic, AsyncAnthropic)客户端"""
+        def factory(http_client, async_http_client):
+            import anthropic
+            options = {
+                "api_key": api_key,
+                "max_retries": settings.llm_max_retries,
+                "timeout": settings.llm_request_timeout
+            }
+            return (
+                anthropic.Anthropic(http_client=http_client, **options),
+                anthropic.AsyncAnthropic(http_client=async_http_client, **options)
+            )
+
+        return self._get_sdk_clients(name, factory)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """各提供商的连接复用统计"""
+        return {
+            "http2": self.http2_enabled(),
+            "providers": {name: stats.snapshot() for name, stats in self._stats.items()}
+        }
+
+    async def aclose(self):
+        """关闭全部连接（异步客户端须在事件循环中关闭）"""
+        with self._lock:
+            http_clients = list(self._http_clients.values())
+            self._http_clients = {}
+            self._sdk_clients = {}
+        for client, async_client in http_clients:
+            client.close()
+            await async_client.aclose()
+
+
+# 全局LLM客户端池
+llm_clients = LLMClientPool()
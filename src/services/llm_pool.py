@@ -0,0 +1,295 @@
+"""
+LLM提供商池 - 按顺序在多个已配置的提供商间故障转移，按健康状况熔断，可选对冲请求降低尾延迟
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+
+class ProviderHealth:
+    """
+    单个提供商的健康状况
+    记录延迟EWMA、错误率EWMA和最近的延迟样本（用于计算对冲等待时间）；
+    连续失败达到阈值时熔断，熔断open_seconds后放行一个探测请求（半开），成功则恢复
+    """
+
+    def __init__(self,
+                 name: str,
+                 ewma_alpha: float = 0.2,
+                 latency_window: int = 200,
+                 failure_threshold: int = 5,
+                 open_seconds: float = 30):
+        self.name = name
+        self.ewma_alpha = ewma_alpha
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+
+        self.latency_ewma: Optional[float] = None
+        self.error_rate = 0.0
+        self._latencies = deque(maxlen=latency_window)
+
+        # 熔断状态：closed / open / half_open
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_inflight = False
+        self._probe_started = 0.0
+
+        self.requests = 0
+        self.failures = 0
+        self.cancelled = 0
+
+    def available(self) -> bool:
+        """是否可以向该提供商发送请求"""
+        if self.state == "open" and time.monotonic() - self._opened_at >= self.open_seconds:
+            self.state = "half_open"
+        if self.state == "half_open":
+            # 探测请求超过open_seconds仍未结束（如任务在开始前被取消）时视为丢失，允许新的探测
+            return not self._probe_inflight or time.monotonic() - self._probe_started >= self.open_seconds
+        return self.state == "closed"
+
+    def begin(self, force: bool = False) -> bool:
+        """
+        开始一次请求，返回是否放行
+        检查与占用在同一步完成，半开状态下并发请求中只有一个成为探测请求；force时不检查（全部熔断时使用）
+        """
+        if not self.available() and not force:
+            return False
+        if self.state == "half_open":
+            self._probe_inflight = True
+            self._probe_started = time.monotonic()
+        self.requests += 1
+        return True
+
+    def record_success(self, latency: Optional[float] = None):
+        """记录成功；latency为None时（如流式响应）不计入延迟统计"""
+        self._probe_inflight = False
+        self.error_rate = (1 - self.ewma_alpha) * self.error_rate
+        self.consecutive_failures = 0
+        self.state = "closed"
+        if latency is not None:
+            self._latencies.append(latency)
+            if self.latency_ewma is None:
+                self.latency_ewma = latency
+            else:
+                self.latency_ewma = self.ewma_alpha * latency + (1 - self.ewma_alpha) * self.latency_ewma
+
+    def record_failure(self):
+        self._probe_inflight = False
+        self.failures += 1
+        self.error_rate = self.ewma_alpha + (1 - self.ewma_alpha) * self.error_rate
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                print(f"LLM提供商 {self.name} 熔断 {self.open_seconds} 秒")
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+    def record_cancelled(self):
+        """对冲落败或调用方取消，不计入成功或失败"""
+        self._probe_inflight = False
+        self.cancelled += 1
+
+    def latency_quantile(self, quantile: float, min_samples: int = 20) -> Optional[float]:
+        """最近延迟样本的分位数，样本不足时返回None"""
+        if len(self._latencies) < min_samples:
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[min(int(quantile * len(latencies)), len(latencies) - 1)]
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = self.latency_quantile(0.95, min_samples=1)
+        return {
+            "state": self.state,
+            "requests": self.requests,
+            "failures": self.failures,
+            "cancelled": self.cancelled,
+            "error_rate": round(self.error_rate, 4),
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+            "latency_p95_ms": round(p95 * 1000, 1) if p95 is not None else None
+        }
+
+
+class LLMProviderPool:
+    """
+    有序的LLM提供商池
+    按配置顺序选择第一个未熔断的提供商，失败时依次故障转移；开启对冲时，首选提供商在其p95延迟内
+    未返回，则向下一个提供商发送相同请求，采用先返回的结果并取消另一个
+    """
+
+    def __init__(self,
+                 providers: List[Tuple[str, Any]],
+                 hedge_enabled: bool = False,
+                 hedge_quantile: float = 0.95,
+                 hedge_min_delay: float = 0.5,
+                 hedge_default_delay: float = 5,
+                 **health_options):
+        self.providers = [(name, llm, ProviderHealth(name, **health_options)) for name, llm in providers]
+        self.hedge_enabled = hedge_enabled
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    @property
+    def names(self) -> List[str]:
+        return [name for name, _, _ in self.providers]
+
+    def get(self, name: Optional[str]) -> Optional[Any]:
+        """按名称取提供商的模型，不存在时返回None"""
+        for provider, llm, _ in self.providers:
+            if provider == name:
+                return llm
+        return None
+
+    def _candidates(self) -> Tuple[List[Tuple[str, Any, ProviderHealth]], bool]:
+        """
+        按顺序返回可用的提供商，以及是否强制尝试（全部熔断时仍按顺序全部尝试）
+        这里只做筛选，实际调用前由_acquire再次检查并占用
+        """
+        candidates = [entry for entry in self.providers if entry[2].available()]
+        if candidates:
+            return candidates, False
+        return list(self.providers), True
+    
+    def _acquire(self,
+                 remaining: List[Tuple[str, Any, ProviderHealth]],
+                 force: bool) -> Optional[Tuple[str, Any, ProviderHealth]]:
+        """从remaining中依次取出下一个放行的提供商（跳过其间熔断或已有探测请求的），没有时返回None"""
+        while remaining:
+            entry = remaining.pop(0)
+            if entry[2].begin(force):
+                return entry
+        return None
+
+    def _hedge_delay(self, health: ProviderHealth) -> float:
+        """对冲等待时间：首选提供商最近延迟的分位数（样本不足时使用默认值）"""
+        deadline = health.latency_quantile(self.hedge_quantile)
+        if deadline is None:
+            return self.hedge_default_delay
+        return max(deadline, self.hedge_min_delay)
+
+    async def _call(self, entry: Tuple[str, Any, ProviderHealth], input: Any) -> Any:
+        """调用已由_acquire占用的提供商"""
+        _, llm, health = entry
+        started = time.perf_counter()
+        try:
+            response = await llm.ainvoke(input)
+        except asyncio.CancelledError:
+            health.record_cancelled()
+            raise
+        except Exception:
+            health.record_failure()
+            raise
+        health.record_success(time.perf_counter() - started)
+        return response
+
+    async def _hedged(self,
+                      primary: Tuple[str, Any, ProviderHealth],
+                      remaining: List[Tuple[str, Any, ProviderHealth]],
+                      force: bool,
+                      input: Any) -> Tuple[Any, str]:
+        """向首选提供商发送请求，超过对冲等待时间未返回时向remaining中的下一个提供商补发"""
+        loop = asyncio.get_running_loop()
+        tasks = {loop.create_task(self._call(primary, input)): primary[0]}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self._hedge_delay(primary[2]))
+            if done:
+                task = done.pop()
+                return task.result(), tasks[task]
+
+            backup = self._acquire(remaining, force)
+            if backup is None:
+                return await next(iter(tasks)), primary[0]
+            self.hedges += 1
+            tasks[loop.create_task(self._call(backup, input))] = backup[0]
+
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if tasks[task] == backup[0]:
+                            self.hedge_wins += 1
+                        return task.result(), tasks[task]
+                    error = task.exception()
+            raise error
+        finally:
+            # 取消落败或未完成的请求（包括调用方被取消时）
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def ainvoke(self, input: Any, hedge: Optional[bool] = None) -> Tuple[Any, str]:
+        """
+        调用LLM，返回(响应, 实际使用的提供商)
+        hedge为None时按池的配置决定是否对冲；所有提供商都失败时抛出最后一个错误
+        """
+        if hedge is None:
+            hedge = self.hedge_enabled
+        remaining, force = self._candidates()
+        error = None
+        while True:
+            primary = self._acquire(remaining, force)
+            if primary is None:
+                break
+            if error is not None:
+                self.failovers += 1
+            try:
+                if hedge and remaining:
+                    return await self._hedged(primary, remaining, force, input)
+                return await self._call(primary, input), primary[0]
+            except Exception as e:
+                print(f"LLM提供商 {primary[0]} 调用失败: {str(e)}")
+                error = e
+        raise error or RuntimeError("没有可用的LLM提供商")
+
+    async def astream(self, input: Any, route: Optional[Dict] = None) -> AsyncIterator[Any]:
+        """
+        流式调用LLM；产出第一个片段前失败时故障转移到下一个提供商（流式响应不对冲）
+        传入route时，在其中记录实际使用的提供商（route["provider"]）
+        """
+        remaining, force = self._candidates()
+        error = None
+        while True:
+            entry = self._acquire(remaining, force)
+            if entry is None:
+                break
+            if error is not None:
+                self.failovers += 1
+            _, llm, health = entry
+            if route is not None:
+                route["provider"] = entry[0]
+            started = False
+            try:
+                async for chunk in llm.astream(input):
+                    started = True
+                    yield chunk
+            except (asyncio.CancelledError, GeneratorExit):
+                health.record_cancelled()
+                raise
+            except Exception as e:
+                health.record_failure()
+                if started:
+                    raise
+                print(f"LLM提供商 {entry[0]} 流式调用失败: {str(e)}")
+                error = e
+                continue
+            health.record_success()
+            return
+        raise error or RuntimeError("没有可用的LLM提供商")
+
+    def stats(self) -> Dict[str, Any]:
+        """对冲、故障转移统计和各提供商的健康状况"""
+        return {
+            "hedge_enabled": self.hedge_enabled,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+            "providers": {name: health.stats() for name, _, health in self.providers}
+        }
@@ -2,17 +2,15 @@
 LLM服务 - 处理与大语言模型的交互
 """
 import json
-from typing import List, Dict, Optional, Tuple
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 
-from langchain_community.callbacks import get_openai_callback
-from langchain_openai import ChatOpenAI, AzureChatOpenAI
-from langchain_community.chat_models import ChatAnthropic
-from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
-from langchain.schema import BaseMessage, HumanMessage, AIMessage, SystemMessage
-# from langchain.callbacks import get_openai_callback
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
 
 from ..core.config import settings
 from ..models.conversation import MessageRole
+from .llm_clients import llm_clients
+from .llm_pool import LLMProviderPool
+from .request_coalescer import RequestCoalescer
 
 
 class LLMService:
@@ -20,51 +18,128 @@ class LLMService:
     
     def __init__(self):
         """初始化LLM服务"""
+        # 提供商SDK在创建服务时按需导入，避免拖慢应用启动
+        # SDK客户端取自进程级连接池，各服务实例和各次调用复用同一组长连接
+        self.llm = self._create_llm(settings.llm_provider)
+        
+        # 首选提供商之后依次为备用提供商，故障或过慢时切换
+        providers = [(settings.llm_provider, self.llm)]
+        for provider in settings.llm_fallback_providers.split(","):
+            provider = provider.strip()
+            if not provider or provider in [name for name, _ in providers]:
+                continue
+            if not self._provider_configured(provider):
+                print(f"备用LLM提供商 {provider} 未配置API Key，已跳过")
+                continue
+            providers.append((provider, self._create_llm(provider)))
+        self.pool = LLMProviderPool(
+            providers,
+            hedge_enabled=settings.llm_hedge_enabled,
+            hedge_quantile=settings.llm_hedge_quantile,
+            hedge_min_delay=settings.llm_hedge_min_delay,
+            hedge_default_delay=settings.llm_hedge_default_delay,
+            ewma_alpha=settings.llm_health_ewma_alpha,
+            failure_threshold=settings.llm_circuit_failure_threshold,
+            open_seconds=settings.llm_circuit_open_seconds
+        )
+        
+        # 相同的并发请求合并为一次上游调用
+        self.coalescer = RequestCoalescer()
+    
+    @staticmethod
+    def _provider_configured(provider: str) -> bool:
+        """提供商是否已配置API Key"""
+        api_keys = {
+            "openai": settings.openai_api_key,
+            "azure": settings.azure_api_key,
+            "deepseek": settings.deepseek_api_key,
+            "qwen": settings.qwen_api_key,
+            "claude": settings.claude_api_key
+        }
+        return bool(api_keys.get(provider))
+    
+    @staticmethod
+    def _create_llm(provider: str):
+        """创建指定提供商的聊天模型"""
         # 根据配置选择不同的LLM提供商
-        if settings.llm_provider == "openai":
-            self.llm = ChatOpenAI(
+        if provider == "openai":
+            from langchain_openai import ChatOpenAI
+            client, async_client = llm_clients.openai_clients(
+                "openai", settings.openai_api_key, settings.openai_api_base
+            )
+            llm = ChatOpenAI(
                 openai_api_key=settings.openai_api_key,
                 openai_api_base=settings.openai_api_base,
                 model_name=settings.openai_model,
                 temperature=0.7,
-                max_tokens=2000
+                max_tokens=2000,
+                client=client.chat.completions,
+                async_client=async_client.chat.completions
+            )
+        elif provider == "azure":
+            from langchain_openai import AzureChatOpenAI
+            client, async_client = llm_clients.azure_clients(
+                "azure",
+                settings.azure_api_key,
+                settings.azure_api_base,
+                settings.azure_api_version,
+                settings.azure_deployment_name
             )
-        elif settings.llm_provider == "azure":
-            self.llm = AzureChatOpenAI(
+            llm = AzureChatOpenAI(
                 azure_endpoint=settings.azure_api_base,
                 openai_api_key=settings.azure_api_key,
                 openai_api_version=settings.azure_api_version,
                 deployment_name=settings.azure_deployment_name,
                 temperature=0.7,
-                max_tokens=2000
+                max_tokens=2000,
+                client=client.chat.completions,
+                async_client=async_client.chat.completions
             )
-        elif settings.llm_provider == "deepseek":
+        elif provider == "deepseek":
             # DeepSeek使用OpenAI兼容的API
-            self.llm = ChatOpenAI(
+            from langchain_openai import ChatOpenAI
+            client, async_client = llm_clients.openai_clients(
+                "deepseek", settings.deepseek_api_key, settings.deepseek_api_base
+            )
+            llm = ChatOpenAI(
                 openai_api_key=settings.deepseek_api_key,
                 openai_api_base=settings.deepseek_api_base,
                 model_name=settings.deepseek_model,
                 temperature=0.7,
-                max_tokens=2000
+                max_tokens=2000,
+                client=client.chat.completions,
+                async_client=async_client.chat.completions
             )
-        elif settings.llm_provider == "qwen":
+        elif provider == "qwen":
             # Qwen使用OpenAI兼容的API
-            self.llm = ChatOpenAI(
+            from langchain_openai import ChatOpenAI
+            client, async_client = llm_clients.openai_clients(
+                "qwen", settings.qwen_api_key, settings.qwen_api_base
+            )
+            llm = ChatOpenAI(
                 openai_api_key=settings.qwen_api_key,
                 openai_api_base=settings.qwen_api_base,
                 model_name=settings.qwen_model,
                 temperature=0.7,
-                max_tokens=2000
+                max_tokens=2000,
+                client=client.chat.completions,
+                async_client=async_client.chat.completions
             )
-        elif settings.llm_provider == "claude":
-            self.llm = ChatAnthropic(
+        elif provider == "claude":
+            from langchain_community.chat_models import ChatAnthropic
+            llm = ChatAnthropic(
                 anthropic_api_key=settings.claude_api_key,
                 model=settings.claude_model,
                 temperature=0.7,
                 max_tokens=2000
             )
+            # ChatAnthropic在初始化时总是自建客户端，创建后替换为共享客户端
+            llm.client, llm.async_client = llm_clients.anthropic_clients(
+                "claude", settings.claude_api_key
+            )
         else:
-            raise ValueError(f"不支持的LLM提供商: {settings.llm_provider}")
+            raise ValueError(f"不支持的LLM提供商: {provider}")
+        return llm
     
     def create_initial_assessment_prompt(self, student_info: Dict) -> str:
         """创建初始评估提示词"""
@@ -123,7 +198,19 @@ class LLMService:
         return prompt, should_plan
     
     def create_learning_plan(self, student_info: Dict, conversation_summary: Dict) -> Dict:
-        """创建学习计划"""
+        """创建学习计划（同步调用，会阻塞事件循环，异步代码中请使用acreate_learning_plan）"""
+        prompt = self._create_learning_plan_prompt(student_info, conversation_summary)
+        response = self.llm.invoke(prompt)
+        return self._parse_learning_plan(response)
+    
+    async def acreate_learning_plan(self, student_info: Dict, conversation_summary: Dict) -> Dict:
+        """创建学习计划（异步）"""
+        prompt = self._create_learning_plan_prompt(student_info, conversation_summary)
+        response, _ = await self.pool.ainvoke(prompt, hedge=False)
+        return self._parse_learning_plan(response)
+    
+    def _create_learning_plan_prompt(self, student_info: Dict, conversation_summary: Dict) -> str:
+        """创建学习计划提示词"""
         prompt = f"""基于学生信息和对话总结，请创建一个详细的个性化学习计划。
 
 学生信息：
@@ -141,8 +228,10 @@ class LLMService:
 
 请以JSON格式返回学习计划。"""
         
-        response = self.llm.invoke(prompt)
-        
+        return prompt
+    
+    def _parse_learning_plan(self, response) -> Dict:
+        """解析学习计划响应"""
         # 解析响应，提取JSON
         try:
             plan_text = response.content
@@ -195,13 +284,57 @@ class LLMService:
         
         return prompt
     
-    async def get_response(self, messages: List[BaseMessage]) -> Tuple[str, Dict]:
-        """获取LLM响应"""
+    async def get_response(self, messages: List[BaseMessage], coalesce: bool = False) -> Tuple[str, Dict]:
+        """
+        获取LLM响应
+        coalesce：是否与正在进行的相同请求（消息和模型参数一致）合并。模型按非零温度采样，合并会让
+        不同请求得到同一回答，因此默认不合并，只由提示词相同、回答可共享的调用方（如课程开场）开启。
+        合并的请求复用同一回答，用量只计入发起上游调用的请求
+        """
+        if not coalesce:
+            return await self._invoke(messages)
+        
+        (content, usage_info), shared = await self.coalescer.run(
+            self._request_key(messages),
+            lambda: self._invoke(messages)
+        )
+        if shared:
+            usage_info = {
+                "total_tokens": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "total_cost": 0,
+                "coalesced": True
+            }
+        return content, usage_info
+    
+    def _request_key(self, messages: List[BaseMessage]) -> str:
+        """
+        请求合并键：提供商池中各提供商的模型参数和消息列表（空白归一化）
+        请求可能由池中任一提供商应答，因此按整个池而不是首选提供商区分
+        """
+        providers = [
+            [
+                name,
+                getattr(llm, "model_name", None) or getattr(llm, "model", None) or getattr(llm, "deployment_name", None),
+                getattr(llm, "temperature", None),
+                getattr(llm, "max_tokens", None)
+            ]
+            for name, llm, _ in self.pool.providers
+        ]
+        return json.dumps([
+            providers,
+            [[message.type, " ".join(str(message.content).split())] for message in messages]
+        ], ensure_ascii=False, default=str)
+    
+    async def _invoke(self, messages: List[BaseMessage]) -> Tuple[str, Dict]:
+        """调用LLM并统计用量（经提供商池调用，失败时故障转移，开启时对冲）"""
         try:
             # 对于支持回调的模型，使用回调获取token信息
-            if settings.llm_provider in ["openai", "azure", "deepseek", "qwen"]:
+            if any(name in ["openai", "azure", "deepseek", "qwen"] for name in self.pool.names):
+                from langchain_community.callbacks import get_openai_callback
                 with get_openai_callback() as cb:
-                    response = await self.llm.ainvoke(messages)
+                    response, provider = await self.pool.ainvoke(messages)
                     
                     usage_info = {
                         "total_tokens": cb.total_tokens,
@@ -211,19 +344,105 @@ class LLMService:
                     }
             else:
                 # Claude等不支持OpenAI回调的模型
-                response = await self.llm.ainvoke(messages)
+                response, provider = await self.pool.ainvoke(messages)
                 usage_info = {
                     "total_tokens": 0,
                     "prompt_tokens": 0,
                     "completion_tokens": 0,
                     "total_cost": 0
                 }
+            usage_info["provider"] = provider
                 
             return response.content, usage_info
         except Exception as e:
             print(f"LLM调用错误: {str(e)}")
             raise
     
+    async def stream_response(self, messages: List[BaseMessage], route: Optional[Dict] = None) -> AsyncIterator[str]:
+        """流式获取LLM响应，逐段产出生成的文本；传入route时在其中记录实际使用的提供商"""
+        try:
+            async for chunk in self.pool.astream(messages, route=route):
+                if chunk.content:
+                    yield chunk.content
+        except Exception as e:
+            print(f"LLM流式调用错误: {str(e)}")
+            raise
+    
+    def estimate_usage(self, messages: List[BaseMessage], response: str, provider: Optional[str] = None) -> Dict:
+        """
+        估算流式响应的token用量（流式接口不返回用量，按模型的分词器计数）
+        provider为实际应答的提供商（stream_response记录在route中），缺省时按首选提供商估算
+        """
+        provider = provider or settings.llm_provider
+        llm = self.pool.get(provider) or self.llm
+        usage_info = {
+            "total_tokens": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_cost": 0,
+            "estimated": True,
+            "provider": provider
+        }
+        try:
+            try:
+                prompt_tokens = llm.get_num_tokens_from_messages(messages)
+            except NotImplementedError:
+                # 非OpenAI模型名无法按消息格式计数，退回按文本计数
+                prompt_tokens = sum(llm.get_num_tokens(message.content) for message in messages)
+            completion_tokens = llm.get_num_tokens(response)
+        except Exception as e:
+            print(f"估算token用量失败: {str(e)}")
+            return usage_info
+        
+        usage_info.update({
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens
+        })
+        if provider in ["openai", "azure"]:
+            try:
+                from langchain_community.callbacks.openai_info import get_openai_token_cost_for_model
+                model_name = llm.model_name
+                usage_info["total_cost"] = (
+                    get_openai_token_cost_for_model(model_name, prompt_tokens)
+                    + get_openai_token_cost_for_model(model_name, completion_tokens, is_completion=True)
+                )
+            except (ImportError, ValueError):
+                # 未知模型没有价格信息
+                pass
+        return usage_info
+    
+    def count_tokens(self, text: str) -> int:
+        """按模型的分词器计算文本token数，无法计数时按字符数估算（中文约一字一token）"""
+        if not text:
+            return 0
+        try:
+            return self.llm.get_num_tokens(text)
+        except Exception:
+            return len(text)
+    
+    async def asummarize_conversation(self, previous_summary: str, messages: List[Dict], max_chars: int) -> str:
+        """把新移出上下文窗口的消息合并进已有的对话摘要"""
+        role_names = {"user": "学生", "assistant": "老师"}
+        transcript = "\n".join(
+            f"{role_names.get(message['role'], message['role'])}：{message['content']}" for message in messages
+        )
+        prompt = f"""请把以下新增的对话内容合并进已有的对话摘要，输出更新后的摘要。
+        
+已有摘要：
+{previous_summary or '（无）'}
+
+新增对话：
+{transcript}
+
+要求：
+1. 保留学生的学习目标、背景、当前水平、学习偏好、可用时间和遇到的困难等关键信息
+2. 保留已经讨论过的结论和尚未解决的问题，省略寒暄和重复内容
+3. 不超过{max_chars}字，只输出摘要本身"""
+        
+        response, _ = await self.pool.ainvoke(prompt, hedge=False)
+        return response.content.strip()[:max_chars]
+    
     def _analyze_conversation(self, conversation_history: List[Dict]) -> Dict:
         """分析对话历史，提取关键信息"""
         # 这里可以使用LLM来分析，或者使用规则提取
@@ -0,0 +1,77 @@
+"""
+教学材料清单 - 记录每份材料各文本块的内容哈希，用于增量更新
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+
+def content_hash(text: str) -> str:
+    """文本块内容哈希"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def metadata_hash(metadata: Dict[str, Any]) -> str:
+    """材料元数据哈希"""
+    return content_hash(json.dumps(metadata, ensure_ascii=False, sort_keys=True, default=str))
+
+
+class MaterialManifestStore:
+    """材料清单存储（SQLite）"""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS manifests (
+                material_id TEXT PRIMARY KEY,
+                chunk_hashes TEXT NOT NULL,
+                metadata_hash TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, material_id: str) -> Optional[Dict[str, Any]]:
+        """读取材料清单，不存在时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT chunk_hashes, metadata_hash FROM manifests WHERE material_id = ?",
+                (material_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"chunk_hashes": json.loads(row[0]), "metadata_hash": row[1]}
+
+    def put(self, material_id: str, chunk_hashes: List[str], meta_hash: str):
+        """写入材料清单"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO manifests (material_id, chunk_hashes, metadata_hash, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (material_id, json.dumps(chunk_hashes), meta_hash, time.time())
+            )
+            self._conn.commit()
+
+    def delete(self, material_id: str):
+        """删除材料清单"""
+        with self._lock:
+            self._conn.execute("DELETE FROM manifests WHERE material_id = ?", (material_id,))
+            self._conn.commit()
+
+    def clear(self):
+        """清空所有清单"""
+        with self._lock:
+            self._conn.execute("DELETE FROM manifests")
+            self._conn.commit()
+
+    def close(self):
+        """关闭连接"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,136 @@
+"""
+教学材料元数据规范化 - 年级范围解析与结构化检索过滤条件
+"""
+import re
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .metadata_filter import combine_where
+
+
+# 年级统一编码为1-12（小学1-6、初中7-9、高中10-12）
+GRADE_MIN = 1
+GRADE_MAX = 12
+
+_STAGES = {
+    "小学": (1, 6), "小": (1, 6),
+    "初中": (7, 9), "初": (7, 9),
+    "高中": (10, 12), "高": (10, 12),
+}
+
+_CHINESE_DIGITS = {"一": 1, "二": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+
+_NUMBER = r"十[一二]?|[一二三四五六七八九]|1[0-2]|[1-9]"
+_GRADE_PATTERN = re.compile(
+    rf"(?P<range_from>{_NUMBER})\s*[-~～至到]\s*(?P<range_to>{_NUMBER})\s*年级"
+    rf"|(?P<stage>小学|初中|高中|小|初|高)\s*(?P<stage_number>[一二三四五六1-6])(?:\s*年级)?"
+    rf"|(?P<number>{_NUMBER})\s*年级"
+    r"|grade\s*(?P<english_number>1[0-2]|[1-9])",
+    re.IGNORECASE
+)
+
+
+def _parse_number(text: str) -> int:
+    """解析阿拉伯数字或中文数字（一至十二）"""
+    if text.isdigit():
+        return int(text)
+    if text.startswith("十"):
+        return 10 + _CHINESE_DIGITS.get(text[1:], 0)
+    return _CHINESE_DIGITS[text]
+
+
+def parse_grade_range(value: Union[str, int, None]) -> Optional[Tuple[int, int]]:
+    """
+    将年级描述解析为(最低年级, 最高年级)
+    支持：初二、高三、小五、初中一年级、八年级、7-9年级、初一至初三、Grade 8、初中/高中等学段、纯数字；
+    无法识别（如"初级"）时返回None
+    """
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return (value, value) if GRADE_MIN <= value <= GRADE_MAX else None
+
+    text = str(value).strip()
+    if not text:
+        return None
+    if text.isdigit():
+        return parse_grade_range(int(text))
+
+    grades: List[int] = []
+    for match in _GRADE_PATTERN.finditer(text):
+        if match.group("range_from"):
+            grades.extend([_parse_number(match.group("range_from")), _parse_number(match.group("range_to"))])
+        elif match.group("stage"):
+            low, high = _STAGES[match.group("stage")]
+            grade = low + _parse_number(match.group("stage_number")) - 1
+            if grade <= high:
+                grades.append(grade)
+        elif match.group("number"):
+            grades.append(_parse_number(match.group("number")))
+        else:
+            grades.append(int(match.group("english_number")))
+
+    grades = [grade for grade in grades if GRADE_MIN <= grade <= GRADE_MAX]
+    if grades:
+        return min(grades), max(grades)
+
+    # 只给出学段时取整个学段
+    stage_ranges = [_STAGES[stage] for stage in ("小学", "初中", "高中") if stage in text]
+    if stage_ranges:
+        return min(low for low, _ in stage_ranges), max(high for _, high in stage_ranges)
+    return None
+
+
+def normalize_material_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    规范化教学材料元数据（入库时写入每个文本块）
+    - grade_min/grade_max：由grade或level解析的年级范围，未标注年级的材料视为适用于所有年级
+    - material_type：去除首尾空白并转为小写
+    - source：统一使用"/"作为路径分隔符
+    """
+    normalized = {key: value for key, value in metadata.items() if value is not None}
+
+    if not isinstance(normalized.get("grade_min"), int) or not isinstance(normalized.get("grade_max"), int):
+        grade_range = (
+            parse_grade_range(normalized.get("grade"))
+            or parse_grade_range(normalized.get("level"))
+            or (GRADE_MIN, GRADE_MAX)
+        )
+        normalized["grade_min"], normalized["grade_max"] = grade_range
+
+    if isinstance(normalized.get("subject"), str):
+        normalized["subject"] = normalized["subject"].strip()
+    if isinstance(normalized.get("material_type"), str):
+        normalized["material_type"] = normalized["material_type"].strip().lower()
+    if isinstance(normalized.get("source"), str):
+        normalized["source"] = normalized["source"].strip().replace("\\", "/")
+
+    return normalized
+
+
+def build_material_filter(subject: Optional[str] = None,
+                          grade: Union[str, int, None] = None,
+                          material_type: Union[str, List[str], None] = None,
+                          source: Optional[str] = None) -> Dict[str, Any]:
+    """
+    构建教学材料检索的where条件
+    grade按范围重叠匹配（材料的[grade_min, grade_max]包含学生年级范围内的任一年级），无法解析时不按年级过滤
+    """
+    conditions: List[Dict[str, Any]] = [{"type": "teaching_material"}]
+    if subject:
+        conditions.append({"subject": subject.strip()})
+
+    grade_range = parse_grade_range(grade)
+    if grade_range:
+        low, high = grade_range
+        conditions.append({"grade_min": {"$lte": high}})
+        conditions.append({"grade_max": {"$gte": low}})
+
+    if isinstance(material_type, str) and material_type.strip():
+        conditions.append({"material_type": material_type.strip().lower()})
+    elif material_type:
+        conditions.append({"material_type": {"$in": [item.strip().lower() for item in material_type]}})
+
+    if source:
+        conditions.append({"source": source.strip().replace("\\", "/")})
+
+    return combine_where(conditions)
@@ -0,0 +1,72 @@
+"""
+元数据过滤 - 在本地数据上执行ChromaDB风格的where条件
+"""
+from typing import Any, Dict, List, Optional
+
+
+def _compare(value: Any, operator: str, operand: Any) -> bool:
+    """执行单个比较运算"""
+    if operator == "$eq":
+        return value == operand
+    if operator == "$ne":
+        return value != operand
+    if operator == "$in":
+        return value in operand
+    if operator == "$nin":
+        return value not in operand
+
+    # 大小比较：缺失值或类型不可比较时视为不匹配
+    if value is None:
+        return False
+    try:
+        if operator == "$gt":
+            return value > operand
+        if operator == "$gte":
+            return value >= operand
+        if operator == "$lt":
+            return value < operand
+        if operator == "$lte":
+            return value <= operand
+    except TypeError:
+        return False
+
+    raise ValueError(f"不支持的过滤运算符: {operator}")
+
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """
+    判断元数据是否满足where条件
+    支持字段等值、$eq/$ne/$gt/$gte/$lt/$lte/$in/$nin，以及$and/$or组合
+    """
+    if not where:
+        return True
+
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for operator, operand in condition.items():
+                if not _compare(value, operator, operand):
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+
+    return True
+
+
+def combine_where(conditions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    合并多个条件为ChromaDB的where子句
+    ChromaDB要求多个字段条件必须显式使用$and组合，单个条件则不能包裹$and
+    """
+    conditions = [condition for condition in conditions if condition]
+    if not conditions:
+        return {}
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
@@ -0,0 +1,367 @@
+"""
+NumPy向量集合 - 内存映射的扁平向量矩阵 + 精确top-k检索
+"""
+import json
+import os
+import shutil
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .metadata_filter import matches_where
+
+
+class NumpyCollection:
+    """
+    接口与ChromaDB集合一致的本地向量集合
+    向量以float32/float16存放在内存映射的.npy文件中，查询时对全部（或过滤后的）向量做矩阵乘法精确计算平方欧氏距离；
+    id、元数据和文档存放在SQLite中，元数据常驻内存用于过滤，文档只在需要时读取。
+    每种where条件首次使用时计算一次布尔掩码并缓存，之后写入时只增量更新受影响的行
+    """
+
+    INITIAL_CAPACITY = 1024
+    MAX_CACHED_MASKS = 256
+
+    def __init__(self, directory: str, name: str, metadata: Optional[Dict[str, Any]] = None, dtype: str = "float32"):
+        self.name = name
+        self.directory = directory
+        self._lock = threading.RLock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(directory, "index.db"), check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS records (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                document TEXT,
+                metadata TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+        info = dict(self._conn.execute("SELECT key, value FROM info"))
+        # 已有集合沿用创建时的精度
+        self.dtype = np.dtype(info.get("dtype", dtype))
+        self.metadata = json.loads(info["metadata"]) if "metadata" in info else (metadata or {})
+        if "dtype" not in info:
+            self._set_info(dtype=self.dtype.name, metadata=json.dumps(self.metadata, ensure_ascii=False))
+
+        self._vectors_path = os.path.join(directory, "vectors.npy")
+        self._vectors: Optional[np.memmap] = None
+        self._sq_norms = np.zeros(0, dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._ids: List[Optional[str]] = []
+        self._metadatas: List[Optional[Dict[str, Any]]] = []
+        self._row_by_id: Dict[str, int] = {}
+        self._free_rows: List[int] = []
+        self._masks: Dict[str, tuple] = {}  # where条件 -> (条件, 布尔掩码)
+        self._load()
+
+    def _set_info(self, **values):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)",
+            [(key, str(value)) for key, value in values.items()]
+        )
+        self._conn.commit()
+
+    def _load(self):
+        """加载向量文件和记录表"""
+        if not os.path.exists(self._vectors_path):
+            return
+
+        self._vectors = np.load(self._vectors_path, mmap_mode="r+")
+        capacity = self._vectors.shape[0]
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._sq_norms = np.zeros(capacity, dtype=np.float32)
+
+        high_water = 0
+        records = self._conn.execute("SELECT row, id, metadata FROM records ORDER BY row").fetchall()
+        if records:
+            high_water = records[-1][0] + 1
+        self._ids = [None] * high_water
+        self._metadatas = [None] * high_water
+        for row, vector_id, metadata in records:
+            self._ids[row] = vector_id
+            self._metadatas[row] = json.loads(metadata)
+            self._row_by_id[vector_id] = row
+            self._alive[row] = True
+        self._free_rows = [row for row in range(high_water) if not self._alive[row]]
+
+        # 分块计算向量模长平方，避免一次性把整个矩阵读入内存
+        for start in range(0, high_water, 65536):
+            block = np.asarray(self._vectors[start:min(start + 65536, high_water)], dtype=np.float32)
+            self._sq_norms[start:start + len(block)] = np.einsum("ij,ij->i", block, block)
+
+    def _ensure_capacity(self, needed: int, dimensions: int):
+        """保证向量文件至少能容纳needed行，不足时按倍数扩容"""
+        if self._vectors is not None:
+            if self._vectors.shape[1] != dimensions:
+                raise ValueError(f"向量维度不一致: 集合为{self._vectors.shape[1]}维，写入的是{dimensions}维")
+            if self._vectors.shape[0] >= needed:
+                return
+
+        capacity = max(self.INITIAL_CAPACITY, needed)
+        if self._vectors is not None:
+            capacity = max(capacity, self._vectors.shape[0] * 2)
+
+        tmp_path = self._vectors_path + ".tmp"
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=self.dtype, shape=(capacity, dimensions))
+        if self._vectors is not None:
+            grown[:self._vectors.shape[0]] = self._vectors
+            del self._vectors
+        grown.flush()
+        del grown
+        os.replace(tmp_path, self._vectors_path)
+        self._vectors = np.load(self._vectors_path, mmap_mode="r+")
+
+        old_capacity = len(self._alive)
+        self._alive = np.concatenate([self._alive, np.zeros(capacity - old_capacity, dtype=bool)])
+        self._sq_norms = np.concatenate([self._sq_norms, np.zeros(capacity - old_capacity, dtype=np.float32)])
+        for key, (where, mask) in self._masks.items():
+            self._masks[key] = (where, np.concatenate([mask, np.zeros(capacity - old_capacity, dtype=bool)]))
+
+    def _where_mask(self, where: Dict[str, Any]) -> np.ndarray:
+        """where条件对应的布尔掩码（首次使用时计算并缓存）"""
+        key = json.dumps(where, sort_keys=True, ensure_ascii=False, default=str)
+        cached = self._masks.get(key)
+        if cached is not None:
+            return cached[1]
+
+        mask = np.zeros(len(self._alive), dtype=bool)
+        for row, metadata in enumerate(self._metadatas):
+            if metadata is not None:
+                mask[row] = matches_where(metadata, where)
+        if len(self._masks) >= self.MAX_CACHED_MASKS:
+            # 淘汰最早缓存的掩码
+            self._masks.pop(next(iter(self._masks)))
+        self._masks[key] = (where, mask)
+        return mask
+
+    def _update_masks(self, rows: List[int]):
+        """写入或删除后更新已缓存掩码中受影响的行"""
+        for where, mask in self._masks.values():
+            for row in rows:
+                metadata = self._metadatas[row]
+                mask[row] = metadata is not None and matches_where(metadata, where)
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._row_by_id)
+
+    def _write(self, ids: List[str], embeddings: List[List[float]], documents: Optional[List[str]],
+               metadatas: Optional[List[Dict]], overwrite: bool):
+        if not ids:
+            return
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [{}] * len(ids)
+
+        with self._lock:
+            rows = []
+            records = []
+            batch_rows: Dict[str, int] = {}  # 同一批次内重复的id写入同一行
+            for i, vector_id in enumerate(ids):
+                row = self._row_by_id.get(vector_id, batch_rows.get(vector_id))
+                if row is not None and not overwrite:
+                    # 与ChromaDB的add一致：已存在的id忽略
+                    rows.append(None)
+                    continue
+                if row is None:
+                    row = self._free_rows.pop() if self._free_rows else len(self._ids)
+                    if row == len(self._ids):
+                        self._ids.append(None)
+                        self._metadatas.append(None)
+                batch_rows[vector_id] = row
+                rows.append(row)
+                records.append((row, vector_id, documents[i], json.dumps(metadatas[i], ensure_ascii=False)))
+
+            written = [i for i, row in enumerate(rows) if row is not None]
+            if not written:
+                return
+            self._ensure_capacity(len(self._ids), matrix.shape[1])
+
+            target_rows = np.asarray([rows[i] for i in written])
+            vectors = matrix[written]
+            self._vectors[target_rows] = vectors.astype(self.dtype)
+            self._vectors.flush()
+            stored = np.asarray(self._vectors[target_rows], dtype=np.float32)
+            self._sq_norms[target_rows] = np.einsum("ij,ij->i", stored, stored)
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO records (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                records
+            )
+            self._conn.commit()
+
+            for i in written:
+                row = rows[i]
+                self._ids[row] = ids[i]
+                self._metadatas[row] = dict(metadatas[i])
+                self._row_by_id[ids[i]] = row
+                self._alive[row] = True
+            self._update_masks(target_rows.tolist())
+
+    def add(self, ids: List[str], embeddings: List[List[float]], documents: List[str] = None,
+            metadatas: List[Dict] = None):
+        self._write(ids, embeddings, documents, metadatas, overwrite=False)
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str] = None,
+               metadatas: List[Dict] = None):
+        self._write(ids, embeddings, documents, metadatas, overwrite=True)
+
+    def _select_rows(self, ids: Optional[List[str]], where: Optional[Dict]) -> np.ndarray:
+        """按ids（保持给定顺序）和where条件选择行"""
+        if ids is not None:
+            rows = np.asarray([self._row_by_id[i] for i in ids if i in self._row_by_id], dtype=np.int64)
+        else:
+            rows = np.flatnonzero(self._alive)
+        if where and rows.size:
+            rows = rows[self._where_mask(where)[rows]]
+        return rows
+
+    def _documents(self, rows: List[int]) -> List[Optional[str]]:
+        """从SQLite读取文档内容"""
+        documents = {}
+        for start in range(0, len(rows), 500):
+            batch = rows[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            for row, document in self._conn.execute(
+                f"SELECT row, document FROM records WHERE row IN ({placeholders})", batch
+            ):
+                documents[row] = document
+        return [documents.get(row) for row in rows]
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None,
+            include: Optional[List[str]] = None, limit: Optional[int] = None,
+            offset: Optional[int] = None, **kwargs) -> Dict[str, Any]:
+        include = list(include) if include is not None else ["metadatas", "documents"]
+        with self._lock:
+            rows = self._select_rows(ids, where)
+            start = offset or 0
+            rows = rows[start:start + limit] if limit is not None else rows[start:]
+            rows = rows.tolist()
+
+            results = {
+                "ids": [self._ids[row] for row in rows],
+                "embeddings": None,
+                "documents": None,
+                "metadatas": None
+            }
+            if "embeddings" in include:
+                results["embeddings"] = np.asarray(self._vectors[rows], dtype=np.float32).tolist() if rows else []
+            if "documents" in include:
+                results["documents"] = self._documents(rows)
+            if "metadatas" in include:
+                results["metadatas"] = [dict(self._metadatas[row]) for row in rows]
+        return results
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10,
+              where: Optional[Dict] = None, include: Optional[List[str]] = None, **kwargs) -> Dict[str, Any]:
+        include = list(include) if include is not None else ["metadatas", "documents", "distances"]
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        fields = ["ids", "documents", "metadatas", "distances", "embeddings"]
+        results: Dict[str, Any] = {field: [] for field in fields}
+
+        with self._lock:
+            high_water = len(self._ids)
+            mask = self._alive[:high_water]
+            if where:
+                mask = mask & self._where_mask(where)[:high_water]
+            rows = np.flatnonzero(mask)
+            k = min(n_results, rows.size)
+
+            if k == 0:
+                for field in fields:
+                    results[field] = [[] for _ in query_embeddings]
+            else:
+                # 没有被过滤或删除的行时直接使用内存映射切片，避免复制整个矩阵
+                if rows.size == high_water:
+                    matrix, sq_norms = self._vectors[:high_water], self._sq_norms[:high_water]
+                else:
+                    matrix, sq_norms = self._vectors[rows], self._sq_norms[rows]
+
+                # 与ChromaDB默认的l2空间一致，使用平方欧氏距离
+                distances = (
+                    np.einsum("ij,ij->i", queries, queries)[:, None]
+                    - 2 * (queries @ np.asarray(matrix, dtype=np.float32).T)
+                    + sq_norms[None, :]
+                )
+                top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+                for row_distances, candidates in zip(distances, top):
+                    ordered = candidates[np.argsort(row_distances[candidates])]
+                    selected = rows[ordered].tolist()
+                    results["ids"].append([self._ids[row] for row in selected])
+                    results["distances"].append([float(max(d, 0.0)) for d in row_distances[ordered]])
+                    if "documents" in include:
+                        results["documents"].append(self._documents(selected))
+                    if "metadatas" in include:
+                        results["metadatas"].append([dict(self._metadatas[row]) for row in selected])
+                    if "embeddings" in include:
+                        results["embeddings"].append(np.asarray(self._vectors[selected], dtype=np.float32).tolist())
+
+        for field in ["documents", "metadatas", "distances", "embeddings"]:
+            if field not in include:
+                results[field] = None
+        return results
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None):
+        with self._lock:
+            rows = self._select_rows(ids, where).tolist()
+            if not rows:
+                return
+            self._conn.executemany("DELETE FROM records WHERE row = ?", [(row,) for row in rows])
+            self._conn.commit()
+            for row in rows:
+                del self._row_by_id[self._ids[row]]
+                self._ids[row] = None
+                self._metadatas[row] = None
+                self._alive[row] = False
+                self._free_rows.append(row)
+            self._update_masks(rows)
+
+    def memory_usage(self) -> Dict[str, int]:
+        """向量文件大小与常驻内存的辅助结构大小（字节，元数据为粗略估计）"""
+        with self._lock:
+            vector_bytes = self._vectors.nbytes if self._vectors is not None else 0
+            mask_bytes = sum(mask.nbytes for _, mask in self._masks.values())
+            return {
+                "vector_file": vector_bytes,
+                "norms_and_masks": self._sq_norms.nbytes + self._alive.nbytes + mask_bytes,
+                "metadata_estimate": sum(len(json.dumps(m, ensure_ascii=False)) for m in self._metadatas if m)
+            }
+
+    def close(self):
+        """刷新向量文件并关闭连接"""
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._vectors = None
+            self._conn.close()
+
+    @staticmethod
+    def list_collections(root: str) -> List[tuple]:
+        """列出root目录下已有的集合，返回[(集合名, 集合元数据)]"""
+        if not os.path.isdir(root):
+            return []
+        collections = []
+        for name in sorted(os.listdir(root)):
+            path = os.path.join(root, name, "index.db")
+            if not os.path.exists(path):
+                continue
+            conn = sqlite3.connect(path)
+            try:
+                row = conn.execute("SELECT value FROM info WHERE key = 'metadata'").fetchone()
+            except sqlite3.Error:
+                row = None
+            finally:
+                conn.close()
+            collections.append((name, json.loads(row[0]) if row else {}))
+        return collections
+
+    @staticmethod
+    def delete_collection(root: str, name: str):
+        """删除集合目录（调用前须先close对应实例）"""
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
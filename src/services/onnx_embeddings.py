@@ -0,0 +1,191 @@
+"""
+ONNX本地嵌入模型 - 使用onnxruntime在CPU上运行sentence-transformers模型
+"""
+import json
+import os
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+def pool_embeddings(hidden_state: np.ndarray, attention_mask: np.ndarray, config: Dict) -> np.ndarray:
+    """
+    按sentence-transformers的池化配置把token向量池化为句向量（忽略填充位置）
+    同时开启多种池化时按cls、max、mean、mean_sqrt_len的顺序拼接，与sentence-transformers一致
+    """
+    mask = attention_mask[..., None].astype(np.float32)
+    lengths = np.clip(mask.sum(axis=1), 1e-9, None)
+    outputs = []
+    if config.get("pooling_mode_cls_token"):
+        outputs.append(hidden_state[:, 0])
+    if config.get("pooling_mode_max_tokens"):
+        outputs.append(np.where(mask > 0, hidden_state, -1e9).max(axis=1))
+    if config.get("pooling_mode_mean_tokens"):
+        outputs.append((hidden_state * mask).sum(axis=1) / lengths)
+    if config.get("pooling_mode_mean_sqrt_len_tokens"):
+        outputs.append((hidden_state * mask).sum(axis=1) / np.sqrt(lengths))
+    unsupported = [
+        mode for mode in ("pooling_mode_weightedmean_tokens", "pooling_mode_lasttoken") if config.get(mode)
+    ]
+    if unsupported or not outputs:
+        raise ValueError(f"不支持的池化配置: {config}")
+    return np.concatenate(outputs, axis=1)
+
+
+class OnnxEmbeddings:
+    """
+    基于ONNX Runtime的本地嵌入模型，接口与LangChain Embeddings一致
+    首次使用时把sentence-transformers模型导出为ONNX（可选int8动态量化）并缓存到本地目录，
+    之后推理只依赖onnxruntime和分词器。池化方式读取模型自带的sentence-transformers池化配置（1_Pooling/config.json），
+    池化后做L2归一化，与HuggingFaceEmbeddings(normalize_embeddings=True)一致，因此生成的向量可以继续用于已有集合。
+    """
+
+    def __init__(self,
+                 model_name: str,
+                 cache_dir: str,
+                 quantize: bool = True,
+                 num_threads: int = 0,
+                 batch_size: int = 32,
+                 max_length: int = 256):
+        try:
+            import onnxruntime
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise ImportError(
+                "使用ONNX嵌入需要安装onnxruntime和transformers: pip install onnxruntime transformers"
+            ) from e
+
+        self.model_name = model_name
+        self.quantize = quantize
+        self.batch_size = max(1, batch_size)
+        self.max_length = max_length
+
+        self.model_dir = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9._-]", "_", model_name))
+        model_path = self._ensure_model()
+
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+        self.pooling_config = self._read_pooling_config()
+
+        options = onnxruntime.SessionOptions()
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(
+            model_path,
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def _ensure_model(self) -> str:
+        """确保ONNX模型已导出（及量化），返回推理使用的模型路径"""
+        fp32_path = os.path.join(self.model_dir, "model.onnx")
+        int8_path = os.path.join(self.model_dir, "model_int8.onnx")
+
+        if not os.path.exists(fp32_path):
+            self._export(fp32_path)
+
+        if not self.quantize:
+            return fp32_path
+
+        if not os.path.exists(int8_path):
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        return int8_path
+
+    def _read_pooling_config(self) -> Dict:
+        """读取池化配置（首次读取时从原模型解析并缓存到模型目录）"""
+        path = os.path.join(self.model_dir, "pooling_config.json")
+        if not os.path.exists(path):
+            config = self._resolve_pooling_config()
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(config, f)
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _resolve_pooling_config(self) -> Dict:
+        """按modules.json找到sentence-transformers的Pooling模块并读取其配置；非sentence-transformers模型默认均值池化"""
+        modules = self._load_model_file("modules.json")
+        for module in modules or []:
+            if module.get("type", "").endswith("models.Pooling"):
+                config = self._load_model_file(f"{module['path']}/config.json")
+                if config:
+                    return config
+        return {"pooling_mode_mean_tokens": True}
+
+    def _load_model_file(self, filename: str) -> Optional[Dict]:
+        """读取原模型（本地目录或HuggingFace Hub）中的JSON文件，文件不存在时返回None"""
+        if os.path.isdir(self.model_name):
+            path = os.path.join(self.model_name, filename)
+            if not os.path.exists(path):
+                return None
+        else:
+            from huggingface_hub import hf_hub_download
+            from huggingface_hub.utils import EntryNotFoundError
+            try:
+                path = hf_hub_download(self.model_name, filename)
+            except EntryNotFoundError:
+                return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _export(self, path: str):
+        """将HuggingFace模型导出为ONNX（仅首次运行时需要torch）"""
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        os.makedirs(self.model_dir, exist_ok=True)
+        tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        model = AutoModel.from_pretrained(self.model_name)
+        model.eval()
+
+        sample = tokenizer(["warmup"], return_tensors="pt")
+        input_names = [name for name in ["input_ids", "attention_mask", "token_type_ids"] if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                tuple(sample[name] for name in input_names),
+                path,
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14
+            )
+        tokenizer.save_pretrained(self.model_dir)
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        """对一批文本推理（按批内最长文本动态填充）"""
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="np"
+        )
+        inputs = {name: encoded[name].astype(np.int64) for name in self.input_names if name in encoded}
+        hidden_state = self.session.run(None, inputs)[0]
+
+        pooled = pool_embeddings(hidden_state, encoded["attention_mask"], self.pooling_config)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """批量生成嵌入：按长度排序后分批，减少同批内的填充计算"""
+        if not texts:
+            return []
+
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        embeddings: List[List[float]] = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch_indices = order[start:start + self.batch_size]
+            vectors = self._embed_batch([texts[i] for i in batch_indices])
+            for i, vector in zip(batch_indices, vectors):
+                embeddings[i] = vector.tolist()
+        return embeddings
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
@@ -0,0 +1,111 @@
+"""
+检索结果缓存 - TTL + LRU，按集合代数（generation）失效
+"""
+import copy
+import json
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+class QueryResultCache:
+    """
+    检索结果缓存
+    每个集合维护一个代数计数器，写入集合时递增，旧代数的缓存项随即失效。
+    计数器只在本进程内有效，其他进程（如入库脚本）写入的数据依赖TTL过期。
+    """
+
+    def __init__(self, max_entries: int = 2000, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        # 命中统计
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidated = 0
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """规范化查询：全角转半角、合并空白、忽略大小写"""
+        return " ".join(unicodedata.normalize("NFKC", query).split()).casefold()
+
+    def make_key(self, collection: str, query: str, filters: Optional[Dict[str, Any]], k: int, **options) -> str:
+        """生成缓存键"""
+        return json.dumps(
+            [collection, self.normalize_query(query), filters or {}, k, options],
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str
+        )
+
+    def get(self, collection: str, key: str) -> Optional[List[Dict]]:
+        """查询缓存，未命中、过期或已失效时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, generation, results = entry
+            if generation != self._generations.get(collection, 0):
+                del self._entries[key]
+                self.invalidated += 1
+                self.misses += 1
+                return None
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(results)
+
+    def current_generation(self, collection: str) -> int:
+        """获取集合当前代数"""
+        with self._lock:
+            return self._generations.get(collection, 0)
+
+    def put(self, collection: str, key: str, results: List[Dict], generation: Optional[int] = None):
+        """
+        写入缓存
+        generation应为执行检索前读取的代数，检索期间集合发生写入时该结果会被视为已失效
+        """
+        with self._lock:
+            if generation is None:
+                generation = self._generations.get(collection, 0)
+            self._entries[key] = (
+                time.monotonic() + self.ttl_seconds,
+                generation,
+                copy.deepcopy(results)
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def bump_generation(self, collection: str):
+        """集合数据变更后调用，使该集合已有的缓存项失效"""
+        with self._lock:
+            self._generations[collection] = self._generations.get(collection, 0) + 1
+
+    def stats(self) -> Dict:
+        """缓存命中统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "expired": self.expired,
+                "invalidated": self.invalidated,
+                "entries": len(self._entries),
+                "generations": dict(self._generations)
+            }
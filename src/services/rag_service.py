@@ -1,23 +1,48 @@
 """
 RAG（检索增强生成）服务
 """
-import chromadb
-from chromadb.config import Settings as ChromaSettings
-from langchain.embeddings import OpenAIEmbeddings
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Iterable, Optional, Union
+import asyncio
+import functools
 import json
+import os
 import uuid
 
+import numpy as np
+
 from ..core.config import settings
+from .embedding_cache import EmbeddingCache, CachedEmbeddings
+from .lexical_index import BM25Index
+from .query_cache import QueryResultCache
+from .material_manifest import MaterialManifestStore, content_hash, metadata_hash
+from .material_metadata import build_material_filter, normalize_material_metadata
+from .metadata_filter import combine_where
+from .document_loader import iter_file_blocks, iter_chunks
+from .vector_compression import CompactCollection, QuantizedVectorStore
+from .sharded_collection import ShardedCollection
+from .numpy_vector_store import NumpyCollection
+from .vector_snapshot import SnapshotWriter, iter_snapshot, read_manifest, write_manifest
+from .dedup import DuplicateLinkStore, similarity_from_distance
 
 
 class RAGService:
     """RAG服务类，使用本地ChromaDB"""
     
+    # 文本分割参数（一次性分割与流式分割共用）
+    CHUNK_SIZE = 1000
+    CHUNK_OVERLAP = 200
+    SEPARATORS = ["\n\n", "\n", "。", "！", "？", ".", "!", "?", " ", ""]
+    
+    COLLECTION_NAMES = ["learning_plans", "teaching_materials", "student_profiles"]
+    
     def __init__(self):
         """初始化RAG服务"""
+        # chromadb、langchain及嵌入模型依赖较重，在创建服务时才导入，避免拖慢应用启动
+        import chromadb
+        from chromadb.config import Settings as ChromaSettings
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        
         # 初始化本地ChromaDB客户端
         self.client = chromadb.PersistentClient(
             path=settings.vector_db_path,
@@ -28,52 +53,288 @@ class RAGService:
         )
         
         # 初始化嵌入模型
+        self.embeddings = self._create_embeddings()
+        
+        # 嵌入向量缓存（按模型+文本哈希）
+        self.embedding_cache = None
+        if settings.embedding_cache_enabled:
+            self.embedding_cache = EmbeddingCache(
+                path=settings.embedding_cache_path,
+                memory_size=settings.embedding_cache_memory_size,
+                max_disk_mb=settings.embedding_cache_max_disk_mb
+            )
+            self.embeddings = CachedEmbeddings(
+                self.embeddings,
+                model_name=self._embedding_model_name(),
+                cache=self.embedding_cache
+            )
+        
+        # 初始化文本分割器
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.CHUNK_SIZE,
+            chunk_overlap=self.CHUNK_OVERLAP,
+            separators=self.SEPARATORS
+        )
+        
+        # 紧凑模式下全维度向量量化后单独存储，用于重排
+        self.quantized_store = None
+        if settings.vector_compact_mode:
+            self.quantized_store = QuantizedVectorStore(
+                settings.vector_rescore_store_path,
+                method=settings.vector_quantization
+            )
+        
+        # 创建或获取集合
+        self._numpy_collections: Dict[str, NumpyCollection] = {}
+        self._init_collections()
+        
+        # 教学材料的词法（BM25）索引，与teaching_materials集合同步维护
+        self.lexical_index = None
+        if settings.lexical_index_enabled:
+            self.lexical_index = BM25Index(settings.lexical_index_path)
+        
+        # 教学材料清单（各文本块内容哈希），用于增量更新
+        self.material_manifests = MaterialManifestStore(settings.material_manifest_path)
+        
+        # 近重复条目与保留条目的对应关系（dedup_action为link时记录）
+        self.duplicate_links = DuplicateLinkStore(settings.duplicate_links_path)
+        
+        # 检索结果缓存，写入集合时按集合失效
+        self.query_cache = None
+        if settings.query_cache_enabled:
+            self.query_cache = QueryResultCache(
+                max_entries=settings.query_cache_max_entries,
+                ttl_seconds=settings.query_cache_ttl_seconds
+            )
+        
+        # 异步接口使用的专用线程池（嵌入推理与ChromaDB查询不占用事件循环）
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.rag_executor_workers,
+            thread_name_prefix="rag"
+        )
+    
+    def _create_embeddings(self):
+        """按配置创建嵌入模型（只导入所选提供商的依赖，本地模型不会拖入torch等无关依赖）"""
         if settings.embeddings_provider == "openai":
             # 使用OpenAI的嵌入模型
-            self.embeddings = OpenAIEmbeddings(
+            from langchain.embeddings import OpenAIEmbeddings
+            return OpenAIEmbeddings(
                 api_key=settings.openai_api_key,
                 model="text-embedding-3-small"  # 使用较小的模型以降低成本
             )
-        else:
-            # 使用本地嵌入模型（免费）
-            self.embeddings = HuggingFaceEmbeddings(
+        
+        if settings.embeddings_provider == "onnx":
+            # 使用ONNX Runtime运行本地嵌入模型（CPU推理更快，可选int8量化）
+            from .onnx_embeddings import OnnxEmbeddings
+            return OnnxEmbeddings(
                 model_name=settings.local_embeddings_model,
-                model_kwargs={'device': 'cpu'},
-                encode_kwargs={'normalize_embeddings': True}
+                cache_dir=settings.onnx_model_dir,
+                quantize=settings.onnx_quantize,
+                num_threads=settings.onnx_num_threads,
+                batch_size=settings.onnx_batch_size,
+                max_length=settings.onnx_max_length
             )
         
-        # 初始化文本分割器
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            separators=["\n\n", "\n", "。", "！", "？", ".", "!", "?", " ", ""]
+        # 使用本地嵌入模型（免费）
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(
+            model_name=settings.local_embeddings_model,
+            model_kwargs={'device': 'cpu'},
+            encode_kwargs={'normalize_embeddings': True}
         )
+    
+    def _embedding_model_name(self) -> str:
+        """当前嵌入模型标识，作为缓存键的一部分"""
+        if settings.embeddings_provider == "openai":
+            return "openai:text-embedding-3-small"
+        if settings.embeddings_provider == "onnx":
+            # 量化模型的向量与原模型略有差异，单独缓存
+            precision = "int8" if settings.onnx_quantize else "fp32"
+            return f"onnx:{settings.local_embeddings_model}:{precision}"
+        return f"local:{settings.local_embeddings_model}"
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        return {
+            "embedding_cache": self.embedding_cache.stats() if self.embedding_cache else None,
+            "query_cache": self.query_cache.stats() if self.query_cache else None
+        }
+    
+    def _cached_search(self,
+                       collection_name: str,
+                       query: str,
+                       filters: Dict[str, Any],
+                       k: int,
+                       search_func: Callable[[], List[Dict]],
+                       **options) -> List[Dict]:
+        """带结果缓存的检索"""
+        if not self.query_cache:
+            return search_func()
         
-        # 创建或获取集合
-        self._init_collections()
+        key = self.query_cache.make_key(collection_name, query, filters, k, **options)
+        results = self.query_cache.get(collection_name, key)
+        if results is None:
+            generation = self.query_cache.current_generation(collection_name)
+            results = search_func()
+            self.query_cache.put(collection_name, key, results, generation=generation)
+        return results
+    
+    def _invalidate_queries(self, collection_name: str):
+        """集合写入后使其检索结果缓存失效"""
+        if self.query_cache:
+            self.query_cache.bump_generation(collection_name)
+    
+    def _collection_name(self, name: str) -> str:
+        """
+        集合的实际名称
+        紧凑模式下向量维度不同，使用独立的集合，避免与已有的全维度集合冲突
+        """
+        if settings.vector_compact_mode:
+            return f"{name}_compact{settings.vector_compact_dimensions}"
+        return name
+    
+    def _vector_backend(self, name: str) -> str:
+        """逻辑集合使用的向量存储后端（chroma或numpy）"""
+        numpy_collections = {item.strip() for item in settings.numpy_vector_collections.split(",") if item.strip()}
+        return "numpy" if name in numpy_collections else "chroma"
+    
+    def _get_collection(self, name: str, metadata: Dict[str, Any]):
+        """创建或获取集合（紧凑模式下包装为CompactCollection）"""
+        return self._open_collection(self._collection_name(name), metadata, self._vector_backend(name))
+    
+    def _open_collection(self, collection_name: str, metadata: Dict[str, Any], backend: str = "chroma"):
+        """按实际名称创建或获取集合"""
+        if backend == "numpy":
+            collection = self._numpy_collections.get(collection_name)
+            if collection is None:
+                collection = NumpyCollection(
+                    os.path.join(settings.vector_db_path, "numpy", collection_name),
+                    collection_name,
+                    metadata=metadata,
+                    dtype=settings.numpy_vector_dtype
+                )
+                self._numpy_collections[collection_name] = collection
+        else:
+            collection = self.client.get_or_create_collection(
+                name=collection_name,
+                metadata=metadata
+            )
+        if not settings.vector_compact_mode:
+            return collection
+        return CompactCollection(
+            collection,
+            self.quantized_store,
+            dimensions=settings.vector_compact_dimensions,
+            rescore_multiplier=settings.vector_rescore_multiplier
+        )
     
     def _init_collections(self):
         """初始化向量数据库集合"""
         # 学习计划集合
-        self.learning_plans_collection = self.client.get_or_create_collection(
-            name="learning_plans",
-            metadata={"description": "存储学生的个性化学习计划"}
+        self.learning_plans_collection = self._get_collection(
+            "learning_plans",
+            {"description": "存储学生的个性化学习计划"}
         )
         
-        # 教学材料集合
-        self.teaching_materials_collection = self.client.get_or_create_collection(
-            name="teaching_materials",
-            metadata={"description": "存储教学材料和知识点"}
-        )
+        # 教学材料集合（配置了分片字段时按该字段拆分为多个集合）
+        if settings.teaching_shard_key:
+            self.teaching_materials_collection = self._get_sharded_collection(
+                "teaching_materials",
+                settings.teaching_shard_key,
+                {"description": "存储教学材料和知识点"}
+            )
+        else:
+            self.teaching_materials_collection = self._get_collection(
+                "teaching_materials",
+                {"description": "存储教学材料和知识点"}
+            )
         
         # 学生档案集合
-        self.student_profiles_collection = self.client.get_or_create_collection(
-            name="student_profiles",
-            metadata={"description": "存储学生档案和学习历史"}
+        self.student_profiles_collection = self._get_collection(
+            "student_profiles",
+            {"description": "存储学生档案和学习历史"}
         )
     
-    def store_learning_plan(self, student_id: str, plan_id: str, plan_data: Dict[str, Any]):
-        """存储学习计划到向量数据库"""
+    def _list_collections(self) -> List[tuple]:
+        """列出所有后端中已有的集合，返回[(集合名, 集合元数据)]"""
+        collections = [(collection.name, collection.metadata or {}) for collection in self.client.list_collections()]
+        collections.extend(NumpyCollection.list_collections(os.path.join(settings.vector_db_path, "numpy")))
+        return collections
+    
+    def _delete_collection(self, collection_name: str):
+        """按实际名称删除集合（任一后端）"""
+        collection = self._numpy_collections.pop(collection_name, None)
+        if collection is not None:
+            collection.close()
+            NumpyCollection.delete_collection(os.path.join(settings.vector_db_path, "numpy"), collection_name)
+        elif collection_name in [name for name, _ in self._list_collections()]:
+            self.client.delete_collection(collection_name)
+        if self.quantized_store:
+            self.quantized_store.delete(collection_name)
+    
+    def _get_sharded_collection(self, name: str, shard_key: str, metadata: Dict[str, Any]) -> ShardedCollection:
+        """创建分片集合，分片集合的元数据中记录分片字段和取值，重启后据此找回已有分片"""
+        base_name = self._collection_name(name)
+        
+        def open_shard(collection_name: str, value: str):
+            shard_metadata = dict(metadata, shard_key=shard_key, shard_value=value)
+            return self._open_collection(collection_name, shard_metadata, self._vector_backend(name))
+        
+        def list_shards() -> Dict[str, str]:
+            shards = {}
+            for collection_name, collection_metadata in self._list_collections():
+                if collection_name.startswith(f"{base_name}__") and collection_metadata.get("shard_key") == shard_key:
+                    shards[collection_metadata.get("shard_value", "")] = collection_name
+            return shards
+        
+        return ShardedCollection(
+            base_name,
+            shard_key,
+            open_shard=open_shard,
+            list_shards=list_shards,
+            max_workers=settings.shard_query_workers
+        )
+    
+    def reshard_teaching_materials(self, page_size: int = 500) -> int:
+        """
+        把未分片的teaching_materials集合中的记录迁移到分片集合（复用已存储的向量），迁移完成后删除原集合
+        返回迁移的记录数
+        """
+        if not isinstance(self.teaching_materials_collection, ShardedCollection):
+            raise ValueError("未配置分片字段（TEACHING_SHARD_KEY）")
+        
+        source_name = self._collection_name("teaching_materials")
+        if source_name not in [collection_name for collection_name, _ in self._list_collections()]:
+            return 0
+        
+        source = self._get_collection("teaching_materials", {"description": "存储教学材料和知识点"})
+        moved = 0
+        while True:
+            page = source.get(
+                include=["embeddings", "documents", "metadatas"],
+                limit=page_size,
+                offset=moved
+            )
+            if not page['ids']:
+                break
+            self._upsert_in_batches(
+                self.teaching_materials_collection,
+                page['ids'],
+                [list(embedding) for embedding in page['embeddings']],
+                page['documents'],
+                page['metadatas']
+            )
+            moved += len(page['ids'])
+        
+        self._delete_collection(source_name)
+        self._invalidate_queries("teaching_materials")
+        return moved
+    
+    def store_learning_plan(self, student_id: str, plan_id: str, plan_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        存储学习计划到向量数据库
+        开启近重复检测时返回的结果包含duplicate_of、similarity、action，stored表示本计划是否已入库
+        """
         # 准备文档内容
         doc_content = f"""
 学生ID: {student_id}
@@ -90,6 +351,21 @@ class RAGService:
         # 获取嵌入向量
         embedding = self.embeddings.embed_query(doc_content)
         
+        # 近重复检测：与该学生最相近的已有计划比较
+        result = {"stored": True}
+        duplicate = self._find_duplicate_plan(student_id, plan_id, embedding) if settings.dedup_enabled else None
+        if duplicate:
+            existing_id, similarity = duplicate
+            result.update(duplicate_of=existing_id, similarity=similarity, action=settings.dedup_action)
+            if settings.dedup_action != "replace":
+                if settings.dedup_action == "link":
+                    self.duplicate_links.put("learning_plans", plan_id, existing_id, similarity)
+                result["stored"] = False
+                return result
+            # 替换：删除旧计划，旧计划ID（及链接到它的计划）改为指向新计划
+            self.learning_plans_collection.delete(ids=[existing_id])
+            self.duplicate_links.put("learning_plans", existing_id, plan_id, similarity)
+        
         # 存储到ChromaDB
         self.learning_plans_collection.add(
             ids=[plan_id],
@@ -103,14 +379,49 @@ class RAGService:
                 "type": "learning_plan"
             }]
         )
+        self._invalidate_queries("learning_plans")
+        return result
+    
+    def _find_duplicate_plan(self,
+                             student_id: str,
+                             plan_id: str,
+                             embedding: List[float],
+                             exclude_ids: Optional[List[str]] = None) -> Optional[tuple]:
+        """查找同一学生的近重复学习计划，返回(计划ID, 相似度)"""
+        exclude_ids = [plan_id] + list(exclude_ids or [])
+        results = self.learning_plans_collection.query(
+            query_embeddings=[embedding],
+            where=combine_where([
+                {"type": "learning_plan"},
+                {"student_id": student_id},
+                {"plan_id": {"$nin": exclude_ids}}
+            ]),
+            n_results=1,
+            include=["distances"]
+        )
+        if not results['ids'] or not results['ids'][0]:
+            return None
+        
+        similarity = similarity_from_distance(results['distances'][0][0])
+        if similarity < settings.dedup_similarity_threshold:
+            return None
+        return results['ids'][0][0], similarity
     
     def search_learning_plans(self, query: str, student_id: str = None, k: int = 5) -> List[Dict]:
         """搜索学习计划"""
         # 构建查询条件
-        where_clause = {"type": "learning_plan"}
+        conditions = [{"type": "learning_plan"}]
         if student_id:
-            where_clause["student_id"] = student_id
+            conditions.append({"student_id": student_id})
+        where_clause = combine_where(conditions)
         
+        return self._cached_search(
+            "learning_plans", query, where_clause, k,
+            lambda: self._search_learning_plans(query, where_clause, k)
+        )
+    
+    def _search_learning_plans(self, query: str, where_clause: Dict[str, Any], k: int) -> List[Dict]:
+        """向量检索学习计划"""
         # 获取查询的嵌入向量
         query_embedding = self.embeddings.embed_query(query)
         
@@ -134,49 +445,634 @@ class RAGService:
         
         return formatted_results
     
-    def store_teaching_material(self, material_id: str, content: str, metadata: Dict[str, Any]):
-        """存储教学材料"""
-        # 分割文本
+    def embed_texts(self,
+                    texts: List[str],
+                    progress_callback: Optional[Callable[[int, int], None]] = None) -> List[List[float]]:
+        """
+        批量生成嵌入向量
+        按embedding_batch_size分批调用embed_documents，并以有限并发执行各批次，返回顺序与输入一致
+        """
+        if not texts:
+            return []
+        
+        batch_size = max(1, settings.embedding_batch_size)
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        max_workers = min(max(1, settings.embedding_max_concurrency), len(batches))
+        
+        embeddings: List[List[float]] = []
+        done = 0
+        if max_workers == 1:
+            for batch in batches:
+                embeddings.extend(self.embeddings.embed_documents(batch))
+                done += len(batch)
+                if progress_callback:
+                    progress_callback(done, len(texts))
+            return embeddings
+        
+        # executor.map按提交顺序返回结果，保证向量与文本一一对应
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for batch, batch_embeddings in zip(batches, executor.map(self.embeddings.embed_documents, batches)):
+                embeddings.extend(batch_embeddings)
+                done += len(batch)
+                if progress_callback:
+                    progress_callback(done, len(texts))
+        
+        return embeddings
+    
+    def _upsert_in_batches(self, collection, ids: List[str], embeddings: List[List[float]],
+                           documents: List[str], metadatas: List[Dict[str, Any]]):
+        """按vector_db_add_batch_size分批写入集合（已存在的ID会被覆盖）"""
+        batch_size = max(1, settings.vector_db_add_batch_size)
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            collection.upsert(
+                ids=ids[start:end],
+                embeddings=embeddings[start:end],
+                documents=documents[start:end],
+                metadatas=metadatas[start:end]
+            )
+    
+    def _make_chunk_record(self, material_id: str, index: int, chunk: str, metadata: Dict[str, Any]):
+        """构造文本块记录(块ID, 块文本, 块元数据)"""
+        chunk_metadata = metadata.copy()
+        chunk_metadata.update({
+            "material_id": material_id,
+            "chunk_index": index,
+            "content_hash": content_hash(chunk),
+            "type": "teaching_material"
+        })
+        return f"{material_id}_chunk_{index}", chunk, chunk_metadata
+    
+    def _split_teaching_material(self, material_id: str, content: str, metadata: Dict[str, Any]):
+        """分割教学材料，返回(块ID, 块文本, 块元数据)列表"""
         chunks = self.text_splitter.split_text(content)
+        return [self._make_chunk_record(material_id, i, chunk, metadata) for i, chunk in enumerate(chunks)]
+    
+    def _load_material_manifest(self, material_id: str) -> Optional[Dict[str, Any]]:
+        """
+        读取材料清单
+        尚无清单的旧材料根据集合中已存储的文本块重建（元数据哈希置空，以便下次写入时刷新元数据）
+        """
+        manifest = self.material_manifests.get(material_id)
+        if manifest is not None:
+            return manifest
+        
+        existing = self.teaching_materials_collection.get(
+            where={"material_id": material_id},
+            include=["documents", "metadatas"]
+        )
+        if not existing['ids']:
+            return None
         
-        # 为每个块生成ID和嵌入
-        chunk_ids = []
-        chunk_embeddings = []
-        chunk_metadatas = []
+        hashes_by_index = {}
+        for document, chunk_metadata in zip(existing['documents'], existing['metadatas']):
+            hashes_by_index[int(chunk_metadata.get("chunk_index", 0))] = content_hash(document)
         
-        for i, chunk in enumerate(chunks):
-            chunk_id = f"{material_id}_chunk_{i}"
-            chunk_ids.append(chunk_id)
+        chunk_count = max(hashes_by_index) + 1
+        return {
+            "chunk_hashes": [hashes_by_index.get(i) for i in range(chunk_count)],
+            "metadata_hash": ""
+        }
+    
+    def _write_chunks(self,
+                      records: List[tuple],
+                      reuse_sources: Dict[str, str],
+                      delete_ids: List[str],
+                      progress_callback: Optional[Callable[[int, int], None]] = None,
+                      precomputed: Optional[Dict[str, List[float]]] = None) -> Dict[str, int]:
+        """
+        写入文本块记录并删除多余的旧块
+        reuse_sources为内容哈希到已存储块ID的映射，对应内容直接复用其向量；
+        precomputed为已生成的内容哈希到向量的映射（如近重复检测时生成的），其余内容才生成嵌入
+        """
+        upsert_ids = [record[0] for record in records]
+        upsert_chunks = [record[1] for record in records]
+        upsert_metadatas = [record[2] for record in records]
+        upsert_hashes = [record[2]["content_hash"] for record in records]
+        
+        # 复用已存储的向量（须在覆盖或删除旧块之前读取）
+        embeddings_by_hash: Dict[str, List[float]] = dict(precomputed or {})
+        reuse_ids = list({
+            reuse_sources[h] for h in set(upsert_hashes)
+            if h in reuse_sources and h not in embeddings_by_hash
+        })
+        if reuse_ids:
+            stored = self.teaching_materials_collection.get(ids=reuse_ids, include=["embeddings"])
+            stored_embeddings = dict(zip(stored['ids'], stored['embeddings']))
+            for chunk_hash in set(upsert_hashes):
+                source_id = reuse_sources.get(chunk_hash)
+                if chunk_hash not in embeddings_by_hash and source_id in stored_embeddings:
+                    embeddings_by_hash[chunk_hash] = list(stored_embeddings[source_id])
+        
+        # 只为新增或修改的内容生成嵌入向量
+        pending_texts: Dict[str, str] = {}
+        for chunk_hash, chunk in zip(upsert_hashes, upsert_chunks):
+            if chunk_hash not in embeddings_by_hash:
+                pending_texts.setdefault(chunk_hash, chunk)
+        if pending_texts:
+            pending_hashes = list(pending_texts.keys())
+            vectors = self.embed_texts(
+                [pending_texts[h] for h in pending_hashes],
+                progress_callback=progress_callback
+            )
+            embeddings_by_hash.update(zip(pending_hashes, vectors))
+        
+        # 批量存储到ChromaDB，并同步更新词法索引
+        if upsert_ids:
+            self._upsert_in_batches(
+                self.teaching_materials_collection,
+                upsert_ids,
+                [embeddings_by_hash[h] for h in upsert_hashes],
+                upsert_chunks,
+                upsert_metadatas
+            )
+            if self.lexical_index:
+                self.lexical_index.add_documents(upsert_ids, upsert_chunks, upsert_metadatas)
+        
+        if delete_ids:
+            self.teaching_materials_collection.delete(ids=delete_ids)
+            if self.lexical_index:
+                self.lexical_index.delete(delete_ids)
+        
+        if upsert_ids or delete_ids:
+            self._invalidate_queries("teaching_materials")
+        
+        return {
+            "upserted": len(upsert_ids),
+            "embedded": len(pending_texts),
+            "deleted": len(delete_ids)
+        }
+    
+    def store_teaching_material(self, material_id: str, content: str, metadata: Dict[str, Any]) -> Dict[str, int]:
+        """存储教学材料（重复调用时增量更新）"""
+        return self.store_teaching_materials([{
+            "material_id": material_id,
+            "content": content,
+            "metadata": metadata
+        }])
+    
+    def store_teaching_materials(self,
+                                 materials: List[Dict[str, Any]],
+                                 progress_callback: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """
+        批量存储教学材料
+        materials中每项包含material_id、content、metadata；所有材料的文本块一起批量嵌入、批量写入。
+        已入库的材料按文本块内容哈希增量更新：未变化的块不重写，内容已有向量的块直接复用向量，
+        只有新增或修改的内容才生成嵌入，多余的旧块被删除。
+        开启近重复检测时，首次入库的材料先与已有材料比较，按dedup_action跳过、链接或替换。
+        返回统计：chunks（材料总块数）、upserted（写入块数）、embedded（新生成嵌入数）、deleted（删除块数）、
+        duplicates（判定为近重复的材料）
+        """
+        records = []
+        delete_ids = []
+        reuse_sources: Dict[str, str] = {}  # 内容哈希 -> 可复用其向量的已存储块ID
+        manifests = []
+        new_materials: Dict[str, List[tuple]] = {}  # 首次入库的材料 -> 文本块记录
+        
+        for material in materials:
+            material_id = material["material_id"]
+            metadata = normalize_material_metadata(material.get("metadata") or {})
+            
+            # 分割文本
+            material_records = self._split_teaching_material(material_id, material["content"], metadata)
+            new_hashes = [record[2]["content_hash"] for record in material_records]
+            meta_hash = metadata_hash(metadata)
             
-            # 获取嵌入向量
-            embedding = self.embeddings.embed_query(chunk)
-            chunk_embeddings.append(embedding)
+            # 与上次入库的清单对比
+            old_manifest = self._load_material_manifest(material_id)
+            old_hashes = old_manifest["chunk_hashes"] if old_manifest else []
+            metadata_changed = old_manifest is None or old_manifest["metadata_hash"] != meta_hash
             
-            # 准备元数据
-            chunk_metadata = metadata.copy()
-            chunk_metadata.update({
+            for i, old_hash in enumerate(old_hashes):
+                if old_hash:
+                    reuse_sources.setdefault(old_hash, f"{material_id}_chunk_{i}")
+            
+            for i, record in enumerate(material_records):
+                if not metadata_changed and i < len(old_hashes) and old_hashes[i] == new_hashes[i]:
+                    continue
+                records.append(record)
+            
+            # 文本块数量减少时删除多余的旧块
+            delete_ids.extend(f"{material_id}_chunk_{i}" for i in range(len(material_records), len(old_hashes)))
+            manifests.append((material_id, new_hashes, meta_hash))
+            if old_manifest is None and material_records:
+                new_materials[material_id] = material_records
+        
+        precomputed: Dict[str, List[float]] = {}
+        duplicates = []
+        if settings.dedup_enabled and new_materials:
+            precomputed, duplicates = self._dedup_new_materials(
+                new_materials,
+                batch_ids=[material_id for material_id, _, _ in manifests],
+                progress_callback=progress_callback
+            )
+            skipped = {item["material_id"] for item in duplicates if item["action"] != "replace"}
+            records = [record for record in records if record[2]["material_id"] not in skipped]
+            manifests = [manifest for manifest in manifests if manifest[0] not in skipped]
+        
+        result = self._write_chunks(records, reuse_sources, delete_ids,
+                                    progress_callback=progress_callback, precomputed=precomputed)
+        
+        for material_id, chunk_hashes, meta_hash in manifests:
+            self.material_manifests.put(material_id, chunk_hashes, meta_hash)
+        
+        result["embedded"] += len(precomputed)
+        result["chunks"] = sum(len(chunk_hashes) for _, chunk_hashes, _ in manifests)
+        result["duplicates"] = duplicates
+        return result
+    
+    def _dedup_new_materials(self,
+                             new_materials: Dict[str, List[tuple]],
+                             batch_ids: List[str],
+                             progress_callback: Optional[Callable[[int, int], None]] = None) -> tuple:
+        """
+        对首次入库的材料做近重复检测
+        返回(内容哈希 -> 向量, 近重复材料列表)；向量供随后写入时直接使用，不重复生成嵌入
+        """
+        texts: Dict[str, str] = {}
+        for material_records in new_materials.values():
+            for _, chunk, chunk_metadata in material_records:
+                texts.setdefault(chunk_metadata["content_hash"], chunk)
+        hashes = list(texts.keys())
+        precomputed = dict(zip(hashes, self.embed_texts([texts[h] for h in hashes], progress_callback=progress_callback)))
+        
+        duplicates = []
+        for material_id, material_records in new_materials.items():
+            # 只与已入库的材料比较，同批次的其他材料不参与（由离线压缩任务处理）
+            duplicate = self._find_duplicate_material(
+                material_id,
+                [precomputed[record[2]["content_hash"]] for record in material_records],
+                exclude_ids=batch_ids
+            )
+            if not duplicate:
+                continue
+            
+            canonical_id, similarity = duplicate
+            duplicates.append({
                 "material_id": material_id,
-                "chunk_index": i,
-                "type": "teaching_material"
+                "duplicate_of": canonical_id,
+                "similarity": similarity,
+                "action": settings.dedup_action
             })
-            chunk_metadatas.append(chunk_metadata)
-        
-        # 批量存储到ChromaDB
-        if chunk_ids:
-            self.teaching_materials_collection.add(
-                ids=chunk_ids,
-                embeddings=chunk_embeddings,
-                documents=chunks,
-                metadatas=chunk_metadatas
-            )
+            if settings.dedup_action == "replace":
+                # 删除旧材料，旧材料ID（及链接到它的材料）改为指向新材料
+                self._delete_material_chunks(canonical_id)
+                self.duplicate_links.put("teaching_materials", canonical_id, material_id, similarity)
+            elif settings.dedup_action == "link":
+                self.duplicate_links.put("teaching_materials", material_id, canonical_id, similarity)
+        
+        return precomputed, duplicates
     
-    def search_teaching_materials(self, query: str, subject: str = None, k: int = 5) -> List[Dict]:
-        """搜索教学材料"""
+    def _find_duplicate_material(self,
+                                 material_id: str,
+                                 chunk_embeddings: List[List[float]],
+                                 exclude_ids: Optional[List[str]] = None) -> Optional[tuple]:
+        """
+        查找近重复的已有材料，返回(材料ID, 平均相似度)
+        逐块查询最近邻，近重复文本块占比达到dedup_min_chunk_ratio时，取匹配块最多的材料
+        """
+        exclude_ids = list({material_id, *(exclude_ids or [])})
+        results = self.teaching_materials_collection.query(
+            query_embeddings=chunk_embeddings,
+            where=combine_where([
+                {"type": "teaching_material"},
+                {"material_id": {"$nin": exclude_ids}}
+            ]),
+            n_results=1,
+            include=["metadatas", "distances"]
+        )
+        
+        matches: Dict[str, List[float]] = {}
+        for row in range(len(chunk_embeddings)):
+            if not results['ids'][row]:
+                continue
+            similarity = similarity_from_distance(results['distances'][row][0])
+            if similarity >= settings.dedup_similarity_threshold:
+                matches.setdefault(results['metadatas'][row][0]["material_id"], []).append(similarity)
+        if not matches:
+            return None
+        
+        canonical_id = max(matches, key=lambda key: len(matches[key]))
+        similarities = matches[canonical_id]
+        if len(similarities) / len(chunk_embeddings) < settings.dedup_min_chunk_ratio:
+            return None
+        return canonical_id, sum(similarities) / len(similarities)
+    
+    def store_teaching_material_stream(self,
+                                       material_id: str,
+                                       source: Union[str, Iterable[str]],
+                                       metadata: Dict[str, Any],
+                                       progress_callback: Optional[Callable[[Dict[str, int]], None]] = None) -> Dict[str, int]:
+        """
+        流式存储大型教学材料
+        source为文件路径或文本块迭代器；文本被惰性切分，每凑满stream_window_chunks个待写入的块就嵌入并写入一次，
+        内存占用与文档大小无关。与store_teaching_material一样按内容哈希增量更新。
+        progress_callback在每个窗口写入后以累计统计调用
+        """
+        metadata = normalize_material_metadata(metadata or {})
+        blocks = iter_file_blocks(source, block_size=settings.stream_block_size) if isinstance(source, str) else source
+        chunks = iter_chunks(
+            blocks,
+            chunk_size=self.CHUNK_SIZE,
+            chunk_overlap=self.CHUNK_OVERLAP,
+            separators=self.SEPARATORS
+        )
+        
+        meta_hash = metadata_hash(metadata)
+        old_manifest = self._load_material_manifest(material_id)
+        old_hashes = old_manifest["chunk_hashes"] if old_manifest else []
+        metadata_changed = old_manifest is None or old_manifest["metadata_hash"] != meta_hash
+        
+        reuse_sources: Dict[str, str] = {}
+        for i, old_hash in enumerate(old_hashes):
+            if old_hash:
+                reuse_sources.setdefault(old_hash, f"{material_id}_chunk_{i}")
+        
+        totals = {"chunks": 0, "upserted": 0, "embedded": 0, "deleted": 0}
+        new_hashes = []
+        window = []
+        window_size = max(1, settings.stream_window_chunks)
+        
+        def flush():
+            result = self._write_chunks(window, reuse_sources, [])
+            for key in ("upserted", "embedded"):
+                totals[key] += result[key]
+            # 已被覆盖的旧块不能再作为向量复用来源
+            for chunk_id, _, _ in window:
+                index = int(chunk_id.rsplit("_", 1)[1])
+                if index < len(old_hashes) and reuse_sources.get(old_hashes[index]) == chunk_id:
+                    del reuse_sources[old_hashes[index]]
+            window.clear()
+            if progress_callback:
+                progress_callback(dict(totals))
+        
+        for index, chunk in enumerate(chunks):
+            record = self._make_chunk_record(material_id, index, chunk, metadata)
+            new_hashes.append(record[2]["content_hash"])
+            totals["chunks"] += 1
+            
+            if not metadata_changed and index < len(old_hashes) and old_hashes[index] == new_hashes[index]:
+                continue
+            window.append(record)
+            if len(window) >= window_size:
+                flush()
+        
+        if window:
+            flush()
+        
+        # 文本块数量减少时删除多余的旧块
+        delete_ids = [f"{material_id}_chunk_{i}" for i in range(len(new_hashes), len(old_hashes))]
+        if delete_ids:
+            totals["deleted"] = self._write_chunks([], reuse_sources, delete_ids)["deleted"]
+        
+        self.material_manifests.put(material_id, new_hashes, meta_hash)
+        return totals
+    
+    def delete_teaching_material(self, material_id: str):
+        """删除教学材料的所有文本块及其重复关系"""
+        self.duplicate_links.delete("teaching_materials", material_id)
+        self._delete_material_chunks(material_id)
+    
+    def _delete_material_chunks(self, material_id: str):
+        """删除教学材料的所有文本块"""
+        existing = self.teaching_materials_collection.get(
+            where={"material_id": material_id},
+            include=[]
+        )
+        self.material_manifests.delete(material_id)
+        if not existing['ids']:
+            return
+        
+        self.teaching_materials_collection.delete(ids=existing['ids'])
+        if self.lexical_index:
+            self.lexical_index.delete(existing['ids'])
+        self._invalidate_queries("teaching_materials")
+    
+    def search_teaching_materials(self,
+                                  query: str,
+                                  subject: str = None,
+                                  k: int = 5,
+                                  mode: Optional[str] = None,
+                                  grade: Union[str, int, None] = None,
+                                  material_type: Union[str, List[str], None] = None,
+                                  source: Optional[str] = None) -> List[Dict]:
+        """
+        搜索教学材料
+        mode: vector（向量检索）、lexical（BM25词法检索）、hybrid（两路结果RRF融合）、
+              auto（短关键词走词法检索，其余走混合检索），默认取配置teaching_search_mode
+        subject/grade/material_type/source为结构化过滤条件，在检索前限定候选范围；
+        grade可为"初二"、"八年级"、"7-9年级"等形式，按年级范围重叠匹配
+        """
+        mode = mode or settings.teaching_search_mode
+        if mode not in ("vector", "lexical", "hybrid", "auto"):
+            raise ValueError(f"不支持的检索模式: {mode}")
+        
         # 构建查询条件
-        where_clause = {"type": "teaching_material"}
-        if subject:
-            where_clause["subject"] = subject
+        where_clause = build_material_filter(subject, grade, material_type, source)
+        
+        # 未启用词法索引时只能使用向量检索
+        if not self.lexical_index:
+            mode = "vector"
+        elif mode == "auto":
+            mode = "lexical" if self._is_keyword_query(query) else "hybrid"
+        
+        return self._cached_search(
+            "teaching_materials", query, where_clause, k,
+            lambda: self._search_teaching_materials(query, where_clause, k, mode),
+            mode=mode
+        )
+    
+    def _search_teaching_materials(self, query: str, where_clause: Dict[str, Any], k: int, mode: str) -> List[Dict]:
+        """按指定模式检索教学材料（mode已解析为vector/lexical/hybrid）"""
+        if mode == "vector":
+            return self._vector_search_teaching_materials(query, where_clause, k)
+        
+        if mode == "lexical":
+            results = self.lexical_index.search(query, k=k, where=where_clause)
+            # 词法检索无命中（如查询全为停用符号）时回退到向量检索
+            return results or self._vector_search_teaching_materials(query, where_clause, k)
         
+        # 混合检索：两路各取更多候选，按倒数排名融合（RRF）
+        candidates = k * max(1, settings.hybrid_candidate_multiplier)
+        vector_results = self._vector_search_teaching_materials(query, where_clause, candidates)
+        lexical_results = self.lexical_index.search(query, k=candidates, where=where_clause)
+        return self._reciprocal_rank_fusion([vector_results, lexical_results], k)
+    
+    def rebuild_lexical_index(self, page_size: int = 1000) -> int:
+        """根据teaching_materials集合重建词法索引（用于启用词法索引前已入库的材料），返回文档数"""
+        if not self.lexical_index:
+            raise ValueError("词法索引未启用")
+        
+        self.lexical_index.clear()
+        offset = 0
+        while True:
+            page = self.teaching_materials_collection.get(
+                include=["documents", "metadatas"],
+                limit=page_size,
+                offset=offset
+            )
+            if not page['ids']:
+                break
+            self.lexical_index.add_documents(page['ids'], page['documents'], page['metadatas'])
+            offset += len(page['ids'])
+        
+        self._invalidate_queries("teaching_materials")
+        return offset
+    
+    def refresh_material_metadata(self, page_size: int = 500) -> int:
+        """
+        为已入库的文本块补全规范化元数据（年级范围等），复用已存储的向量，返回更新的块数
+        用于年级过滤上线前入库的材料
+        """
+        updated = 0
+        offset = 0
+        while True:
+            page = self.teaching_materials_collection.get(
+                include=["embeddings", "documents", "metadatas"],
+                limit=page_size,
+                offset=offset
+            )
+            if not page['ids']:
+                break
+            offset += len(page['ids'])
+            
+            normalized = [normalize_material_metadata(metadata) for metadata in page['metadatas']]
+            changed = [i for i, metadata in enumerate(normalized) if metadata != page['metadatas'][i]]
+            if not changed:
+                continue
+            
+            ids = [page['ids'][i] for i in changed]
+            documents = [page['documents'][i] for i in changed]
+            metadatas = [normalized[i] for i in changed]
+            self._upsert_in_batches(
+                self.teaching_materials_collection,
+                ids,
+                [list(page['embeddings'][i]) for i in changed],
+                documents,
+                metadatas
+            )
+            if self.lexical_index:
+                self.lexical_index.add_documents(ids, documents, metadatas)
+            updated += len(changed)
+        
+        if updated:
+            self._invalidate_queries("teaching_materials")
+        return updated
+    
+    def find_duplicates(self, collection_name: str, page_size: int = 500) -> List[Dict[str, Any]]:
+        """
+        离线扫描集合中的近重复条目，返回[{id, duplicate_of, similarity}]
+        learning_plans：同一学生的计划两两比较，保留较新的计划；
+        teaching_materials：按块数从少到多逐个材料检测，与尚未判定为重复的其他材料比较
+        """
+        if collection_name == "learning_plans":
+            return self._find_duplicate_plans(page_size)
+        if collection_name == "teaching_materials":
+            return self._find_duplicate_materials(page_size)
+        raise ValueError(f"不支持近重复检测的集合: {collection_name}")
+    
+    def _find_duplicate_plans(self, page_size: int) -> List[Dict[str, Any]]:
+        """按学生分组两两比较学习计划"""
+        groups: Dict[str, List[tuple]] = {}
+        offset = 0
+        while True:
+            page = self.learning_plans_collection.get(
+                include=["embeddings", "metadatas"],
+                limit=page_size,
+                offset=offset
+            )
+            if not page['ids']:
+                break
+            offset += len(page['ids'])
+            for plan_id, embedding, metadata in zip(page['ids'], page['embeddings'], page['metadatas']):
+                groups.setdefault(metadata.get("student_id", ""), []).append(
+                    (str(metadata.get("created_at", "")), plan_id, embedding)
+                )
+        
+        duplicates = []
+        for plans in groups.values():
+            # 较新的计划优先保留
+            plans.sort(key=lambda plan: plan[0], reverse=True)
+            vectors = np.asarray([plan[2] for plan in plans], dtype=np.float32)
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            
+            kept: List[int] = []
+            for i in range(len(plans)):
+                if kept:
+                    similarities = vectors[kept] @ vectors[i]
+                    best = int(np.argmax(similarities))
+                    if similarities[best] >= settings.dedup_similarity_threshold:
+                        duplicates.append({
+                            "id": plans[i][1],
+                            "duplicate_of": plans[kept[best]][1],
+                            "similarity": float(similarities[best])
+                        })
+                        continue
+                kept.append(i)
+        return duplicates
+    
+    def _find_duplicate_materials(self, page_size: int) -> List[Dict[str, Any]]:
+        """逐个材料检测近重复，块数少的材料先检测，被包含在较大材料中的小材料判定为重复"""
+        chunk_counts: Dict[str, int] = {}
+        offset = 0
+        while True:
+            page = self.teaching_materials_collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            if not page['ids']:
+                break
+            offset += len(page['ids'])
+            for metadata in page['metadatas']:
+                material_id = metadata.get("material_id")
+                if material_id:
+                    chunk_counts[material_id] = chunk_counts.get(material_id, 0) + 1
+        
+        duplicates = []
+        removed: List[str] = []
+        for material_id in sorted(chunk_counts, key=lambda key: (chunk_counts[key], key)):
+            chunks = self.teaching_materials_collection.get(
+                where={"material_id": material_id},
+                include=["embeddings"]
+            )
+            duplicate = self._find_duplicate_material(
+                material_id,
+                [list(embedding) for embedding in chunks['embeddings']],
+                exclude_ids=removed
+            )
+            if duplicate:
+                duplicates.append({"id": material_id, "duplicate_of": duplicate[0], "similarity": duplicate[1]})
+                removed.append(material_id)
+        return duplicates
+    
+    def compact_duplicates(self,
+                           collection_name: str,
+                           record_links: bool = True,
+                           dry_run: bool = False) -> List[Dict[str, Any]]:
+        """
+        离线压缩：删除find_duplicates找到的近重复条目，record_links为True时记录其与保留条目的重复关系
+        返回近重复条目列表（dry_run时只扫描不删除）
+        """
+        duplicates = self.find_duplicates(collection_name)
+        if dry_run or not duplicates:
+            return duplicates
+        
+        for item in duplicates:
+            if record_links:
+                self.duplicate_links.put(collection_name, item["id"], item["duplicate_of"], item["similarity"])
+            if collection_name == "teaching_materials":
+                self._delete_material_chunks(item["id"])
+            else:
+                self.learning_plans_collection.delete(ids=[item["id"]])
+        self._invalidate_queries(collection_name)
+        return duplicates
+    
+    def _is_keyword_query(self, query: str) -> bool:
+        """判断是否为适合词法检索的短关键词查询"""
+        query = query.strip()
+        if len(query) > settings.lexical_fast_path_max_chars:
+            return False
+        return not any(mark in query for mark in "，。！？,.!?")
+    
+    def _vector_search_teaching_materials(self, query: str, where_clause: Dict[str, Any], k: int) -> List[Dict]:
+        """向量检索教学材料"""
         # 获取查询的嵌入向量
         query_embedding = self.embeddings.embed_query(query)
         
@@ -187,19 +1083,85 @@ class RAGService:
             n_results=k
         )
         
-        # 格式化返回结果
+        return self._format_query_results(results, 0)
+    
+    def _format_query_results(self, results: Dict[str, Any], row: int) -> List[Dict]:
+        """格式化query返回结果中第row个查询的结果"""
         formatted_results = []
-        if results['ids'] and results['ids'][0]:
-            for i in range(len(results['ids'][0])):
+        if results['ids'] and results['ids'][row]:
+            for i in range(len(results['ids'][row])):
                 formatted_results.append({
-                    'id': results['ids'][0][i],
-                    'content': results['documents'][0][i],
-                    'metadata': results['metadatas'][0][i],
-                    'distance': results['distances'][0][i] if 'distances' in results else None
+                    'id': results['ids'][row][i],
+                    'content': results['documents'][row][i],
+                    'metadata': results['metadatas'][row][i],
+                    'distance': results['distances'][row][i] if results.get('distances') else None
                 })
-        
         return formatted_results
     
+    def search_teaching_materials_batch(self,
+                                        queries: List[str],
+                                        subject: str = None,
+                                        k: int = 5,
+                                        deduplicate: bool = False,
+                                        grade: Union[str, int, None] = None,
+                                        material_type: Union[str, List[str], None] = None) -> List[List[Dict]]:
+        """
+        批量搜索教学材料（向量检索）
+        所有查询在一次embed_documents调用中生成嵌入，并通过一次多向量query完成检索，按查询顺序返回结果。
+        deduplicate为True时，同一文本块只保留在与其距离最近的那个查询的结果中
+        """
+        if not queries:
+            return []
+        
+        # 构建查询条件
+        where_clause = build_material_filter(subject, grade, material_type)
+        
+        # 一次性生成所有查询的嵌入向量
+        query_embeddings = self.embeddings.embed_documents(queries)
+        
+        # 去重会移除部分结果，多取候选以尽量保证每个查询仍有k条
+        n_results = k * 2 if deduplicate else k
+        results = self.teaching_materials_collection.query(
+            query_embeddings=query_embeddings,
+            where=where_clause,
+            n_results=n_results
+        )
+        
+        per_query = [self._format_query_results(results, row) for row in range(len(queries))]
+        if not deduplicate:
+            return [items[:k] for items in per_query]
+        
+        # 每个文本块归属于距离最近的查询
+        owners: Dict[str, tuple] = {}
+        for row, items in enumerate(per_query):
+            for item in items:
+                distance = item['distance'] if item['distance'] is not None else float("inf")
+                if item['id'] not in owners or distance < owners[item['id']][0]:
+                    owners[item['id']] = (distance, row)
+        
+        return [
+            [item for item in items if owners[item['id']][1] == row][:k]
+            for row, items in enumerate(per_query)
+        ]
+    
+    def _reciprocal_rank_fusion(self, result_lists: List[List[Dict]], k: int) -> List[Dict]:
+        """按倒数排名融合多路检索结果"""
+        fused: Dict[str, Dict] = {}
+        for results in result_lists:
+            for rank, result in enumerate(results):
+                entry = fused.setdefault(result['id'], {
+                    'id': result['id'],
+                    'content': result['content'],
+                    'metadata': result['metadata'],
+                    'distance': None,
+                    'score': 0.0
+                })
+                if result.get('distance') is not None:
+                    entry['distance'] = result['distance']
+                entry['score'] += 1.0 / (settings.hybrid_rrf_k + rank + 1)
+        
+        return sorted(fused.values(), key=lambda item: item['score'], reverse=True)[:k]
+    
     def store_student_profile(self, student_id: str, profile_data: Dict[str, Any]):
         """存储学生档案到向量数据库"""
         # 准备文档内容
@@ -229,44 +1191,232 @@ class RAGService:
     
     def find_similar_students(self, student_id: str, k: int = 3) -> List[Dict]:
         """查找相似的学生档案"""
-        # 先获取当前学生的档案
-        current_student = self.student_profiles_collection.get(
-            ids=[student_id]
-        )
+        return self.find_similar_students_batch([student_id], k).get(student_id, [])
+    
+    def find_similar_students_batch(self, student_ids: List[str], k: int = 3) -> Dict[str, List[Dict]]:
+        """
+        批量查找相似的学生档案
+        直接使用集合中已存储的向量作为查询向量，所有学生的近邻在一次查询中返回
+        返回：{学生ID: 相似学生列表}，未建档的学生不出现在结果中
+        """
+        # 去重并保持顺序
+        student_ids = list(dict.fromkeys(student_ids))
+        if not student_ids:
+            return {}
         
-        if not current_student['ids']:
-            return []
+        # 读取已存储的档案向量
+        stored = self.student_profiles_collection.get(
+            ids=student_ids,
+            include=["embeddings"]
+        )
         
-        # 使用当前学生的档案内容进行相似度搜索
-        current_doc = current_student['documents'][0]
-        query_embedding = self.embeddings.embed_query(current_doc)
+        if not stored['ids']:
+            return {}
         
         # 搜索相似学生（排除自己）
         results = self.student_profiles_collection.query(
-            query_embeddings=[query_embedding],
+            query_embeddings=stored['embeddings'],
             where={"type": "student_profile"},
             n_results=k + 1  # 多查一个，因为要排除自己
         )
         
         # 格式化结果并排除自己
-        formatted_results = []
-        if results['ids'] and results['ids'][0]:
-            for i in range(len(results['ids'][0])):
-                if results['ids'][0][i] != student_id:
-                    formatted_results.append({
-                        'id': results['ids'][0][i],
-                        'content': results['documents'][0][i],
-                        'metadata': results['metadatas'][0][i],
-                        'similarity': 1 - results['distances'][0][i] if 'distances' in results else None
-                    })
+        similar_students = {}
+        for row, current_id in enumerate(stored['ids']):
+            formatted_results = []
+            if results['ids'] and results['ids'][row]:
+                for i in range(len(results['ids'][row])):
+                    if results['ids'][row][i] != current_id:
+                        formatted_results.append({
+                            'id': results['ids'][row][i],
+                            'content': results['documents'][row][i],
+                            'metadata': results['metadatas'][row][i],
+                            'similarity': 1 - results['distances'][row][i] if 'distances' in results else None
+                        })
+            similar_students[current_id] = formatted_results[:k]
+        
+        return similar_students
+    
+    async def _run_in_executor(self, func: Callable, *args, **kwargs):
+        """在专用线程池中执行同步方法"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        """生成单条文本的嵌入向量（异步）"""
+        return await self._run_in_executor(self.embeddings.embed_query, text)
+    
+    async def astore_learning_plan(self, *args, **kwargs):
+        """store_learning_plan的异步版本"""
+        return await self._run_in_executor(self.store_learning_plan, *args, **kwargs)
+    
+    async def asearch_learning_plans(self, *args, **kwargs) -> List[Dict]:
+        """search_learning_plans的异步版本"""
+        return await self._run_in_executor(self.search_learning_plans, *args, **kwargs)
+    
+    async def astore_teaching_material(self, *args, **kwargs):
+        """store_teaching_material的异步版本"""
+        return await self._run_in_executor(self.store_teaching_material, *args, **kwargs)
+    
+    async def astore_teaching_materials(self, *args, **kwargs) -> int:
+        """store_teaching_materials的异步版本"""
+        return await self._run_in_executor(self.store_teaching_materials, *args, **kwargs)
+    
+    async def astore_teaching_material_stream(self, *args, **kwargs) -> Dict[str, int]:
+        """store_teaching_material_stream的异步版本"""
+        return await self._run_in_executor(self.store_teaching_material_stream, *args, **kwargs)
+    
+    async def asearch_teaching_materials(self, *args, **kwargs) -> List[Dict]:
+        """search_teaching_materials的异步版本"""
+        return await self._run_in_executor(self.search_teaching_materials, *args, **kwargs)
+    
+    async def asearch_teaching_materials_batch(self, *args, **kwargs) -> List[List[Dict]]:
+        """search_teaching_materials_batch的异步版本"""
+        return await self._run_in_executor(self.search_teaching_materials_batch, *args, **kwargs)
+    
+    async def astore_student_profile(self, *args, **kwargs):
+        """store_student_profile的异步版本"""
+        return await self._run_in_executor(self.store_student_profile, *args, **kwargs)
+    
+    async def afind_similar_students(self, *args, **kwargs) -> List[Dict]:
+        """find_similar_students的异步版本"""
+        return await self._run_in_executor(self.find_similar_students, *args, **kwargs)
+    
+    async def afind_similar_students_batch(self, *args, **kwargs) -> Dict[str, List[Dict]]:
+        """find_similar_students_batch的异步版本"""
+        return await self._run_in_executor(self.find_similar_students_batch, *args, **kwargs)
+    
+    def close(self):
+        """释放资源（关闭线程池和嵌入缓存）"""
+        self._executor.shutdown(wait=True)
+        if isinstance(self.teaching_materials_collection, ShardedCollection):
+            self.teaching_materials_collection.close()
+        for collection in self._numpy_collections.values():
+            collection.close()
+        self._numpy_collections = {}
+        if self.lexical_index:
+            self.lexical_index.close()
+            self.lexical_index = None
+        self.material_manifests.close()
+        self.duplicate_links.close()
+        if self.quantized_store:
+            self.quantized_store.close()
+            self.quantized_store = None
+        if self.embedding_cache:
+            self.embedding_cache.close()
+            self.embedding_cache = None
+    
+    def export_snapshot(self,
+                        directory: str,
+                        collections: Optional[List[str]] = None,
+                        dtype: str = "float32",
+                        page_size: int = 1000) -> Dict[str, int]:
+        """
+        导出集合快照（id、全维度向量、文档、元数据），返回各集合导出的记录数
+        快照与后端无关，可导入到任意后端、分片或紧凑模式的集合中
+        """
+        collections = collections or self.COLLECTION_NAMES
+        counts = {}
+        details = {}
+        for name in collections:
+            collection = getattr(self, f"{name}_collection")
+            total = collection.count()
+            first = collection.get(include=["embeddings"], limit=1)
+            dimensions = len(first['embeddings'][0]) if first['ids'] else 0
+            
+            writer = SnapshotWriter(directory, name, total, dimensions, dtype=dtype)
+            offset = 0
+            while offset < total:
+                page = collection.get(
+                    include=["embeddings", "documents", "metadatas"],
+                    limit=page_size,
+                    offset=offset
+                )
+                if not page['ids']:
+                    break
+                writer.append(page['ids'], page['embeddings'], page['documents'], page['metadatas'])
+                offset += len(page['ids'])
+            counts[name] = writer.close()
+            details[name] = {"count": counts[name], "dimensions": dimensions}
         
-        return formatted_results[:k]
+        write_manifest(directory, {
+            "embedding_model": self._embedding_model_name(),
+            "dtype": dtype,
+            "collections": details
+        })
+        return counts
+    
+    def import_snapshot(self,
+                        directory: str,
+                        collections: Optional[List[str]] = None,
+                        replace: bool = True,
+                        force: bool = False) -> Dict[str, int]:
+        """
+        从快照批量导入集合（直接写入快照中的向量，不重新生成嵌入），返回各集合导入的记录数
+        replace为True时先清空目标集合（清空失败时中止导入）；快照的嵌入模型与当前配置不一致时拒绝导入（force跳过检查）
+        """
+        manifest = read_manifest(directory)
+        if not force and manifest["embedding_model"] != self._embedding_model_name():
+            raise ValueError(
+                f"快照的嵌入模型（{manifest['embedding_model']}）与当前配置（{self._embedding_model_name()}）不一致"
+            )
+        
+        counts = {}
+        for name in collections or list(manifest["collections"].keys()):
+            if name not in manifest["collections"]:
+                raise ValueError(f"快照中没有集合: {name}")
+            if replace:
+                self._reset_collection(name)
+                remaining = getattr(self, f"{name}_collection").count()
+                if remaining:
+                    raise RuntimeError(f"清空集合 {name} 后仍有 {remaining} 条记录，已中止导入")
+            
+            collection = getattr(self, f"{name}_collection")
+            imported = 0
+            material_ids = set()
+            for ids, embeddings, documents, metadatas in iter_snapshot(
+                directory, name, batch_size=max(1, settings.vector_db_add_batch_size)
+            ):
+                collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+                imported += len(ids)
+                material_ids.update(metadata.get("material_id") for metadata in metadatas if metadata)
+            counts[name] = imported
+            
+            if name == "teaching_materials":
+                # 导入的材料删除旧清单，下次写入时根据集合内容重建（合并导入时旧清单与集合内容不再一致）
+                for material_id in material_ids - {None}:
+                    self.material_manifests.delete(material_id)
+                # 词法索引由导入的材料重建
+                if self.lexical_index:
+                    self.rebuild_lexical_index()
+            self._invalidate_queries(name)
+        return counts
     
     def clear_collection(self, collection_name: str):
         """清空指定的集合（用于测试或重置）"""
         try:
-            self.client.delete_collection(collection_name)
-            # 重新初始化集合
-            self._init_collections()
+            self._reset_collection(collection_name)
         except Exception as e:
-            print(f"清空集合 {collection_name} 失败: {e}") 
\ No newline at end of file
+            print(f"清空集合 {collection_name} 失败: {e}")
+    
+    def _reset_collection(self, collection_name: str):
+        """删除并重新创建集合，同时清空其重复记录、材料清单和词法索引（失败时抛出异常）"""
+        collection_names = [self._collection_name(collection_name)]
+        collection = getattr(self, f"{collection_name}_collection", None)
+        if isinstance(collection, ShardedCollection):
+            # 分片集合需删除所有分片
+            collection.close()
+            collection_names = [
+                existing for existing, _ in self._list_collections()
+                if existing.startswith(f"{collection.name}__")
+            ]
+        for name in collection_names:
+            self._delete_collection(name)
+        self.duplicate_links.clear(collection_name)
+        if collection_name == "teaching_materials":
+            self.material_manifests.clear()
+            if self.lexical_index:
+                self.lexical_index.clear()
+        self._invalidate_queries(collection_name)
+        # 重新初始化集合
+        self._init_collections() 
\ No newline at end of file
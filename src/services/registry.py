@@ -0,0 +1,148 @@
+"""
+服务注册表 - 管理进程内共享的服务实例
+"""
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from ..core.config import settings
+from .job_runner import JobRunner
+from .job_store import DatabaseJobStore
+from .llm_clients import llm_clients
+from .llm_service import LLMService
+from .rag_service import RAGService
+from .semantic_cache import SemanticResponseCache
+
+
+class ServiceRegistry:
+    """进程级服务注册表，负责共享服务实例的延迟创建、预热与关闭"""
+
+    def __init__(self):
+        self._llm_service: Optional[LLMService] = None
+        self._rag_service: Optional[RAGService] = None
+        self._response_cache: Optional[SemanticResponseCache] = None
+        self._job_runner: Optional[JobRunner] = None
+        self._lock = threading.Lock()
+        self._warmup_thread: Optional[threading.Thread] = None
+        self._warmup_status: Dict[str, Any] = {"state": "idle", "seconds": None, "error": None}
+
+    def get_llm_service(self) -> LLMService:
+        """获取共享的LLM服务（首次使用时创建）"""
+        if self._llm_service is None:
+            with self._lock:
+                if self._llm_service is None:
+                    self._llm_service = LLMService()
+        return self._llm_service
+
+    def get_rag_service(self) -> RAGService:
+        """获取共享的RAG服务（首次使用时创建）"""
+        if self._rag_service is None:
+            with self._lock:
+                if self._rag_service is None:
+                    self._rag_service = RAGService()
+        return self._rag_service
+
+    def get_response_cache(self) -> Optional[SemanticResponseCache]:
+        """获取共享的教学回答语义缓存（未启用时返回None）"""
+        if not settings.teaching_cache_enabled:
+            return None
+        if self._response_cache is None:
+            with self._lock:
+                if self._response_cache is None:
+                    self._response_cache = SemanticResponseCache(
+                        max_entries=settings.teaching_cache_max_entries,
+                        ttl_seconds=settings.teaching_cache_ttl_seconds,
+                        similarity_threshold=settings.teaching_cache_similarity_threshold
+                    )
+        return self._response_cache
+
+    def get_job_runner(self) -> JobRunner:
+        """获取共享的后台任务执行器（任务状态写入数据库，任一worker进程都可查询）"""
+        if self._job_runner is None:
+            with self._lock:
+                if self._job_runner is None:
+                    job_runner = JobRunner(
+                        result_ttl_seconds=settings.job_result_ttl_seconds,
+                        store=DatabaseJobStore()
+                    )
+                    job_runner.set_limit("learning_plan", settings.plan_job_max_concurrency)
+                    self._job_runner = job_runner
+        return self._job_runner
+
+    def warmup(self):
+        """预热服务：提前创建实例（导入SDK、打开向量库）并加载本地嵌入模型"""
+        started = time.perf_counter()
+        self._warmup_status = {"state": "running", "seconds": None, "error": None}
+        try:
+            self.get_llm_service()
+            rag_service = self.get_rag_service()
+
+            # 本地模型首次推理时才完成加载，远程嵌入不做预热以免产生费用
+            if settings.embeddings_provider in ("local", "onnx"):
+                rag_service.embeddings.embed_query("warmup")
+        except Exception as e:
+            self._warmup_status = {"state": "failed", "seconds": None, "error": str(e)}
+            raise
+        self._warmup_status = {
+            "state": "done",
+            "seconds": round(time.perf_counter() - started, 3),
+            "error": None
+        }
+
+    def start_background_warmup(self):
+        """在后台线程中预热，不阻塞应用启动；预热完成前的请求会等待服务创建完成"""
+        if self._warmup_thread is not None and self._warmup_thread.is_alive():
+            return
+
+        def run():
+            try:
+                self.warmup()
+            except Exception as e:
+                print(f"服务预热失败: {str(e)}")
+
+        self._warmup_thread = threading.Thread(target=run, name="service-warmup", daemon=True)
+        self._warmup_thread.start()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """汇总已创建服务的运行指标"""
+        return {
+            "warmup": dict(self._warmup_status),
+            "rag": self._rag_service.get_cache_stats() if self._rag_service else None,
+            "llm_http": llm_clients.get_stats(),
+            "llm_coalesce": self._llm_service.coalescer.stats() if self._llm_service else None,
+            "llm_providers": self._llm_service.pool.stats() if self._llm_service else None,
+            "teaching_cache": self._response_cache.stats() if self._response_cache else None,
+            "jobs": self._job_runner.stats() if self._job_runner else None
+        }
+
+    async def shutdown_jobs(self, timeout: float = 30):
+        """等待后台任务结束（须在关闭服务前调用，任务可能仍在使用服务）"""
+        if self._job_runner is not None:
+            await self._job_runner.shutdown(timeout=timeout)
+
+    def shutdown(self):
+        """关闭服务并释放资源"""
+        if self._warmup_thread is not None:
+            self._warmup_thread.join(timeout=30)
+            self._warmup_thread = None
+        with self._lock:
+            if self._rag_service is not None:
+                self._rag_service.close()
+            self._rag_service = None
+            self._llm_service = None
+            self._response_cache = None
+            self._job_runner = None
+
+
+# 全局服务注册表
+service_registry = ServiceRegistry()
+
+
+def get_llm_service() -> LLMService:
+    """FastAPI依赖：获取共享的LLM服务"""
+    return service_registry.get_llm_service()
+
+
+def get_rag_service() -> RAGService:
+    """FastAPI依赖：获取共享的RAG服务"""
+    return service_registry.get_rag_service()
@@ -0,0 +1,63 @@
+"""
+请求合并 - 相同的并发LLM请求只向上游发送一次，结果分发给所有等待者
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class RequestCoalescer:
+    """
+    单飞（single-flight）请求合并
+    相同键的请求在执行期间到达时等待同一个上游调用；调用结束即移除，不缓存结果
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+        # 合并统计
+        self.upstream_calls = 0
+        self.coalesced = 0
+        self.max_waiters = 0
+        self._waiters: Dict[str, int] = {}
+
+    def _discard(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            self._waiters.pop(key, None)
+        # 所有等待者都已取消时，避免未读取的异常告警
+        if not task.cancelled():
+            task.exception()
+
+    async def run(self, key: str, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        执行或加入相同键的请求
+        返回(结果, 是否复用了其他请求发起的调用)
+        """
+        loop = asyncio.get_running_loop()
+        task = self._inflight.get(key)
+        shared = task is not None and task.get_loop() is loop
+        if shared:
+            self.coalesced += 1
+            self._waiters[key] += 1
+            self.max_waiters = max(self.max_waiters, self._waiters[key])
+        else:
+            task = loop.create_task(func())
+            self._inflight[key] = task
+            self._waiters[key] = 1
+            task.add_done_callback(lambda done: self._discard(key, done))
+            self.upstream_calls += 1
+
+        # 单个等待者被取消（如客户端断开）时不取消共享的上游调用
+        return await asyncio.shield(task), shared
+
+    def stats(self) -> Dict[str, Any]:
+        """合并统计"""
+        requests = self.upstream_calls + self.coalesced
+        return {
+            "requests": requests,
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self.coalesced,
+            "coalesce_rate": self.coalesced / requests if requests else 0.0,
+            "inflight": len(self._inflight),
+            "max_waiters": self.max_waiters
+        }
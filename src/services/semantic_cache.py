@@ -0,0 +1,162 @@
+"""
+教学回答语义缓存 - 相同主题、教学策略、学生水平和对话历史下，语义相近的学生问题复用已有回答
+"""
+import hashlib
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .query_cache import QueryResultCache
+
+
+class SemanticResponseCache:
+    """
+    语义响应缓存（TTL + LRU）
+    缓存项按(主题, 教学策略, 学生水平, 对话历史指纹)分桶，桶内比较问题嵌入的余弦相似度，超过阈值即命中。
+    回答由模型结合对话历史生成，只有历史相同的对话才能复用
+    """
+
+    def __init__(self, max_entries: int = 5000, ttl_seconds: float = 86400, similarity_threshold: float = 0.92):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+
+        # 缓存项ID -> (桶键, 归一化问题向量, 回答, 生成时的用量, 生成耗时毫秒, 过期时间)
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._buckets: Dict[str, List[int]] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+        # 命中与节省统计
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self.saved_tokens = 0
+        self.saved_cost = 0.0
+        self.saved_latency_ms = 0.0
+
+    @staticmethod
+    def make_key(topic: str, strategy: str, student_level: Optional[str], history: str = "") -> str:
+        """生成分桶键（history为history_fingerprint的结果）"""
+        return json.dumps(
+            [
+                QueryResultCache.normalize_query(topic),
+                strategy,
+                QueryResultCache.normalize_query(student_level or ""),
+                history
+            ],
+            ensure_ascii=False
+        )
+
+    @staticmethod
+    def history_fingerprint(history: List[Dict[str, Any]]) -> str:
+        """对话历史指纹：发给模型的用户和助手消息的哈希，无历史时为空串"""
+        messages = [
+            [message["role"], message["content"]]
+            for message in history
+            if message.get("role") in ("user", "assistant")
+        ]
+        if not messages:
+            return ""
+        return hashlib.sha256(json.dumps(messages, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _remove(self, entry_id: int):
+        bucket_key = self._entries.pop(entry_id)[0]
+        bucket = self._buckets[bucket_key]
+        bucket.remove(entry_id)
+        if not bucket:
+            del self._buckets[bucket_key]
+
+    def get(self, key: str, embedding: List[float]) -> Optional[Dict[str, Any]]:
+        """
+        查找语义相近的已缓存回答
+        命中时返回response、similarity以及本次节省的tokens、cost、latency_ms
+        """
+        vector = self._normalize(embedding)
+        now = time.monotonic()
+        with self._lock:
+            candidates = []
+            for entry_id in list(self._buckets.get(key, [])):
+                if self._entries[entry_id][5] < now:
+                    self._remove(entry_id)
+                    self.expired += 1
+                else:
+                    candidates.append(entry_id)
+            if not candidates:
+                self.misses += 1
+                return None
+
+            similarities = np.stack([self._entries[entry_id][1] for entry_id in candidates]) @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            entry_id = candidates[best]
+            self._entries.move_to_end(entry_id)
+            _, _, response, usage_info, latency_ms, _ = self._entries[entry_id]
+            saved_tokens = usage_info.get("total_tokens", 0)
+            saved_cost = usage_info.get("total_cost", 0)
+            self.hits += 1
+            self.saved_tokens += saved_tokens
+            self.saved_cost += saved_cost
+            self.saved_latency_ms += latency_ms
+            return {
+                "response": response,
+                "similarity": min(float(similarities[best]), 1.0),
+                "saved_tokens": saved_tokens,
+                "saved_cost": saved_cost,
+                "saved_latency_ms": latency_ms
+            }
+
+    def put(self, key: str, embedding: List[float], response: str, usage_info: Dict[str, Any], latency_ms: float):
+        """写入回答，超出容量时淘汰最久未使用的缓存项"""
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = (
+                key,
+                self._normalize(embedding),
+                response,
+                dict(usage_info or {}),
+                latency_ms,
+                time.monotonic() + self.ttl_seconds
+            )
+            self._buckets.setdefault(key, []).append(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evicted += 1
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """命中与节省统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "entries": len(self._entries),
+                "buckets": len(self._buckets),
+                "saved_tokens": self.saved_tokens,
+                "saved_cost": self.saved_cost,
+                "saved_latency_ms": round(self.saved_latency_ms, 1)
+            }
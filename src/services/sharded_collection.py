@@ -0,0 +1,222 @@
+"""
+分片集合 - 按元数据字段（如学科）把一个逻辑集合拆分为多个ChromaDB集合
+"""
+import hashlib
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+
+def shard_suffix(value: str) -> str:
+    """
+    分片值对应的集合名后缀
+    ChromaDB集合名只允许字母、数字、"."、"_"、"-"，中文等字符以哈希区分，保留可读的ASCII部分便于排查
+    """
+    if not value:
+        return "default"
+    readable = re.sub(r"[^A-Za-z0-9]+", "_", value).strip("_")[:16]
+    digest = hashlib.md5(value.encode("utf-8")).hexdigest()[:8]
+    return f"{readable}_{digest}" if readable else digest
+
+
+def _pinned_values(where: Optional[Dict[str, Any]], key: str) -> Optional[List[str]]:
+    """从where条件中提取分片字段被限定的取值（等值、$eq、$in，或$and中的任一项），无法确定时返回None"""
+    if not where:
+        return None
+
+    for field, condition in where.items():
+        if field == "$and":
+            for sub in condition:
+                values = _pinned_values(sub, key)
+                if values is not None:
+                    return values
+        elif field == key:
+            if not isinstance(condition, dict):
+                return [condition]
+            if "$eq" in condition:
+                return [condition["$eq"]]
+            if "$in" in condition:
+                return list(condition["$in"])
+    return None
+
+
+class ShardedCollection:
+    """
+    分片集合：接口与ChromaDB集合一致
+    写入按记录元数据中shard_key的取值路由到对应分片；where条件限定了分片字段的查询只访问对应分片，
+    其余查询在线程池中并行查询所有分片，再按距离合并top-k
+    """
+
+    def __init__(self,
+                 name: str,
+                 shard_key: str,
+                 open_shard: Callable[[str, str], Any],
+                 list_shards: Callable[[], Dict[str, str]],
+                 max_workers: int = 8):
+        """
+        open_shard(集合名, 分片值)创建或获取分片集合；list_shards()返回已有分片 {分片值: 集合名}
+        """
+        self.name = name
+        self.shard_key = shard_key
+        self._open_shard = open_shard
+        self._shards: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="shard")
+
+        for value, collection_name in list_shards().items():
+            self._shards[value] = open_shard(collection_name, value)
+
+    def shard_name(self, value: str) -> str:
+        return f"{self.name}__{shard_suffix(value)}"
+
+    def _shard(self, value: str, create: bool = True):
+        """获取分片（create为True时不存在则创建）"""
+        shard = self._shards.get(value)
+        if shard is None and create:
+            with self._lock:
+                shard = self._shards.get(value)
+                if shard is None:
+                    shard = self._open_shard(self.shard_name(value), value)
+                    self._shards[value] = shard
+        return shard
+
+    def _target_shards(self, where: Optional[Dict[str, Any]]) -> List[Any]:
+        """where条件涉及的分片（按分片值排序，保证分页顺序稳定）"""
+        values = _pinned_values(where, self.shard_key)
+        if values is None:
+            values = list(self._shards.keys())
+        return [self._shards[value] for value in sorted(set(values)) if value in self._shards]
+
+    def _fan_out(self, shards: List[Any], func: Callable[[Any], Any]) -> List[Any]:
+        """在各分片上并行执行func（只有一个分片时直接调用）"""
+        if len(shards) <= 1:
+            return [func(shard) for shard in shards]
+        return list(self._executor.map(func, shards))
+
+    def shard_counts(self) -> Dict[str, int]:
+        """各分片的记录数"""
+        return {value: shard.count() for value, shard in sorted(self._shards.items())}
+
+    def count(self) -> int:
+        return sum(self.shard_counts().values())
+
+    def _write(self, method: str, ids: List[str], embeddings: List[List[float]],
+               documents: List[str], metadatas: List[Dict]):
+        """按分片值分组写入；分片字段变化的记录从原分片中移除"""
+        groups: Dict[str, List[int]] = {}
+        for i, metadata in enumerate(metadatas):
+            groups.setdefault(str(metadata.get(self.shard_key) or ""), []).append(i)
+
+        for value, shard in list(self._shards.items()):
+            moved = [ids[i] for other, indices in groups.items() if other != value for i in indices]
+            if moved and shard.get(ids=moved, include=[])['ids']:
+                shard.delete(ids=moved)
+
+        for value, indices in groups.items():
+            getattr(self._shard(value), method)(
+                ids=[ids[i] for i in indices],
+                embeddings=[embeddings[i] for i in indices],
+                documents=[documents[i] for i in indices],
+                metadatas=[metadatas[i] for i in indices]
+            )
+
+    def add(self, ids: List[str], embeddings: List[List[float]], documents: List[str], metadatas: List[Dict]):
+        self._write("add", ids, embeddings, documents, metadatas)
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str], metadatas: List[Dict]):
+        self._write("upsert", ids, embeddings, documents, metadatas)
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None,
+            include: Optional[List[str]] = None, limit: Optional[int] = None,
+            offset: Optional[int] = None, **kwargs) -> Dict[str, Any]:
+        include = list(include) if include is not None else ["metadatas", "documents"]
+        shards = self._target_shards(where)
+        fields = ["ids"] + [field for field in ["embeddings", "documents", "metadatas"] if field in include]
+        results: Dict[str, Any] = {field: [] for field in fields}
+
+        if limit is None and not offset:
+            pages = self._fan_out(shards, lambda shard: shard.get(ids=ids, where=where, include=include, **kwargs))
+        else:
+            # 分页按分片顺序依次读取，跳过整个落在offset之前的分片
+            pages = []
+            skip = offset or 0
+            remaining = limit
+            for shard in shards:
+                if remaining is not None and remaining <= 0:
+                    break
+                if ids is None and where is None:
+                    size = shard.count()
+                else:
+                    size = len(shard.get(ids=ids, where=where, include=[])['ids'])
+                if skip >= size:
+                    skip -= size
+                    continue
+                page = shard.get(ids=ids, where=where, include=include, limit=remaining, offset=skip, **kwargs)
+                skip = 0
+                if remaining is not None:
+                    remaining -= len(page['ids'])
+                pages.append(page)
+
+        for page in pages:
+            for field in fields:
+                # ChromaDB返回的embeddings可能是numpy数组，不能直接做真值判断
+                values = page.get(field)
+                if values is not None:
+                    results[field].extend(values)
+        for field in ["embeddings", "documents", "metadatas"]:
+            results.setdefault(field, None)
+        return results
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10,
+              where: Optional[Dict] = None, include: Optional[List[str]] = None, **kwargs) -> Dict[str, Any]:
+        include = list(include) if include is not None else ["metadatas", "documents", "distances"]
+        shard_include = list(dict.fromkeys(include + ["distances"]))
+        shards = self._target_shards(where)
+
+        fields = ["ids", "documents", "metadatas", "distances", "embeddings"]
+        results: Dict[str, Any] = {field: [[] for _ in query_embeddings] for field in fields}
+
+        # 各分片同样返回top-n，合并后按距离截取（各分片向量处于同一嵌入空间，距离可直接比较）
+        def query_shard(shard):
+            if shard.count() == 0:
+                return None
+            return shard.query(
+                query_embeddings=query_embeddings,
+                n_results=n_results,
+                where=where,
+                include=shard_include,
+                **kwargs
+            )
+
+        shard_results = [result for result in self._fan_out(shards, query_shard) if result]
+        for row in range(len(query_embeddings)):
+            merged = []
+            for result in shard_results:
+                for i, distance in enumerate(result['distances'][row]):
+                    merged.append((distance, result, i))
+            merged.sort(key=lambda item: item[0])
+
+            for distance, result, i in merged[:n_results]:
+                results['ids'][row].append(result['ids'][row][i])
+                results['distances'][row].append(distance)
+                for field in ["documents", "metadatas", "embeddings"]:
+                    if field in include:
+                        results[field][row].append(result[field][row][i])
+
+        for field in ["documents", "metadatas", "distances", "embeddings"]:
+            if field not in include:
+                results[field] = None
+        return results
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None):
+        def delete_from(shard):
+            matched = shard.get(ids=ids, where=where, include=[])['ids']
+            if matched:
+                shard.delete(ids=matched)
+
+        self._fan_out(self._target_shards(where), delete_from)
+
+    def close(self):
+        """关闭并行查询线程池"""
+        self._executor.shutdown(wait=True)
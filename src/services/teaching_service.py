@@ -2,24 +2,33 @@
 启发式教学服务
 """
 import json
-from typing import List, Dict, Optional
+import time
+from typing import AsyncIterator, List, Dict, Optional
 
-from langchain_core.messages import BaseMessage
 from sqlalchemy.orm import Session
-from langchain.schema import HumanMessage, AIMessage, SystemMessage
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
 
+from ..core.config import settings
 from ..models import Student, LearningPlan, LearningProgress
 from .llm_service import LLMService
 from .rag_service import RAGService
+from .registry import service_registry
+from .semantic_cache import SemanticResponseCache
 
 
 class TeachingService:
     """启发式教学服务类"""
     
-    def __init__(self, db: Session):
+    def __init__(self,
+                 db: Session,
+                 llm_service: Optional[LLMService] = None,
+                 rag_service: Optional[RAGService] = None,
+                 response_cache: Optional[SemanticResponseCache] = None):
         self.db = db
-        self.llm_service = LLMService()
-        self.rag_service = RAGService()
+        # 默认使用进程内共享的服务实例
+        self.llm_service = llm_service or service_registry.get_llm_service()
+        self.rag_service = rag_service or service_registry.get_rag_service()
+        self.response_cache = response_cache or service_registry.get_response_cache()
     
     async def start_teaching_session(self, 
                                    student_id: str, 
@@ -39,12 +48,17 @@ class TeachingService:
                 LearningPlan.student_id == student_id
             ).first()
         
-        # 从RAG获取相关教学材料
-        teaching_materials = self.rag_service.search_teaching_materials(
+        # 从RAG获取相关教学材料（按学生年级过滤，该年级没有相关材料时不限年级）
+        teaching_materials = await self.rag_service.asearch_teaching_materials(
             query=topic,
-            level=student.grade,
+            grade=student.grade,
             k=3
         )
+        if not teaching_materials and student.grade:
+            teaching_materials = await self.rag_service.asearch_teaching_materials(
+                query=topic,
+                k=3
+            )
         
         # 获取学生的学习进度（如果有）
         progress = None
@@ -71,9 +85,11 @@ class TeachingService:
             previous_context=context.get("previous_learning")
         )
         
-        # 获取初始教学响应
+        # 获取初始教学响应（同一课程的开场提示词相同，并发的相同请求合并为一次上游调用）
         messages = [SystemMessage(content=teaching_prompt)]
-        response, usage_info = await self.llm_service.get_response(messages)
+        response, usage_info = await self.llm_service.get_response(
+            messages, coalesce=settings.llm_coalesce_enabled
+        )
         
         return {
             "session_id": f"teach_{student_id}_{topic}",
@@ -87,6 +103,58 @@ class TeachingService:
                               student_response: str,
                               conversation_history: List[Dict]) -> Dict:
         """继续教学对话"""
+        turn = self._prepare_teaching_turn(session_id, student_response, conversation_history)
+        
+        # 语义缓存命中时直接复用已有回答
+        cached = await self._lookup_cached_response(turn, student_response)
+        if cached:
+            return await self._finish_teaching_turn(turn, cached["response"], cached["usage"])
+        
+        # 获取AI响应
+        started = time.perf_counter()
+        response, usage_info = await self.llm_service.get_response(turn["messages"])
+        self._store_cached_response(turn, response, usage_info, started)
+        
+        return await self._finish_teaching_turn(turn, response, usage_info)
+    
+    async def stream_continue_teaching(self,
+                                       session_id: str,
+                                       student_response: str,
+                                       conversation_history: List[Dict]) -> AsyncIterator[Dict]:
+        """
+        流式继续教学对话，依次产出事件：start（回答分析和教学策略）、token（生成的文本片段）、
+        done（与continue_teaching相同的结果）
+        """
+        turn = self._prepare_teaching_turn(session_id, student_response, conversation_history)
+        yield {"event": "start", "data": {
+            "analysis": turn["analysis"],
+            "strategy": turn["strategy"],
+            "mastery_level": turn["analysis"].get("mastery_level", 0)
+        }}
+        
+        cached = await self._lookup_cached_response(turn, student_response)
+        if cached:
+            yield {"event": "token", "data": {"content": cached["response"]}}
+            yield {"event": "done", "data": await self._finish_teaching_turn(turn, cached["response"], cached["usage"])}
+            return
+        
+        started = time.perf_counter()
+        parts = []
+        route = {}
+        async for token in self.llm_service.stream_response(turn["messages"], route=route):
+            parts.append(token)
+            yield {"event": "token", "data": {"content": token}}
+        response = "".join(parts)
+        usage_info = self.llm_service.estimate_usage(turn["messages"], response, route.get("provider"))
+        self._store_cached_response(turn, response, usage_info, started)
+        
+        yield {"event": "done", "data": await self._finish_teaching_turn(turn, response, usage_info)}
+    
+    def _prepare_teaching_turn(self,
+                               session_id: str,
+                               student_response: str,
+                               conversation_history: List[Dict]) -> Dict:
+        """分析学生回答、确定教学策略并构建发给LLM的消息"""
         # 解析session_id获取信息
         parts = session_id.split("_")
         student_id = parts[1]
@@ -102,6 +170,7 @@ class TeachingService:
         
         # 根据分析结果决定教学策略
         teaching_strategy = self._determine_teaching_strategy(analysis, conversation_history)
+        cacheable = self.response_cache is not None and teaching_strategy in self._cached_strategies()
         
         # 构建消息历史
         messages = self._build_message_history(conversation_history)
@@ -120,20 +189,128 @@ class TeachingService:
         # 插入系统提示
         messages.insert(0, SystemMessage(content=system_prompt))
         
-        # 获取AI响应
-        response, usage_info = await self.llm_service.get_response(messages)
+        return {
+            "student_id": student_id,
+            "student_name": student.name,
+            "student_level": student.grade,
+            "topic": topic,
+            "analysis": analysis,
+            "strategy": teaching_strategy,
+            "cacheable": cacheable,
+            "history": self.response_cache.history_fingerprint(conversation_history) if cacheable else "",
+            "messages": messages
+        }
+    
+    async def _lookup_cached_response(self, turn: Dict, student_response: str) -> Optional[Dict]:
+        """
+        在语义缓存中查找相近问题的已有回答，命中时返回response和usage（记录本次节省的tokens和耗时）
+        未命中时把缓存键和问题向量记入turn，生成回答后写入缓存
+        """
+        turn["cache_key"] = None
+        if not turn["cacheable"]:
+            return None
+        
+        try:
+            embedding = await self.rag_service.aembed_query(student_response)
+        except Exception as e:
+            print(f"教学回答缓存查询失败: {str(e)}")
+            return None
+        
+        key = self.response_cache.make_key(turn["topic"], turn["strategy"], turn["student_level"], turn["history"])
+        hit = self.response_cache.get(key, embedding)
+        if hit is None:
+            turn["cache_key"] = key
+            turn["cache_embedding"] = embedding
+            return None
+        
+        return {
+            "response": hit["response"],
+            "usage": {
+                "total_tokens": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "total_cost": 0,
+                "cache": {
+                    "hit": True,
+                    "similarity": hit["similarity"],
+                    "saved_tokens": hit["saved_tokens"],
+                    "saved_cost": hit["saved_cost"],
+                    "saved_latency_ms": hit["saved_latency_ms"]
+                }
+            }
+        }
+    
+    def _store_cached_response(self, turn: Dict, response: str, usage_info: Dict, started: float):
+        """
+        把新生成的回答写入语义缓存
+        缓存的回答会复用给对话历史相同的其他学生，回答中出现学生姓名时不缓存
+        """
+        if not turn.get("cache_key") or not response:
+            return
+        if turn["student_name"] and turn["student_name"] in response:
+            return
+        
+        latency_ms = (time.perf_counter() - started) * 1000
+        self.response_cache.put(turn["cache_key"], turn["cache_embedding"], response, usage_info, latency_ms)
+        usage_info["cache"] = {"hit": False}
+    
+    @staticmethod
+    def _cached_strategies() -> List[str]:
+        return [item.strip() for item in settings.teaching_cache_strategies.split(",") if item.strip()]
+    
+    async def _finish_teaching_turn(self, turn: Dict, response: str, usage_info: Optional[Dict] = None) -> Dict:
+        """根据回答分析更新学习进度，返回教学结果"""
+        analysis = turn["analysis"]
         
         # 如果检测到学生掌握了概念，更新进度
         if analysis.get("mastery_level", 0) >= 4:
-            await self._update_learning_progress(student_id, topic, analysis)
+            await self._update_learning_progress(turn["student_id"], turn["topic"], analysis)
         
         return {
             "response": response,
             "analysis": analysis,
-            "strategy": teaching_strategy,
-            "mastery_level": analysis.get("mastery_level", 0)
+            "strategy": turn["strategy"],
+            "mastery_level": analysis.get("mastery_level", 0),
+            "usage": usage_info
         }
     
+    async def search_materials_batch(self,
+                                     queries: List[str],
+                                     learning_plan_id: Optional[str] = None,
+                                     subject: Optional[str] = None,
+                                     k: int = 3,
+                                     deduplicate: bool = False,
+                                     grade: Optional[str] = None,
+                                     material_type: Optional[str] = None) -> List[Dict]:
+        """批量检索教学材料（可按学习计划的全部目标检索，未指定年级时使用计划所属学生的年级）"""
+        queries = list(queries)
+        if learning_plan_id:
+            learning_plan = self.db.query(LearningPlan).filter(
+                LearningPlan.id == learning_plan_id
+            ).first()
+            if not learning_plan:
+                raise ValueError(f"Learning plan {learning_plan_id} not found")
+            queries.extend(learning_plan.objectives or [])
+            if grade is None and learning_plan.student:
+                grade = learning_plan.student.grade
+        
+        # 去掉空查询和重复查询
+        queries = list(dict.fromkeys(query.strip() for query in queries if query and query.strip()))
+        
+        results = await self.rag_service.asearch_teaching_materials_batch(
+            queries,
+            subject=subject,
+            k=k,
+            deduplicate=deduplicate,
+            grade=grade,
+            material_type=material_type
+        )
+        
+        return [
+            {"query": query, "materials": materials}
+            for query, materials in zip(queries, results)
+        ]
+    
     def _build_teaching_context(self,
                               student: Student,
                               topic: str,
@@ -323,7 +500,7 @@ class TeachingService:
         ).all()
         
         # 查找相似学生
-        similar_students = self.rag_service.find_similar_students(student_id, k=3)
+        similar_students = await self.rag_service.afind_similar_students(student_id, k=3)
         
         # 基于进度和相似学生生成建议
         recommendations = {
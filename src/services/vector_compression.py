@@ -0,0 +1,208 @@
+"""
+紧凑向量存储 - 维度截断 + 标量量化 + 全精度重排
+"""
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def truncate_embedding(vector, dimensions: int) -> List[float]:
+    """
+    截断向量维度并重新归一化
+    text-embedding-3系列模型按Matryoshka方式训练，截断前若干维即可得到较好的低维向量
+    """
+    truncated = np.asarray(vector, dtype=np.float32)[:dimensions]
+    norm = np.linalg.norm(truncated)
+    if norm > 0:
+        truncated = truncated / norm
+    return truncated.tolist()
+
+
+def quantize(vector, method: str) -> Tuple[bytes, float]:
+    """标量量化，返回(字节数据, 缩放系数)"""
+    array = np.asarray(vector, dtype=np.float32)
+    if method == "float16":
+        return array.astype(np.float16).tobytes(), 1.0
+    if method == "int8":
+        max_abs = float(np.max(np.abs(array))) if array.size else 0.0
+        scale = max_abs / 127 if max_abs > 0 else 1.0
+        return np.round(array / scale).astype(np.int8).tobytes(), scale
+    raise ValueError(f"不支持的量化方式: {method}")
+
+
+def dequantize(data: bytes, scale: float, method: str) -> np.ndarray:
+    """反量化为float32向量"""
+    if method == "float16":
+        return np.frombuffer(data, dtype=np.float16).astype(np.float32)
+    if method == "int8":
+        return np.frombuffer(data, dtype=np.int8).astype(np.float32) * scale
+    raise ValueError(f"不支持的量化方式: {method}")
+
+
+class QuantizedVectorStore:
+    """全维度量化向量的磁盘存储（SQLite），用于重排阶段"""
+
+    def __init__(self, path: str, method: str):
+        self.method = method
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS vectors (
+                collection TEXT NOT NULL,
+                id TEXT NOT NULL,
+                data BLOB NOT NULL,
+                scale REAL NOT NULL,
+                PRIMARY KEY (collection, id)
+            ) WITHOUT ROWID
+        """)
+        self._conn.commit()
+
+    def put(self, collection: str, ids: List[str], embeddings: List[List[float]]):
+        """写入（覆盖）向量"""
+        rows = []
+        for vector_id, embedding in zip(ids, embeddings):
+            data, scale = quantize(embedding, self.method)
+            rows.append((collection, vector_id, data, scale))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (collection, id, data, scale) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def get(self, collection: str, ids: List[str]) -> Dict[str, np.ndarray]:
+        """读取并反量化向量"""
+        vectors = {}
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                for vector_id, data, scale in self._conn.execute(
+                    f"SELECT id, data, scale FROM vectors WHERE collection = ? AND id IN ({placeholders})",
+                    [collection] + batch
+                ):
+                    vectors[vector_id] = dequantize(data, scale, self.method)
+        return vectors
+
+    def delete(self, collection: str, ids: Optional[List[str]] = None):
+        """删除向量，ids为None时删除整个集合"""
+        with self._lock:
+            if ids is None:
+                self._conn.execute("DELETE FROM vectors WHERE collection = ?", (collection,))
+            else:
+                self._conn.executemany(
+                    "DELETE FROM vectors WHERE collection = ? AND id = ?",
+                    [(collection, vector_id) for vector_id in ids]
+                )
+            self._conn.commit()
+
+    def close(self):
+        """关闭连接"""
+        with self._lock:
+            self._conn.close()
+
+
+class CompactCollection:
+    """
+    紧凑集合：接口与ChromaDB集合一致
+    ChromaDB中只保存截断后的低维向量用于粗召回，全维度向量量化后存入QuantizedVectorStore；
+    查询时先召回rescore_multiplier倍的候选，再用全精度查询向量与反量化的全维度向量重新计算距离排序
+    """
+
+    def __init__(self, collection, store: QuantizedVectorStore, dimensions: int, rescore_multiplier: int = 4):
+        self.collection = collection
+        self.store = store
+        self.dimensions = dimensions
+        self.rescore_multiplier = max(1, rescore_multiplier)
+        self.name = collection.name
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def _truncate_all(self, embeddings: List[List[float]]) -> List[List[float]]:
+        return [truncate_embedding(embedding, self.dimensions) for embedding in embeddings]
+
+    def add(self, ids: List[str], embeddings: List[List[float]], documents: List[str], metadatas: List[Dict]):
+        self.store.put(self.name, ids, embeddings)
+        self.collection.add(
+            ids=ids,
+            embeddings=self._truncate_all(embeddings),
+            documents=documents,
+            metadatas=metadatas
+        )
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str], metadatas: List[Dict]):
+        self.store.put(self.name, ids, embeddings)
+        self.collection.upsert(
+            ids=ids,
+            embeddings=self._truncate_all(embeddings),
+            documents=documents,
+            metadatas=metadatas
+        )
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None,
+            include: Optional[List[str]] = None, **kwargs) -> Dict[str, Any]:
+        include = list(include) if include is not None else ["metadatas", "documents"]
+        want_embeddings = "embeddings" in include
+        chroma_include = [field for field in include if field != "embeddings"]
+
+        results = self.collection.get(ids=ids, where=where, include=chroma_include, **kwargs)
+        if want_embeddings:
+            # 返回全维度向量（反量化），与非紧凑模式下的调用方保持兼容
+            vectors = self.store.get(self.name, results['ids'])
+            results['embeddings'] = [vectors[vector_id].tolist() for vector_id in results['ids']]
+        return results
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10,
+              where: Optional[Dict] = None, include: Optional[List[str]] = None, **kwargs) -> Dict[str, Any]:
+        include = list(include) if include is not None else ["metadatas", "documents", "distances"]
+        candidates = self.collection.query(
+            query_embeddings=self._truncate_all(query_embeddings),
+            n_results=n_results * self.rescore_multiplier,
+            where=where,
+            include=["metadatas", "documents"],
+            **kwargs
+        )
+
+        results = {field: [] for field in ["ids", "documents", "metadatas", "distances", "embeddings"]}
+        for row, query_embedding in enumerate(query_embeddings):
+            candidate_ids = candidates['ids'][row] if candidates['ids'] else []
+            vectors = self.store.get(self.name, candidate_ids)
+            query_vector = np.asarray(query_embedding, dtype=np.float32)
+
+            # 与ChromaDB默认的l2空间一致，使用平方欧氏距离
+            scored = []
+            for i, candidate_id in enumerate(candidate_ids):
+                vector = vectors.get(candidate_id)
+                if vector is None:
+                    continue
+                diff = vector - query_vector
+                scored.append((float(np.dot(diff, diff)), i))
+            scored.sort()
+            scored = scored[:n_results]
+
+            results['ids'].append([candidate_ids[i] for _, i in scored])
+            results['documents'].append([candidates['documents'][row][i] for _, i in scored])
+            results['metadatas'].append([candidates['metadatas'][row][i] for _, i in scored])
+            results['distances'].append([distance for distance, _ in scored])
+            results['embeddings'].append([vectors[candidate_ids[i]].tolist() for _, i in scored])
+
+        for field in ["documents", "metadatas", "distances", "embeddings"]:
+            if field not in include:
+                results[field] = None
+        return results
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None):
+        if ids is None:
+            ids = self.collection.get(where=where, include=[])['ids']
+        elif where is not None:
+            ids = self.collection.get(ids=ids, where=where, include=[])['ids']
+        if not ids:
+            return
+        self.collection.delete(ids=ids)
+        self.store.delete(self.name, ids)
@@ -0,0 +1,102 @@
+"""
+向量集合快照 - 以列式文件导出/导入集合（向量为可内存映射的.npy，其余字段为JSON列）
+"""
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+MANIFEST_FILE = "manifest.json"
+SNAPSHOT_VERSION = 1
+
+
+def write_manifest(directory: str, manifest: Dict[str, Any]):
+    """写入快照清单（最后写入，清单存在即表示快照完整）"""
+    manifest = dict(manifest, version=SNAPSHOT_VERSION, created_at=time.time())
+    tmp_path = os.path.join(directory, MANIFEST_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST_FILE))
+
+
+def read_manifest(directory: str) -> Dict[str, Any]:
+    """读取快照清单"""
+    path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        raise ValueError(f"快照不完整或不存在: {directory}")
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"不支持的快照版本: {manifest.get('version')}")
+    return manifest
+
+
+class SnapshotWriter:
+    """
+    单个集合的快照写入器
+    向量按行追加写入预分配的内存映射.npy文件，id、文档、元数据按列保存为JSON
+    """
+
+    def __init__(self, directory: str, name: str, count: int, dimensions: int, dtype: str = "float32"):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.name = name
+        self.count = count
+        path = os.path.join(directory, f"{name}.vectors.npy")
+        if count == 0:
+            # 空数组无法内存映射，直接写入空文件
+            np.save(path, np.zeros((0, dimensions), dtype=np.dtype(dtype)))
+            self._vectors = None
+        else:
+            self._vectors = np.lib.format.open_memmap(path, mode="w+", dtype=np.dtype(dtype), shape=(count, dimensions))
+        self._columns: Dict[str, List[Any]] = {"ids": [], "documents": [], "metadatas": []}
+
+    def append(self, ids: List[str], embeddings: List[List[float]], documents: List[str], metadatas: List[Dict]):
+        start = len(self._columns["ids"])
+        if start + len(ids) > self.count:
+            raise ValueError(f"集合 {self.name} 的记录数超过导出开始时的数量（{self.count}），导出期间请勿写入")
+        self._vectors[start:start + len(ids)] = np.asarray(embeddings, dtype=np.float32)
+        self._columns["ids"].extend(ids)
+        self._columns["documents"].extend(documents)
+        self._columns["metadatas"].extend(metadatas)
+
+    def close(self) -> int:
+        """落盘并返回写入的记录数"""
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(os.path.join(self.directory, f"{self.name}.columns.json"), "w", encoding="utf-8") as f:
+            json.dump(self._columns, f, ensure_ascii=False)
+        return len(self._columns["ids"])
+
+
+def iter_snapshot(directory: str, name: str,
+                  batch_size: int = 1000) -> Iterator[Tuple[List[str], List[List[float]], List[str], List[Dict]]]:
+    """分批读取集合快照，向量以内存映射方式按需读取"""
+    with open(os.path.join(directory, f"{name}.columns.json"), "r", encoding="utf-8") as f:
+        columns = json.load(f)
+    count = len(columns["ids"])
+    if count == 0:
+        return
+    vectors = np.load(os.path.join(directory, f"{name}.vectors.npy"), mmap_mode="r")
+
+    for start in range(0, count, batch_size):
+        end = min(start + batch_size, count)
+        yield (
+            columns["ids"][start:end],
+            np.asarray(vectors[start:end], dtype=np.float32).tolist(),
+            columns["documents"][start:end],
+            columns["metadatas"][start:end]
+        )
+
+
+def snapshot_size(directory: str, name: Optional[str] = None) -> int:
+    """快照文件总大小（字节）"""
+    total = 0
+    for file_name in os.listdir(directory):
+        if name is None or file_name.startswith(f"{name}."):
+            total += os.path.getsize(os.path.join(directory, file_name))
+    return total
@@ -1,9 +1,11 @@
 """
 教育智能体系统启动脚本
 """
+import argparse
 import os
 import sys
 import subprocess
+from collections import defaultdict
 
 
 def check_requirements():
@@ -62,6 +64,49 @@ def init_database():
         return False
 
 
+def parse_importtime(output: str) -> list:
+    """解析 -X importtime 输出，返回(模块, 自身耗时us, 累计耗时us, 嵌套深度)列表"""
+    records = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        records.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return records
+
+
+def report_import_time(module: str = "src.main", top: int = 15):
+    """统计导入应用模块的耗时（python -X importtime），按顶层包汇总"""
+    print(f"\n分析导入 {module} 的耗时...")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True
+    )
+    records = parse_importtime(result.stderr)
+    if result.returncode != 0:
+        # 导入失败时仍输出已完成部分的耗时，便于定位
+        print(f"✗ 导入失败: {result.stderr.strip().splitlines()[-1]}")
+    if not records:
+        return
+
+    # 顶层记录（深度0）的累计耗时之和即总导入耗时
+    total_us = sum(cumulative for _, _, cumulative, depth in records if depth == 0)
+    by_package = defaultdict(int)
+    for name, self_us, _, _ in records:
+        by_package[name.split(".")[0]] += self_us
+
+    print(f"总导入耗时: {total_us / 1000:.1f} ms，共 {len(records)} 个模块")
+    print(f"\n按顶层包汇总（自身耗时，前{top}）:")
+    for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {self_us / 1000:>9.1f} ms  {self_us / total_us:>6.1%}  {package}")
+
+    print(f"\n累计耗时最高的模块（前{top}）:")
+    for name, _, cumulative, _ in sorted(records, key=lambda record: -record[2])[:top]:
+        print(f"  {cumulative / 1000:>9.1f} ms  {name}")
+
+
 def start_server():
     """启动服务器"""
     print("\n启动教育智能体系统...")
@@ -79,9 +124,18 @@ def start_server():
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="教育智能体系统启动器")
+    parser.add_argument("--importtime", action="store_true", help="输出应用启动的模块导入耗时报告后退出")
+    parser.add_argument("--top", type=int, default=15, help="耗时报告中列出的条目数")
+    args = parser.parse_args()
+    
     print("教育智能体系统启动器")
     print("=" * 50)
     
+    if args.importtime:
+        report_import_time(top=args.top)
+        return
+    
     # 检查依赖
     if not check_requirements():
         return
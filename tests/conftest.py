@@ -0,0 +1,84 @@
+"""
+测试公共配置
+"""
+import hashlib
+import os
+import sys
+
+import pytest
+
+# 测试直接从仓库根目录导入src包
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.config import settings  # noqa: E402
+
+
+class HashEmbeddings:
+    """确定性的测试嵌入模型：按字符哈希累加后归一化，相同文本得到相同向量，字符重合越多越相似"""
+
+    def __init__(self, dimensions: int = 32):
+        self.dimensions = dimensions
+        self.embedded = 0
+
+    def _embed(self, text: str):
+        vector = [0.0] * self.dimensions
+        for char in text:
+            vector[int(hashlib.md5(char.encode("utf-8")).hexdigest(), 16) % self.dimensions] += 1.0
+        norm = sum(x * x for x in vector) ** 0.5 or 1.0
+        return [x / norm for x in vector]
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+@pytest.fixture
+def rag_settings(tmp_path, monkeypatch):
+    """把RAG服务的所有存储路径指向临时目录，并关闭跨测试共享的缓存"""
+    overrides = {
+        "vector_db_path": str(tmp_path / "chroma_db"),
+        "material_manifest_path": str(tmp_path / "material_manifests.db"),
+        "lexical_index_path": str(tmp_path / "lexical_index.db"),
+        "duplicate_links_path": str(tmp_path / "duplicate_links.db"),
+        "vector_rescore_store_path": str(tmp_path / "rescore_vectors.db"),
+        "embedding_cache_path": str(tmp_path / "embedding_cache.db"),
+        "embedding_cache_enabled": False,
+        "query_cache_enabled": False,
+        "teaching_shard_key": None,
+        "numpy_vector_collections": "",
+        "vector_compact_mode": False,
+        "dedup_enabled": False,
+    }
+    for name, value in overrides.items():
+        monkeypatch.setattr(settings, name, value)
+    return settings
+
+
+@pytest.fixture
+def make_rag_service(rag_settings, monkeypatch):
+    """创建使用临时存储和HashEmbeddings的RAGService，可传入配置覆盖项"""
+    pytest.importorskip("chromadb")
+    pytest.importorskip("langchain")
+    from src.services.rag_service import RAGService
+
+    monkeypatch.setattr(RAGService, "_create_embeddings", lambda self: HashEmbeddings())
+    services = []
+
+    def make(**overrides):
+        for name, value in overrides.items():
+            monkeypatch.setattr(settings, name, value)
+        service = RAGService()
+        services.append(service)
+        return service
+
+    yield make
+    for service in services:
+        service.close()
+
+
+@pytest.fixture
+def rag_service(make_rag_service):
+    return make_rag_service()
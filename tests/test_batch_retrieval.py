@@ -0,0 +1,43 @@
+"""
+教学材料批量检索测试
+"""
+import pytest
+
+
+MATERIALS = [
+    {"material_id": "m1", "content": "勾股定理：直角三角形两直角边的平方和等于斜边的平方。", "metadata": {"subject": "数学"}},
+    {"material_id": "m2", "content": "三角形内角和等于180度。", "metadata": {"subject": "数学"}},
+    {"material_id": "m3", "content": "光合作用在叶绿体中进行，需要光照。", "metadata": {"subject": "生物"}},
+]
+QUERIES = ["直角三角形的斜边", "三角形内角和", "光合作用"]
+
+
+@pytest.fixture
+def stored(rag_service):
+    rag_service.store_teaching_materials(MATERIALS)
+    return rag_service
+
+
+def test_batch_matches_individual_vector_searches(stored):
+    batch = stored.search_teaching_materials_batch(QUERIES, k=2)
+
+    assert len(batch) == len(QUERIES)
+    for query, results in zip(QUERIES, batch):
+        single = stored.search_teaching_materials(query, k=2, mode="vector")
+        assert [item["id"] for item in results] == [item["id"] for item in single]
+
+
+def test_batch_applies_filters_and_handles_empty_input(stored):
+    assert stored.search_teaching_materials_batch([]) == []
+
+    batch = stored.search_teaching_materials_batch(QUERIES, subject="生物", k=3)
+
+    assert all(item["metadata"]["subject"] == "生物" for results in batch for item in results)
+
+
+def test_deduplicate_keeps_each_chunk_with_its_closest_query(stored):
+    batch = stored.search_teaching_materials_batch(QUERIES, k=3, deduplicate=True)
+
+    ids = [item["id"] for results in batch for item in results]
+    assert len(ids) == len(set(ids))
+    assert batch[2][0]["metadata"]["material_id"] == "m3"
@@ -0,0 +1,85 @@
+"""
+对话上下文窗口测试
+"""
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from src.services.context_window import ContextWindow, dump_summary, load_summary, parse_token_budgets  # noqa: E402
+
+
+def make_history(turns):
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"问题{i}"})
+        history.append({"role": "assistant", "content": f"回答{i}"})
+    return history
+
+
+def count_chars(text):
+    return len(text)
+
+
+def test_summary_roundtrip_and_plain_text():
+    assert load_summary(dump_summary("摘要", 4)) == {"text": "摘要", "covered": 4}
+    assert load_summary("旧的纯文本摘要") == {"text": "旧的纯文本摘要", "covered": 0}
+    assert load_summary(None) == {"text": "", "covered": 0}
+
+
+def test_parse_token_budgets():
+    assert parse_token_budgets("openai:8000, qwen:4000,bad") == {"openai": 8000, "qwen": 4000}
+
+
+def test_window_keeps_recent_turns():
+    window = ContextWindow(keep_turns=2, token_budget=None, count_tokens=count_chars)
+    history = make_history(5)
+    summary = {"text": "摘要", "covered": 6}
+
+    assert window.window_start(history, summary) == 6
+    assert window.pending_fold(history, summary) == (6, 6)
+    assert not window.needs_sync_fold(history, summary)
+
+
+def test_unfolded_messages_stay_in_prompt_when_summary_lags():
+    window = ContextWindow(keep_turns=2, token_budget=None, count_tokens=count_chars)
+    history = make_history(5)
+    # 后台摘要落后一轮：history[2:6]已移出窗口但尚未折叠
+    summary = {"text": "摘要", "covered": 2}
+
+    messages = window.build_messages(history, summary, "新问题")
+
+    assert messages[0].content == "此前对话的摘要：\n摘要"
+    assert [m.content for m in messages[1:-1]] == [m["content"] for m in history[2:]]
+    assert messages[-1].content == "新问题"
+    assert window.pending_fold(history, summary) == (2, 6)
+    assert not window.needs_sync_fold(history, summary)
+
+
+def test_sync_fold_when_gap_exceeds_window():
+    window = ContextWindow(keep_turns=1, token_budget=None, count_tokens=count_chars)
+    history = make_history(4)
+
+    assert window.needs_sync_fold(history, {"text": "", "covered": 2})
+    assert not window.needs_sync_fold(history, {"text": "", "covered": 4})
+
+
+def test_sync_fold_when_unfolded_messages_exceed_budget():
+    history = make_history(3)
+    summary = {"text": "", "covered": 0}
+    window = ContextWindow(keep_turns=None, token_budget=10, count_tokens=count_chars)
+
+    # 每条消息3个字符，只能保留最近的消息
+    start = window.window_start(history, summary, reserved_tokens=3)
+    assert 0 < start < len(history)
+    assert window.needs_sync_fold(history, summary, reserved_tokens=3)
+
+    large = ContextWindow(keep_turns=None, token_budget=1000, count_tokens=count_chars)
+    assert large.window_start(history, summary) == 0
+    assert not large.needs_sync_fold(history, summary)
+
+
+def test_window_keeps_at_least_one_message():
+    window = ContextWindow(keep_turns=None, token_budget=1, count_tokens=count_chars)
+    history = make_history(2)
+
+    assert window.window_start(history, {"text": "", "covered": 0}) == len(history) - 1
@@ -0,0 +1,116 @@
+"""
+近重复检测测试
+"""
+import pytest
+
+from src.services.dedup import DuplicateLinkStore, similarity_from_distance
+
+
+def test_similarity_from_distance():
+    assert similarity_from_distance(0.0) == 1.0
+    assert similarity_from_distance(2.0) == 0.0
+    assert similarity_from_distance(0.1) == pytest.approx(0.95)
+
+
+@pytest.fixture
+def links(tmp_path):
+    store = DuplicateLinkStore(str(tmp_path / "links.db"))
+    yield store
+    store.close()
+
+
+def test_link_store_resolve_and_relink(links):
+    links.put("plans", "p1", "p2", 0.97)
+    links.put("plans", "p0", "p1", 0.96)
+    assert links.resolve("plans", "p1") == "p2"
+    assert links.resolve("other", "p1") is None
+
+    # p1被p3替换：指向p1的链接一并改为指向p3
+    links.put("plans", "p1", "p3", 0.98)
+
+    assert links.resolve("plans", "p0") == "p3"
+    assert sorted(links.linked_ids("plans", "p3")) == ["p0", "p1"]
+    assert links.stats() == {"plans": 2}
+
+
+def test_link_store_delete_and_clear(links):
+    links.put("plans", "p1", "p2", 0.97)
+    links.put("plans", "p3", "p4", 0.97)
+    links.put("materials", "m1", "m2", 0.97)
+
+    links.delete("plans", "p2")
+    assert links.resolve("plans", "p1") is None
+    assert links.resolve("plans", "p3") == "p4"
+
+    links.clear("plans")
+    assert links.stats() == {"materials": 1}
+
+
+PLAN = {"title": "一元二次方程", "description": "掌握求根公式", "objectives": ["配方法", "公式法"], "estimated_days": 7}
+CONTENT = "勾股定理：直角三角形两直角边的平方和等于斜边的平方。"
+
+
+@pytest.fixture
+def dedup_service(make_rag_service):
+    def make(action):
+        return make_rag_service(dedup_enabled=True, dedup_action=action)
+    return make
+
+
+def test_duplicate_plan_is_skipped(dedup_service):
+    rag_service = dedup_service("skip")
+    assert rag_service.store_learning_plan("s1", "p1", PLAN) == {"stored": True}
+
+    result = rag_service.store_learning_plan("s1", "p2", PLAN)
+
+    assert result["stored"] is False and result["duplicate_of"] == "p1"
+    assert result["similarity"] == pytest.approx(1.0, abs=1e-4)
+    assert rag_service.learning_plans_collection.get()["ids"] == ["p1"]
+    # 其他学生的相同计划不算重复
+    assert rag_service.store_learning_plan("s2", "p3", PLAN) == {"stored": True}
+
+
+def test_duplicate_plan_replace_relinks_old_id(dedup_service):
+    rag_service = dedup_service("replace")
+    rag_service.store_learning_plan("s1", "p1", PLAN)
+
+    result = rag_service.store_learning_plan("s1", "p2", PLAN)
+
+    assert result["stored"] is True and result["action"] == "replace"
+    assert rag_service.learning_plans_collection.get()["ids"] == ["p2"]
+    assert rag_service.duplicate_links.resolve("learning_plans", "p1") == "p2"
+
+
+def test_duplicate_material_is_linked_without_embedding_twice(dedup_service):
+    rag_service = dedup_service("link")
+    rag_service.store_teaching_material("m1", CONTENT, {"subject": "数学"})
+
+    result = rag_service.store_teaching_material("m2", CONTENT, {"subject": "数学"})
+
+    assert [item["duplicate_of"] for item in result["duplicates"]] == ["m1"]
+    assert result["upserted"] == 0
+    assert rag_service.duplicate_links.resolve("teaching_materials", "m2") == "m1"
+    assert rag_service.material_manifests.get("m2") is None
+    assert {metadata["material_id"] for metadata in rag_service.teaching_materials_collection.get()["metadatas"]} == {"m1"}
+
+
+def test_compact_duplicates_offline(make_rag_service):
+    rag_service = make_rag_service()
+    rag_service.store_teaching_materials([
+        {"material_id": "m1", "content": CONTENT, "metadata": {"subject": "数学"}},
+        {"material_id": "m2", "content": CONTENT, "metadata": {"subject": "数学"}},
+        {"material_id": "m3", "content": "光合作用在叶绿体中进行。", "metadata": {"subject": "生物"}},
+    ])
+
+    assert len(rag_service.compact_duplicates("teaching_materials", dry_run=True)) == 1
+    duplicates = rag_service.compact_duplicates("teaching_materials")
+
+    assert len(duplicates) == 1
+    removed, kept = duplicates[0]["id"], duplicates[0]["duplicate_of"]
+    assert {removed, kept} == {"m1", "m2"}
+    assert rag_service.duplicate_links.resolve("teaching_materials", removed) == kept
+    remaining = {metadata["material_id"] for metadata in rag_service.teaching_materials_collection.get()["metadatas"]}
+    assert remaining == {kept, "m3"}
+
+    with pytest.raises(ValueError):
+        rag_service.find_duplicates("conversations")
@@ -0,0 +1,95 @@
+"""
+流式文档切分测试
+"""
+import random
+
+import pytest
+
+from src.services.document_loader import iter_chunks, iter_file_blocks
+from src.services.material_manifest import content_hash
+
+
+SEPARATORS = ["\n\n", "\n", "。", "！", "？", ".", "!", "?", " ", ""]
+
+
+def make_text(seed: int, paragraphs: bool = True) -> str:
+    """生成含中英文句子、换行和超长段落的测试文本"""
+    rng = random.Random(seed)
+    pieces = ["函数", "方程", "x", "。", "！", "\n", " ", "hello", "world.", "?", "长" * rng.randint(1, 400)]
+    if paragraphs:
+        pieces += ["\n\n", "\n\n\n"]
+    return "".join(rng.choice(pieces) for _ in range(rng.choice([20, 600, 4000])))
+
+
+def to_blocks(text: str, size: int):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.fixture
+def splitter():
+    text_splitter = pytest.importorskip("langchain.text_splitter")
+    return text_splitter.RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, separators=SEPARATORS)
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 997, 64 * 1024])
+@pytest.mark.parametrize("seed", range(12))
+def test_streamed_chunks_match_one_shot_split(splitter, seed, block_size):
+    text = make_text(seed, paragraphs=seed % 4 != 0)
+    streamed = list(iter_chunks(to_blocks(text, block_size), 1000, 200, SEPARATORS))
+    one_shot = splitter.split_text(text)
+
+    assert [content_hash(chunk) for chunk in streamed] == [content_hash(chunk) for chunk in one_shot]
+
+
+def test_separator_spanning_block_boundary(splitter):
+    text = "第一段" * 300 + "\n\n" + "第二段" * 300 + "\n\n\n" + "第三段" * 10
+    blocks = [text[:900], text[900:901], text[901:]]
+    assert list(iter_chunks(blocks, 1000, 200, SEPARATORS)) == splitter.split_text(text)
+
+
+def test_iter_file_blocks(tmp_path):
+    path = tmp_path / "material.txt"
+    path.write_text("abcdefghij", encoding="utf-8")
+    assert list(iter_file_blocks(str(path), block_size=4)) == ["abcd", "efgh", "ij"]
+
+
+def test_stream_and_batch_ingestion_store_identical_chunks(make_rag_service):
+    """同一材料经流式入库和一次性入库得到相同的文本块哈希，切换入库方式不会重新嵌入"""
+    rag_service = make_rag_service()
+    text = make_text(3)
+    metadata = {"subject": "数学"}
+
+    rag_service.store_teaching_materials([{"material_id": "m1", "content": text, "metadata": metadata}])
+    one_shot = rag_service.material_manifests.get("m1")["chunk_hashes"]
+
+    embedded = rag_service.embeddings.embedded
+    totals = rag_service.store_teaching_material_stream("m1", iter(to_blocks(text, 333)), metadata)
+
+    assert rag_service.material_manifests.get("m1")["chunk_hashes"] == one_shot
+    assert totals["embedded"] == 0 and totals["upserted"] == 0
+    assert rag_service.embeddings.embedded == embedded
+
+
+@pytest.mark.parametrize("line", ["函数与方程。\n", "长" * 50], ids=["lines", "no_separators"])
+def test_text_without_paragraph_breaks_streams_with_bounded_lag(line):
+    """没有空行（甚至没有任何分隔符）的大文本不会整体缓冲：每读入少量块就产出文本块"""
+    block_size = 1000
+    text = line * (2 * 1024 * 1024 // len(line))
+    consumed = []
+
+    def blocks():
+        for i in range(0, len(text), block_size):
+            consumed.append(i)
+            yield text[i:i + block_size]
+
+    emitted_at = []
+    for chunk in iter_chunks(blocks(), 1000, 200, SEPARATORS):
+        assert len(chunk) <= 1000
+        emitted_at.append(len(consumed))
+
+    # 读入过程中持续产出：首个文本块、相邻文本块之间以及读完后剩余的文本块都只隔少量读取块
+    total_blocks = len(consumed)
+    gaps = [b - a for a, b in zip([0] + emitted_at, emitted_at)]
+    assert len(emitted_at) > 2000
+    assert max(gaps) <= 3
+    assert emitted_at.count(total_blocks) <= 3
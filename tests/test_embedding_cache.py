@@ -0,0 +1,79 @@
+"""
+嵌入向量缓存测试
+"""
+import pytest
+
+from conftest import HashEmbeddings
+from src.services.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "embedding_cache.db")
+
+
+def test_keys_depend_on_model_and_text():
+    assert EmbeddingCache.make_key("a", "文本") == EmbeddingCache.make_key("a", "文本")
+    assert EmbeddingCache.make_key("a", "文本") != EmbeddingCache.make_key("b", "文本")
+    assert EmbeddingCache.make_key("a", "文本") != EmbeddingCache.make_key("a", "文本 ")
+
+
+def test_memory_and_disk_hits(cache_path):
+    cache = EmbeddingCache(cache_path, memory_size=1)
+    cache.put_many(["k1", "k2"], [[0.5, 1.0], [1.5, 2.0]])
+
+    # 内存只保留最近写入的k2，k1从磁盘读取
+    assert cache.get_many(["k2", "k1", "k3"]) == [[1.5, 2.0], [0.5, 1.0], None]
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 1)
+    cache.close()
+
+    reopened = EmbeddingCache(cache_path)
+    assert reopened.get_many(["k1"]) == [[0.5, 1.0]]
+    assert reopened.stats()["disk_bytes"] == stats["disk_bytes"]
+    reopened.close()
+
+
+def test_disk_eviction_keeps_recent_entries(cache_path):
+    cache = EmbeddingCache(cache_path, memory_size=1, max_disk_mb=0)
+    cache.max_disk_bytes = 4 * 4 * 3
+    for i in range(5):
+        cache.put_many([f"k{i}"], [[float(i)] * 4])
+
+    stats = cache.stats()
+    assert stats["evictions"] > 0
+    assert stats["disk_bytes"] <= cache.max_disk_bytes
+    assert cache.get_many(["k4"]) == [[4.0] * 4]
+    cache.close()
+
+
+def test_cached_embeddings_compute_each_text_once(cache_path):
+    cache = EmbeddingCache(cache_path)
+    inner = HashEmbeddings()
+    embeddings = CachedEmbeddings(inner, "hash", cache)
+
+    first = embeddings.embed_documents(["分数", "小数", "分数"])
+    assert inner.embedded == 2
+    assert first[0] == first[2] == inner.embed_query("分数")
+
+    assert embeddings.embed_query("小数") == first[1]
+    assert embeddings.embed_documents(["分数", "百分数"])[0] == first[0]
+    assert inner.embedded == 3
+
+    # 不同模型不共享缓存
+    CachedEmbeddings(inner, "other", cache).embed_query("分数")
+    assert inner.embedded == 4
+    cache.close()
+
+
+def test_rag_service_reuses_cached_embeddings(make_rag_service):
+    rag_service = make_rag_service(embedding_cache_enabled=True)
+    material = {"material_id": "m1", "content": "同分母分数相加，分母不变，分子相加。", "metadata": {"subject": "数学"}}
+
+    rag_service.store_teaching_materials([material])
+    inner = rag_service.embeddings.embeddings
+    embedded = inner.embedded
+    rag_service.store_teaching_materials([dict(material, material_id="m2")])
+
+    assert inner.embedded == embedded
+    assert rag_service.get_cache_stats()["embedding_cache"]["hit_rate"] > 0
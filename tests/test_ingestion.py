@@ -0,0 +1,156 @@
+"""
+批量入库测试：分批并发嵌入、分批写入与中断后续传
+"""
+import threading
+import time
+
+import pytest
+
+from conftest import HashEmbeddings
+from src.core.config import settings
+
+
+class RecordingEmbeddings(HashEmbeddings):
+    """记录每批文本和最大并发数；靠前的批次更慢，使并发批次乱序完成"""
+
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.batches.append(list(texts))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            order = len(self.batches)
+        time.sleep(0.05 / order)
+        try:
+            return super().embed_documents(texts)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+class RecordingCollection:
+    def __init__(self):
+        self.calls = []
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        assert len(ids) == len(embeddings) == len(documents) == len(metadatas)
+        self.calls.append(list(ids))
+
+
+def test_embed_texts_keeps_order_across_concurrent_batches(rag_service, monkeypatch):
+    monkeypatch.setattr(settings, "embedding_batch_size", 3)
+    monkeypatch.setattr(settings, "embedding_max_concurrency", 4)
+    rag_service.embeddings = RecordingEmbeddings()
+    texts = [f"文本{i}" * (i + 1) for i in range(10)]
+    progress = []
+
+    embeddings = rag_service.embed_texts(texts, progress_callback=lambda done, total: progress.append((done, total)))
+
+    assert embeddings == [rag_service.embeddings.embed_query(text) for text in texts]
+    assert sorted(len(batch) for batch in rag_service.embeddings.batches) == [1, 3, 3, 3]
+    assert rag_service.embeddings.max_active > 1
+    assert progress == [(3, 10), (6, 10), (9, 10), (10, 10)]
+
+
+def test_embed_texts_sequential_when_concurrency_is_one(rag_service, monkeypatch):
+    monkeypatch.setattr(settings, "embedding_batch_size", 4)
+    monkeypatch.setattr(settings, "embedding_max_concurrency", 1)
+    rag_service.embeddings = RecordingEmbeddings()
+    texts = [f"文本{i}" for i in range(9)]
+
+    assert rag_service.embed_texts(texts) == [rag_service.embeddings.embed_query(text) for text in texts]
+    assert [len(batch) for batch in rag_service.embeddings.batches] == [4, 4, 1]
+    assert rag_service.embeddings.max_active == 1
+    assert rag_service.embed_texts([]) == []
+
+
+def test_upsert_in_batches_respects_batch_size(rag_service, monkeypatch):
+    monkeypatch.setattr(settings, "vector_db_add_batch_size", 4)
+    collection = RecordingCollection()
+    ids = [f"c{i}" for i in range(10)]
+
+    rag_service._upsert_in_batches(collection, ids, [[0.0]] * 10, ["文档"] * 10, [{}] * 10)
+
+    assert collection.calls == [ids[0:4], ids[4:8], ids[8:10]]
+
+
+def test_store_materials_batches_embeddings_and_writes(rag_service, monkeypatch):
+    monkeypatch.setattr(settings, "embedding_batch_size", 2)
+    monkeypatch.setattr(settings, "vector_db_add_batch_size", 3)
+    rag_service.embeddings = RecordingEmbeddings()
+    calls = []
+    upsert = rag_service._upsert_in_batches
+
+    def record(collection, ids, *args):
+        calls.append(len(ids))
+        return upsert(collection, ids, *args)
+
+    monkeypatch.setattr(rag_service, "_upsert_in_batches", record)
+    materials = [
+        {"material_id": f"m{i}", "content": f"第{i}份材料：" + "勾股定理与三角形。" * (i + 1), "metadata": {"subject": "数学"}}
+        for i in range(5)
+    ]
+
+    result = rag_service.store_teaching_materials(materials)
+
+    assert result["embedded"] == result["upserted"] == result["chunks"] == 5
+    assert all(len(batch) <= 2 for batch in rag_service.embeddings.batches)
+    assert sum(calls) == 5
+    assert rag_service.teaching_materials_collection.count() == 5
+
+
+def test_interrupted_ingest_resumes_without_reembedding(make_rag_service, tmp_path, monkeypatch):
+    from src.scripts import ingest_materials
+    from src.services.rag_service import RAGService
+
+    services = []
+
+    def make_service():
+        service = RAGService()
+        service.embeddings = RecordingEmbeddings()
+        services.append(service)
+        return service
+
+    monkeypatch.setattr(ingest_materials, "RAGService", make_service)
+    directory = tmp_path / "materials"
+    (directory / "数学").mkdir(parents=True)
+    for i in range(3):
+        (directory / "数学" / f"第{i}章.txt").write_text(f"第{i}章：" + "方程与函数。" * 5, encoding="utf-8")
+    state_file = str(tmp_path / "ingest_state.json")
+
+    # 第二轮写入时中断
+    store = RAGService.store_teaching_materials
+    rounds = []
+
+    def interrupted(self, materials, progress_callback=None):
+        rounds.append([material["material_id"] for material in materials])
+        if len(rounds) == 2:
+            raise KeyboardInterrupt
+        return store(self, materials, progress_callback=progress_callback)
+
+    monkeypatch.setattr(RAGService, "store_teaching_materials", interrupted)
+    try:
+        with pytest.raises(KeyboardInterrupt):
+            ingest_materials.ingest_directory(str(directory), state_file=state_file, files_per_round=1)
+        assert list(ingest_materials.load_state(state_file)) == ["数学__第0章"]
+
+        monkeypatch.setattr(RAGService, "store_teaching_materials", store)
+        ingest_materials.ingest_directory(str(directory), state_file=state_file, files_per_round=1)
+
+        resumed = [text for batch in services[1].embeddings.batches for text in batch]
+        assert resumed and not any(text.startswith("第0章") for text in resumed)
+        assert set(ingest_materials.load_state(state_file)) == {"数学__第0章", "数学__第1章", "数学__第2章"}
+        assert services[1].teaching_materials_collection.count() == 3
+
+        # 再次运行时全部跳过
+        ingest_materials.ingest_directory(str(directory), state_file=state_file, files_per_round=1)
+        assert services[2].embeddings.batches == []
+    finally:
+        for service in services:
+            service.close()
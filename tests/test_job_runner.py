@@ -0,0 +1,229 @@
+"""
+后台任务执行器测试
+"""
+import asyncio
+
+import pytest
+
+from src.services import job_runner as job_runner_module
+from src.services.job_runner import JobRunner
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def test_job_succeeds_and_fails():
+    async def run():
+        runner = JobRunner()
+
+        async def ok():
+            return {"plan": 1}
+
+        async def broken():
+            raise ValueError("生成失败")
+
+        ok_id = runner.submit("plan", ok, key="c1")
+        broken_id = runner.submit("plan", broken)
+        assert runner.get(ok_id)["status"] == "pending"
+        return runner, await runner.wait(ok_id, 1), await runner.wait(broken_id, 1)
+
+    runner, ok_job, broken_job = asyncio.run(run())
+
+    assert ok_job["status"] == "succeeded" and ok_job["result"] == {"plan": 1} and ok_job["key"] == "c1"
+    assert ok_job["started_at"] and ok_job["finished_at"]
+    assert broken_job["status"] == "failed" and broken_job["error"] == "生成失败"
+    assert runner.stats() == {"succeeded": 1, "failed": 1}
+    # get返回副本
+    runner.get(ok_job["id"])["status"] = "x"
+    assert runner.get(ok_job["id"])["status"] == "succeeded"
+    assert runner.get("missing") is None
+
+
+def test_concurrency_limit_per_kind():
+    async def run():
+        runner = JobRunner()
+        runner.set_limit("plan", 1)
+        running = {"now": 0, "max": 0}
+
+        async def job():
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+            await asyncio.sleep(0.01)
+            running["now"] -= 1
+
+        ids = [runner.submit("plan", job) for _ in range(3)]
+        await asyncio.sleep(0)
+        statuses = [runner.get(job_id)["status"] for job_id in ids]
+        # 不受限的任务类型不排队
+        other = runner.submit("report", job)
+        await asyncio.gather(*(runner.wait(job_id, 1) for job_id in ids + [other]))
+        return statuses, running["max"], runner.stats()
+
+    statuses, max_running, stats = asyncio.run(run())
+
+    assert statuses == ["running", "pending", "pending"]
+    assert max_running == 2
+    assert stats == {"succeeded": 4}
+
+
+def test_find_active_and_wait_timeout():
+    async def run():
+        runner = JobRunner()
+        release = asyncio.Event()
+
+        async def job():
+            await release.wait()
+            return "完成"
+
+        job_id = runner.submit("plan", job, key="c1")
+        active = runner.find_active("plan", "c1")
+        timed_out = await runner.wait(job_id, 0.01)
+        release.set()
+        finished = await runner.wait(job_id, 1)
+        return job_id, active, timed_out, finished, runner.find_active("plan", "c1"), await runner.wait("missing", 1)
+
+    job_id, active, timed_out, finished, after, missing = asyncio.run(run())
+
+    assert active == job_id
+    assert timed_out["status"] == "running"
+    assert finished["status"] == "succeeded" and finished["result"] == "完成"
+    assert after is None and missing is None
+
+
+def test_finished_jobs_expire(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(job_runner_module, "time", clock)
+
+    async def run():
+        runner = JobRunner(result_ttl_seconds=60)
+
+        async def job():
+            return 1
+
+        first = runner.submit("plan", job)
+        await runner.wait(first, 1)
+        clock.now += 30
+        runner.submit("plan", job)
+        kept = runner.get(first)
+        clock.now += 31
+        runner.submit("plan", job)
+        return kept, runner.get(first)
+
+    kept, expired = asyncio.run(run())
+
+    assert kept is not None and expired is None
+
+
+def test_shutdown_cancels_jobs_after_timeout():
+    async def run():
+        runner = JobRunner()
+
+        async def slow():
+            await asyncio.sleep(10)
+
+        async def fast():
+            await asyncio.sleep(0.01)
+
+        slow_id = runner.submit("plan", slow)
+        fast_id = runner.submit("plan", fast)
+        await runner.shutdown(timeout=0.1)
+        return runner.get(slow_id), runner.get(fast_id), runner._tasks
+
+    slow_job, fast_job, tasks = asyncio.run(run())
+
+    assert slow_job["status"] == "cancelled" and slow_job["finished_at"]
+    assert fast_job["status"] == "succeeded"
+    assert tasks == {}
+
+
+@pytest.fixture
+def store(tmp_path):
+    sqlalchemy = pytest.importorskip("sqlalchemy")
+    from sqlalchemy.orm import sessionmaker
+    from src.models import BackgroundJob
+    from src.services.job_store import DatabaseJobStore
+
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    BackgroundJob.__table__.create(engine)
+    yield DatabaseJobStore(sessionmaker(bind=engine))
+    engine.dispose()
+
+
+def test_job_status_is_visible_to_other_workers(store):
+    async def run():
+        worker = JobRunner(store=store)
+        other = JobRunner(store=store, poll_interval=0.01)
+        release = asyncio.Event()
+
+        async def job():
+            await release.wait()
+            return {"learning_plan_id": "p1"}
+
+        job_id = worker.submit("learning_plan", job, key="c1")
+        await asyncio.sleep(0)
+        running = other.get(job_id)
+        timed_out = await other.wait(job_id, 0.05)
+        release.set()
+        finished = await other.wait(job_id, 1)
+        return job_id, running, timed_out, finished, await other.wait("missing", 0.05)
+
+    job_id, running, timed_out, finished, missing = asyncio.run(run())
+
+    assert running["status"] == "running" and running["key"] == "c1"
+    assert timed_out["status"] == "running"
+    assert finished["status"] == "succeeded" and finished["result"] == {"learning_plan_id": "p1"}
+    assert missing is None
+    # 重启后的进程仍可查询
+    assert JobRunner(store=store).get(job_id)["status"] == "succeeded"
+
+
+def test_stored_jobs_expire(store, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(job_runner_module, "time", clock)
+
+    async def run():
+        runner = JobRunner(result_ttl_seconds=60, store=store)
+
+        async def job():
+            return 1
+
+        first = runner.submit("plan", job)
+        await runner.wait(first, 1)
+        clock.now += 61
+        runner.submit("plan", job)
+        return first
+
+    first = asyncio.run(run())
+
+    assert store.load(first) is None
+
+
+def test_store_failures_do_not_break_jobs():
+    class BrokenStore:
+        def save(self, job):
+            raise RuntimeError("数据库不可用")
+
+        def load(self, job_id):
+            raise RuntimeError("数据库不可用")
+
+        def purge(self, finished_before):
+            raise RuntimeError("数据库不可用")
+
+    async def run():
+        runner = JobRunner(store=BrokenStore())
+
+        async def job():
+            return "完成"
+
+        job_id = runner.submit("plan", job)
+        return await runner.wait(job_id, 1), runner.get("missing")
+
+    finished, missing = asyncio.run(run())
+
+    assert finished["status"] == "succeeded" and finished["result"] == "完成"
+    assert missing is None
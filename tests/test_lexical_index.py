@@ -0,0 +1,83 @@
+"""
+BM25词法索引与混合检索测试
+"""
+import pytest
+
+from src.core.config import settings
+from src.services.lexical_index import BM25Index, tokenize
+
+
+def test_tokenize_chinese_bigrams_and_english_words():
+    assert tokenize("勾股定理") == ["勾股", "股定", "定理"]
+    assert tokenize("用Python算 3次方，和") == ["用", "python", "算", "3", "次方", "和"]
+    assert tokenize("！？") == []
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = BM25Index(str(tmp_path / "lexical.db"))
+    index.add_documents(
+        ["d1", "d2", "d3"],
+        ["勾股定理描述直角三角形三边的关系", "三角形内角和为180度", "光合作用需要光照和二氧化碳"],
+        [{"subject": "数学"}, {"subject": "数学"}, {"subject": "生物"}]
+    )
+    yield index
+    index.close()
+
+
+def test_bm25_ranks_matching_documents(index):
+    results = index.search("直角三角形", k=3)
+
+    assert [result["id"] for result in results] == ["d1", "d2"]
+    assert results[0]["score"] > results[1]["score"] > 0
+    assert index.search("量子力学") == []
+
+
+def test_search_applies_metadata_filter(index):
+    assert [r["id"] for r in index.search("三角形 光照", where={"subject": "生物"})] == ["d3"]
+
+
+def test_overwrite_delete_and_persistence(index, tmp_path):
+    index.add_documents(["d1"], ["电磁感应"], [{"subject": "物理"}])
+    assert index.count() == 3
+    assert [r["id"] for r in index.search("三角形")] == ["d2"]
+
+    index.delete(["d2"])
+    assert index.search("三角形") == []
+    index.close()
+
+    reopened = BM25Index(str(tmp_path / "lexical.db"))
+    assert reopened.count() == 2
+    assert [r["id"] for r in reopened.search("电磁")] == ["d1"]
+    reopened.clear()
+    assert reopened.count() == 0
+    reopened.close()
+
+
+def test_reciprocal_rank_fusion_rewards_agreement(rag_service):
+    def result(doc_id, distance=None):
+        return {"id": doc_id, "content": doc_id, "metadata": {}, "distance": distance}
+
+    fused = rag_service._reciprocal_rank_fusion(
+        [[result("a", 0.1), result("b", 0.2), result("c", 0.3)], [result("c"), result("d")]],
+        k=3
+    )
+
+    assert fused[0]["id"] == "c"
+    assert fused[0]["distance"] == 0.3
+    assert fused[0]["score"] == pytest.approx(1 / (settings.hybrid_rrf_k + 3) + 1 / (settings.hybrid_rrf_k + 1))
+    # 同名次时保持先出现的结果在前
+    assert [item["id"] for item in fused[1:]] == ["a", "b"]
+
+
+def test_search_modes_return_lexical_matches(rag_service):
+    rag_service.store_teaching_materials([
+        {"material_id": "m1", "content": "勾股定理：直角三角形两直角边的平方和等于斜边的平方。", "metadata": {"subject": "数学"}},
+        {"material_id": "m2", "content": "光合作用在叶绿体中进行。", "metadata": {"subject": "生物"}},
+    ])
+
+    for mode in ["lexical", "hybrid", "auto"]:
+        results = rag_service.search_teaching_materials("勾股定理", k=1, mode=mode)
+        assert results[0]["metadata"]["material_id"] == "m1"
+    with pytest.raises(ValueError):
+        rag_service.search_teaching_materials("勾股定理", mode="fuzzy")
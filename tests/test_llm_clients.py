@@ -0,0 +1,66 @@
+"""
+LLM HTTP客户端池测试
+"""
+import asyncio
+import threading
+
+import pytest
+
+from src.core.config import settings
+from src.services import llm_clients as llm_clients_module
+from src.services.llm_clients import ConnectionStats, LLMClientPool
+
+
+@pytest.fixture
+def client_pool(monkeypatch):
+    pool = LLMClientPool()
+    monkeypatch.setattr(llm_clients_module, "llm_clients", pool)
+    yield pool
+    asyncio.run(pool.aclose())
+
+
+def test_sdk_clients_share_http_clients(client_pool):
+    pytest.importorskip("openai")
+    client, async_client = client_pool.openai_clients("openai", "sk-test", "https://api.openai.com/v1")
+    http_client, async_http_client = client_pool.get_http_clients("openai")
+
+    assert client._client is http_client
+    assert async_client._client is async_http_client
+    assert client_pool.openai_clients("openai", "sk-test", "https://api.openai.com/v1") == (client, async_client)
+
+
+def test_llm_service_construction_does_not_deadlock(client_pool, monkeypatch):
+    pytest.importorskip("langchain_openai")
+    from src.services import llm_service as llm_service_module
+
+    monkeypatch.setattr(llm_service_module, "llm_clients", client_pool)
+    monkeypatch.setattr(settings, "llm_provider", "openai")
+    monkeypatch.setattr(settings, "openai_api_key", "sk-test")
+    monkeypatch.setattr(settings, "llm_fallback_providers", "")
+
+    result = {}
+
+    def build():
+        result["service"] = llm_service_module.LLMService()
+
+    thread = threading.Thread(target=build, daemon=True)
+    thread.start()
+    thread.join(timeout=30)
+    assert not thread.is_alive(), "LLMService构造卡死"
+
+    _, async_http_client = client_pool.get_http_clients("openai")
+    assert result["service"].llm.async_client._client._client is async_http_client
+
+
+def test_connection_stats_counts_reuse():
+    stats = ConnectionStats()
+    stats.record("connection.connect_tcp.complete")
+    stats.record("connection.start_tls.complete")
+    for _ in range(4):
+        stats.record("http11.send_request_headers.started")
+
+    snapshot = stats.snapshot()
+    assert snapshot["requests"] == 4
+    assert snapshot["connections"] == 1
+    assert snapshot["reused"] == 3
+    assert snapshot["reuse_rate"] == 0.75
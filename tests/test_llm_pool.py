@@ -0,0 +1,217 @@
+"""
+LLM提供商池测试
+"""
+import asyncio
+
+import pytest
+
+from src.core.config import settings
+from src.services import llm_pool as llm_pool_module
+from src.services.llm_pool import LLMProviderPool, ProviderHealth
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+
+class FakeLLM:
+    """可控延迟和失败的模型"""
+
+    def __init__(self, name, delay=0.0, fail=False, model_name=None, temperature=0.7):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.model_name = model_name or f"{name}-model"
+        self.temperature = temperature
+        self.max_tokens = 2000
+        self.calls = 0
+        self.cancelled = 0
+
+    async def ainvoke(self, input):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise RuntimeError(f"{self.name} 故障")
+        return f"{self.name}:{input}"
+
+    async def astream(self, input):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError(f"{self.name} 故障")
+        for part in ["a", "b"]:
+            yield part
+
+    def get_num_tokens(self, text):
+        return len(text) * (2 if self.name == "backup" else 1)
+
+    def get_num_tokens_from_messages(self, messages):
+        raise NotImplementedError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_pool_module, "time", clock)
+    return clock
+
+
+def test_circuit_opens_half_opens_and_closes(clock):
+    health = ProviderHealth("primary", failure_threshold=2, open_seconds=30)
+
+    health.record_failure()
+    assert health.state == "closed" and health.available()
+    health.record_failure()
+    assert health.state == "open" and not health.available()
+
+    clock.now += 30
+    assert health.available() and health.state == "half_open"
+    assert health.begin()
+    health.record_success(0.1)
+    assert health.state == "closed" and health.consecutive_failures == 0
+
+
+def test_half_open_probe_failure_reopens(clock):
+    health = ProviderHealth("primary", failure_threshold=1, open_seconds=30)
+    health.record_failure()
+    clock.now += 30
+
+    assert health.begin()
+    health.record_failure()
+    assert health.state == "open" and not health.available()
+
+
+def test_half_open_admits_a_single_probe(clock):
+    health = ProviderHealth("primary", failure_threshold=1, open_seconds=30)
+    health.record_failure()
+    clock.now += 30
+
+    assert health.begin()
+    assert not health.available()
+    assert not health.begin()
+
+    # 探测请求被取消后允许下一个探测
+    health.record_cancelled()
+    assert health.begin()
+
+    # 丢失的探测请求超过open_seconds后不再阻塞
+    clock.now += 30
+    assert health.begin()
+
+
+def test_concurrent_requests_send_one_probe_to_half_open_provider(clock):
+    primary = FakeLLM("primary", delay=0.05)
+    backup = FakeLLM("backup")
+    pool = LLMProviderPool([("primary", primary), ("backup", backup)], failure_threshold=1, open_seconds=30)
+    pool.providers[0][2].record_failure()
+    clock.now += 30
+
+    async def run():
+        return await asyncio.gather(*[pool.ainvoke("q") for _ in range(5)])
+
+    results = asyncio.run(run())
+
+    assert primary.calls == 1
+    assert backup.calls == 4
+    assert sorted(provider for _, provider in results) == ["backup"] * 4 + ["primary"]
+    assert pool.providers[0][2].state == "closed"
+
+
+def test_failover_to_next_provider():
+    primary = FakeLLM("primary", fail=True)
+    backup = FakeLLM("backup")
+    pool = LLMProviderPool([("primary", primary), ("backup", backup)], failure_threshold=2)
+
+    response, provider = asyncio.run(pool.ainvoke("q"))
+
+    assert (response, provider) == ("backup:q", "backup")
+    assert pool.failovers == 1
+    assert pool.stats()["providers"]["primary"]["failures"] == 1
+
+
+def test_all_providers_failing_raises_last_error():
+    pool = LLMProviderPool([("primary", FakeLLM("primary", fail=True)), ("backup", FakeLLM("backup", fail=True))])
+
+    with pytest.raises(RuntimeError, match="backup"):
+        asyncio.run(pool.ainvoke("q"))
+
+
+def test_open_circuit_is_skipped_until_all_are_open():
+    primary = FakeLLM("primary")
+    backup = FakeLLM("backup", fail=True)
+    pool = LLMProviderPool([("primary", primary), ("backup", backup)], failure_threshold=1)
+    pool.providers[0][2].record_failure()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(pool.ainvoke("q"))
+    assert primary.calls == 0
+
+    # 全部熔断时仍按顺序尝试
+    assert asyncio.run(pool.ainvoke("q")) == ("primary:q", "primary")
+
+
+def test_hedge_cancels_slower_provider():
+    primary = FakeLLM("primary", delay=1)
+    backup = FakeLLM("backup")
+    pool = LLMProviderPool(
+        [("primary", primary), ("backup", backup)], hedge_enabled=True, hedge_default_delay=0.01
+    )
+
+    assert asyncio.run(pool.ainvoke("q")) == ("backup:q", "backup")
+    assert pool.hedges == 1 and pool.hedge_wins == 1
+    assert primary.cancelled == 1
+    assert pool.stats()["providers"]["primary"]["cancelled"] == 1
+
+
+def test_stream_fails_over_and_records_route():
+    pool = LLMProviderPool([("primary", FakeLLM("primary", fail=True)), ("backup", FakeLLM("backup"))])
+    route = {}
+
+    async def collect():
+        return [chunk async for chunk in pool.astream("q", route=route)]
+
+    assert asyncio.run(collect()) == ["a", "b"]
+    assert route == {"provider": "backup"}
+
+
+@pytest.fixture
+def llm_service(monkeypatch):
+    pytest.importorskip("langchain_core")
+    from src.services.llm_service import LLMService
+
+    llms = {"openai": FakeLLM("primary"), "qwen": FakeLLM("backup", temperature=0.2)}
+    monkeypatch.setattr(LLMService, "_create_llm", staticmethod(lambda provider: llms[provider]))
+    monkeypatch.setattr(LLMService, "_provider_configured", staticmethod(lambda provider: True))
+    monkeypatch.setattr(settings, "llm_provider", "openai")
+    monkeypatch.setattr(settings, "llm_fallback_providers", "qwen")
+    return LLMService()
+
+
+def test_estimate_usage_uses_answering_provider(llm_service):
+    from langchain_core.messages import HumanMessage
+
+    messages = [HumanMessage(content="你好")]
+    primary = llm_service.estimate_usage(messages, "回答")
+    backup = llm_service.estimate_usage(messages, "回答", "qwen")
+
+    assert primary["provider"] == "openai" and primary["completion_tokens"] == 2
+    assert backup["provider"] == "qwen" and backup["completion_tokens"] == 4
+
+
+def test_request_key_covers_every_pool_provider(llm_service):
+    from langchain_core.messages import HumanMessage
+
+    key = llm_service._request_key([HumanMessage(content="  你好 \n")])
+
+    assert "backup-model" in key and "primary-model" in key
+    assert key == llm_service._request_key([HumanMessage(content="你好")])
@@ -0,0 +1,97 @@
+"""
+教学材料增量入库（材料清单）测试
+"""
+from src.services.material_manifest import MaterialManifestStore, content_hash, metadata_hash
+
+
+METADATA = {"subject": "数学"}
+
+
+def paragraph(i: int) -> str:
+    # 每段约750字，单独成为一个文本块
+    return f"第{i}段。" + f"知识点{i}，" * 150
+
+
+def material(*indexes: int) -> str:
+    return "\n\n".join(paragraph(i) for i in indexes)
+
+
+def test_manifest_store_roundtrip(tmp_path):
+    store = MaterialManifestStore(str(tmp_path / "manifests.db"))
+    store.put("m1", ["h1", "h2"], "meta")
+
+    assert store.get("m1") == {"chunk_hashes": ["h1", "h2"], "metadata_hash": "meta"}
+    store.delete("m1")
+    assert store.get("m1") is None
+    store.put("m2", [], "meta")
+    store.clear()
+    assert store.get("m2") is None
+    store.close()
+
+
+def test_metadata_hash_ignores_key_order():
+    assert metadata_hash({"a": 1, "b": 2}) == metadata_hash({"b": 2, "a": 1})
+    assert content_hash("文本") != content_hash("文本 ")
+
+
+def test_unchanged_material_is_not_rewritten(rag_service):
+    first = rag_service.store_teaching_material("m1", material(0, 1, 2), METADATA)
+    assert first["chunks"] == 3 and first["embedded"] == 3
+
+    again = rag_service.store_teaching_material("m1", material(0, 1, 2), METADATA)
+
+    assert (again["upserted"], again["embedded"], again["deleted"]) == (0, 0, 0)
+
+
+def test_only_changed_chunks_are_embedded(rag_service):
+    rag_service.store_teaching_material("m1", material(0, 1, 2), METADATA)
+
+    result = rag_service.store_teaching_material("m1", material(0, 5, 2), METADATA)
+
+    assert (result["upserted"], result["embedded"], result["deleted"]) == (1, 1, 0)
+    stored = rag_service.teaching_materials_collection.get(ids=["m1_chunk_1"], include=["documents"])
+    assert stored["documents"] == [paragraph(5)]
+
+
+def test_moved_chunks_reuse_vectors_and_extra_chunks_are_deleted(rag_service):
+    rag_service.store_teaching_material("m1", material(0, 1, 2), METADATA)
+
+    result = rag_service.store_teaching_material("m1", material(1, 0), METADATA)
+
+    assert (result["upserted"], result["embedded"], result["deleted"]) == (2, 0, 1)
+    assert rag_service.teaching_materials_collection.count() == 2
+    assert rag_service.material_manifests.get("m1")["chunk_hashes"] == [
+        content_hash(paragraph(1)), content_hash(paragraph(0))
+    ]
+
+
+def test_metadata_change_rewrites_chunks_without_embedding(rag_service):
+    rag_service.store_teaching_material("m1", material(0, 1), METADATA)
+
+    result = rag_service.store_teaching_material("m1", material(0, 1), {"subject": "数学", "grade": "八年级"})
+
+    assert (result["upserted"], result["embedded"]) == (2, 0)
+    stored = rag_service.teaching_materials_collection.get(ids=["m1_chunk_0"], include=["metadatas"])
+    assert stored["metadatas"][0]["grade"] == "八年级"
+
+
+def test_material_without_manifest_is_diffed_against_stored_chunks(rag_service):
+    rag_service.store_teaching_material("m1", material(0, 1), METADATA)
+    rag_service.material_manifests.delete("m1")
+
+    result = rag_service.store_teaching_material("m1", material(0, 1), METADATA)
+
+    # 重建的清单没有元数据哈希，块内容不变时复用向量并刷新元数据
+    assert (result["upserted"], result["embedded"]) == (2, 0)
+    assert rag_service.material_manifests.get("m1")["chunk_hashes"] == [
+        content_hash(paragraph(0)), content_hash(paragraph(1))
+    ]
+
+
+def test_delete_material_removes_chunks_and_manifest(rag_service):
+    rag_service.store_teaching_material("m1", material(0, 1), METADATA)
+
+    rag_service.delete_teaching_material("m1")
+
+    assert rag_service.teaching_materials_collection.count() == 0
+    assert rag_service.material_manifests.get("m1") is None
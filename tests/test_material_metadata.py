@@ -0,0 +1,101 @@
+"""
+教学材料元数据与检索过滤条件测试
+"""
+import pytest
+
+from src.services.material_metadata import build_material_filter, normalize_material_metadata, parse_grade_range
+from src.services.metadata_filter import combine_where, matches_where
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("初二", (8, 8)),
+    ("高三", (12, 12)),
+    ("小五", (5, 5)),
+    ("初中一年级", (7, 7)),
+    ("八年级", (8, 8)),
+    ("十一年级", (11, 11)),
+    ("7-9年级", (7, 9)),
+    ("初一至初三", (7, 9)),
+    ("Grade 8", (8, 8)),
+    ("初中", (7, 9)),
+    ("小学、初中", (1, 9)),
+    ("10", (10, 10)),
+    (3, (3, 3)),
+    ("初级", None),
+    ("", None),
+    (None, None),
+    (13, None),
+    ("小七", None),
+])
+def test_parse_grade_range(value, expected):
+    assert parse_grade_range(value) == expected
+
+
+def test_normalize_material_metadata():
+    normalized = normalize_material_metadata({
+        "subject": " 数学 ",
+        "grade": "初二",
+        "material_type": " Exercise ",
+        "source": "教材\\第一章.pdf",
+        "author": None
+    })
+
+    assert normalized == {
+        "subject": "数学",
+        "grade": "初二",
+        "grade_min": 8,
+        "grade_max": 8,
+        "material_type": "exercise",
+        "source": "教材/第一章.pdf"
+    }
+    assert normalize_material_metadata({"level": "初级"})["grade_min"] == 1
+    assert normalize_material_metadata({"grade_min": 4, "grade_max": 6, "grade": "初二"})["grade_min"] == 4
+
+
+def test_build_material_filter():
+    assert build_material_filter() == {"type": "teaching_material"}
+
+    where = build_material_filter(subject="数学", grade="7-8年级", material_type=["Exercise", "讲义"], source="a\\b")
+
+    assert where == {"$and": [
+        {"type": "teaching_material"},
+        {"subject": "数学"},
+        {"grade_min": {"$lte": 8}},
+        {"grade_max": {"$gte": 7}},
+        {"material_type": {"$in": ["exercise", "讲义"]}},
+        {"source": "a/b"}
+    ]}
+    # 无法解析的年级不参与过滤
+    assert build_material_filter(grade="初级") == {"type": "teaching_material"}
+
+
+def test_grade_ranges_match_by_overlap():
+    where = build_material_filter(grade="初二")
+
+    assert matches_where({"type": "teaching_material", "grade_min": 7, "grade_max": 9}, where)
+    assert matches_where({"type": "teaching_material", "grade_min": 1, "grade_max": 12}, where)
+    assert not matches_where({"type": "teaching_material", "grade_min": 10, "grade_max": 12}, where)
+    assert not matches_where({"type": "learning_plan", "grade_min": 8, "grade_max": 8}, where)
+
+
+def test_matches_where_operators():
+    metadata = {"subject": "数学", "grade_min": 7, "material_type": "exercise"}
+
+    assert matches_where(metadata, None)
+    assert matches_where(metadata, {"$or": [{"subject": "物理"}, {"grade_min": {"$gte": 7}}]})
+    assert matches_where(metadata, {"material_type": {"$nin": ["讲义"]}})
+    assert not matches_where(metadata, {"subject": {"$ne": "数学"}})
+    assert not matches_where(metadata, {"source": "a"})
+    assert combine_where([{"a": 1}]) == {"a": 1}
+
+
+def test_search_filters_by_grade(rag_service):
+    rag_service.store_teaching_materials([
+        {"material_id": "m1", "content": "一元二次方程的解法。", "metadata": {"subject": "数学", "grade": "初三"}},
+        {"material_id": "m2", "content": "一元一次方程的解法。", "metadata": {"subject": "数学", "grade": "初一"}},
+        {"material_id": "m3", "content": "方程的意义。", "metadata": {"subject": "数学"}},
+    ])
+
+    results = rag_service.search_teaching_materials("方程的解法", k=5, mode="vector", grade="九年级")
+
+    assert {item["metadata"]["material_id"] for item in results} == {"m1", "m3"}
@@ -0,0 +1,138 @@
+"""
+NumPy向量集合测试
+"""
+import numpy as np
+import pytest
+
+from src.services.numpy_vector_store import NumpyCollection
+
+
+@pytest.fixture
+def make_collection(tmp_path):
+    collections = []
+
+    def make(name="items", **kwargs):
+        collection = NumpyCollection(str(tmp_path / name), name, **kwargs)
+        collections.append(collection)
+        return collection
+
+    yield make
+    for collection in collections:
+        try:
+            collection.close()
+        except Exception:
+            pass
+
+
+def random_vectors(count, dimensions=8, seed=0):
+    return np.random.default_rng(seed).normal(size=(count, dimensions)).astype(np.float32)
+
+
+def test_query_matches_brute_force(make_collection):
+    collection = make_collection()
+    vectors = random_vectors(50)
+    ids = [f"v{i}" for i in range(50)]
+    collection.add(ids=ids, embeddings=vectors.tolist(), documents=[f"文档{i}" for i in range(50)],
+                   metadatas=[{"group": i % 3} for i in range(50)])
+    queries = random_vectors(3, seed=1)
+
+    results = collection.query(query_embeddings=queries.tolist(), n_results=5)
+
+    for row, query in enumerate(queries):
+        distances = np.sum((vectors - query) ** 2, axis=1)
+        expected = np.argsort(distances)[:5]
+        assert results["ids"][row] == [ids[i] for i in expected]
+        assert results["distances"][row] == pytest.approx(distances[expected].tolist(), rel=1e-4)
+        assert results["documents"][row][0] == f"文档{expected[0]}"
+
+
+def test_where_filter_and_incremental_masks(make_collection):
+    collection = make_collection()
+    collection.add(ids=["a", "b", "c"], embeddings=[[1, 0], [0.9, 0.1], [0, 1]],
+                   metadatas=[{"subject": "数学"}, {"subject": "物理"}, {"subject": "数学"}])
+    where = {"subject": "数学"}
+    assert collection.query(query_embeddings=[[1, 0]], n_results=3, where=where)["ids"] == [["a", "c"]]
+
+    # 已缓存的掩码随写入和删除更新
+    collection.upsert(ids=["b"], embeddings=[[0.9, 0.1]], metadatas=[{"subject": "数学"}])
+    collection.delete(ids=["a"])
+
+    assert collection.query(query_embeddings=[[1, 0]], n_results=3, where=where)["ids"] == [["b", "c"]]
+    assert collection.get(where=where)["ids"] == ["b", "c"]
+
+
+def test_add_ignores_existing_ids_and_upsert_overwrites(make_collection):
+    collection = make_collection()
+    collection.add(ids=["a"], embeddings=[[1, 0]], documents=["旧"], metadatas=[{"v": 1}])
+
+    collection.add(ids=["a"], embeddings=[[0, 1]], documents=["新"], metadatas=[{"v": 2}])
+    assert collection.get(ids=["a"])["documents"] == ["旧"]
+
+    collection.upsert(ids=["a"], embeddings=[[0, 1]], documents=["新"], metadatas=[{"v": 2}])
+    stored = collection.get(ids=["a"], include=["embeddings", "documents", "metadatas"])
+    assert stored["documents"] == ["新"] and stored["metadatas"] == [{"v": 2}]
+    assert stored["embeddings"] == [[0.0, 1.0]]
+    assert collection.count() == 1
+
+
+def test_deleted_rows_are_reused(make_collection):
+    collection = make_collection()
+    collection.add(ids=["a", "b"], embeddings=[[1, 0], [0, 1]])
+    collection.delete(ids=["a"])
+    assert collection.count() == 1
+
+    collection.add(ids=["c"], embeddings=[[0.5, 0.5]])
+
+    assert collection.count() == 2
+    # c写入a释放的第0行，不增加行数
+    assert len(collection._ids) == 2
+    assert collection.get(limit=1)["ids"] == ["c"]
+
+
+def test_capacity_growth_and_persistence(make_collection, tmp_path, monkeypatch):
+    monkeypatch.setattr(NumpyCollection, "INITIAL_CAPACITY", 4)
+    collection = make_collection(metadata={"description": "测试"}, dtype="float16")
+    vectors = random_vectors(10)
+    collection.add(ids=[f"v{i}" for i in range(10)], embeddings=vectors.tolist(), documents=[str(i) for i in range(10)])
+    collection.delete(ids=["v3"])
+    collection.close()
+
+    reopened = make_collection()
+    assert reopened.dtype == np.float16
+    assert reopened.metadata == {"description": "测试"}
+    assert reopened.count() == 9
+    stored = reopened.get(ids=["v7"], include=["embeddings"])["embeddings"][0]
+    assert stored == pytest.approx(vectors[7].tolist(), abs=1e-2)
+    assert reopened.query(query_embeddings=[vectors[7].tolist()], n_results=1)["ids"] == [["v7"]]
+
+    assert NumpyCollection.list_collections(str(tmp_path)) == [("items", {"description": "测试"})]
+    reopened.close()
+    NumpyCollection.delete_collection(str(tmp_path), "items")
+    assert NumpyCollection.list_collections(str(tmp_path)) == []
+
+
+def test_dimension_mismatch_is_rejected(make_collection):
+    collection = make_collection()
+    collection.add(ids=["a"], embeddings=[[1, 0]])
+
+    with pytest.raises(ValueError):
+        collection.add(ids=["b"], embeddings=[[1, 0, 0]])
+
+
+def test_empty_query(make_collection):
+    results = make_collection().query(query_embeddings=[[1, 0]], n_results=3, include=["documents"])
+
+    assert results["ids"] == [[]] and results["documents"] == [[]] and results["distances"] is None
+
+
+def test_rag_service_on_numpy_backend(make_rag_service):
+    rag_service = make_rag_service(numpy_vector_collections="teaching_materials")
+    rag_service.store_teaching_materials([
+        {"material_id": "m1", "content": "勾股定理：直角三角形两直角边的平方和等于斜边的平方。", "metadata": {"subject": "数学"}},
+        {"material_id": "m2", "content": "光合作用在叶绿体中进行。", "metadata": {"subject": "生物"}},
+    ])
+
+    results = rag_service.search_teaching_materials("直角三角形", k=2, mode="vector", subject="数学")
+
+    assert isinstance(rag_service.teaching_materials_collection, NumpyCollection)
+    assert [item["metadata"]["material_id"] for item in results] == ["m1"]
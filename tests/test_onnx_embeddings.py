@@ -0,0 +1,105 @@
+"""
+ONNX嵌入模型测试
+"""
+import json
+
+import numpy as np
+import pytest
+
+from src.core.config import settings
+from src.services.onnx_embeddings import pool_embeddings
+
+
+SAMPLE_TEXTS = [
+    "一元二次方程的求根公式是什么？",
+    "勾股定理：直角三角形两条直角边的平方和等于斜边的平方。",
+    "The mitochondria is the powerhouse of the cell.",
+    "How do I solve a system of linear equations by substitution?",
+]
+
+
+@pytest.fixture
+def hidden_state():
+    # 2条文本，3个token位置，第一条文本最后一个位置为填充
+    hidden = np.array([
+        [[1.0, 0.0], [3.0, 2.0], [100.0, 100.0]],
+        [[0.0, 1.0], [2.0, 3.0], [4.0, -1.0]],
+    ], dtype=np.float32)
+    mask = np.array([[1, 1, 0], [1, 1, 1]])
+    return hidden, mask
+
+
+def test_mean_pooling_ignores_padding(hidden_state):
+    hidden, mask = hidden_state
+    pooled = pool_embeddings(hidden, mask, {"pooling_mode_mean_tokens": True})
+    np.testing.assert_allclose(pooled, [[2.0, 1.0], [2.0, 1.0]])
+
+
+def test_cls_pooling_uses_first_token(hidden_state):
+    hidden, mask = hidden_state
+    pooled = pool_embeddings(hidden, mask, {"pooling_mode_cls_token": True, "pooling_mode_mean_tokens": False})
+    np.testing.assert_allclose(pooled, [[1.0, 0.0], [0.0, 1.0]])
+
+
+def test_combined_modes_concatenate_in_sentence_transformers_order(hidden_state):
+    hidden, mask = hidden_state
+    pooled = pool_embeddings(hidden, mask, {
+        "pooling_mode_mean_tokens": True,
+        "pooling_mode_max_tokens": True,
+        "pooling_mode_cls_token": True
+    })
+    np.testing.assert_allclose(pooled[0], [1.0, 0.0, 3.0, 2.0, 2.0, 1.0])
+
+
+def test_unsupported_pooling_mode_raises(hidden_state):
+    hidden, mask = hidden_state
+    with pytest.raises(ValueError):
+        pool_embeddings(hidden, mask, {"pooling_mode_lasttoken": True})
+
+
+def test_pooling_config_read_from_local_model_dir(tmp_path):
+    from src.services.onnx_embeddings import OnnxEmbeddings
+
+    (tmp_path / "1_Pooling").mkdir()
+    (tmp_path / "modules.json").write_text(json.dumps([
+        {"idx": 0, "name": "0", "path": "", "type": "sentence_transformers.models.Transformer"},
+        {"idx": 1, "name": "1", "path": "1_Pooling", "type": "sentence_transformers.models.Pooling"}
+    ]))
+    (tmp_path / "1_Pooling" / "config.json").write_text(json.dumps({"pooling_mode_cls_token": True}))
+
+    embeddings = object.__new__(OnnxEmbeddings)
+    embeddings.model_name = str(tmp_path)
+    assert embeddings._resolve_pooling_config() == {"pooling_mode_cls_token": True}
+
+    (tmp_path / "modules.json").unlink()
+    assert embeddings._resolve_pooling_config() == {"pooling_mode_mean_tokens": True}
+
+
+def test_onnx_matches_huggingface_embeddings(tmp_path):
+    """fp32 ONNX模型与HuggingFaceEmbeddings生成的向量一致（需要torch和本地可用的模型）"""
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("torch")
+    pytest.importorskip("sentence_transformers")
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    from src.services.onnx_embeddings import OnnxEmbeddings
+
+    try:
+        baseline = HuggingFaceEmbeddings(
+            model_name=settings.local_embeddings_model,
+            model_kwargs={'device': 'cpu'},
+            encode_kwargs={'normalize_embeddings': True}
+        )
+    except OSError as e:
+        pytest.skip(f"模型不可用: {e}")
+
+    backend = OnnxEmbeddings(
+        model_name=settings.local_embeddings_model,
+        cache_dir=str(tmp_path),
+        quantize=False,
+        max_length=settings.onnx_max_length
+    )
+    expected = np.asarray(baseline.embed_documents(SAMPLE_TEXTS))
+    actual = np.asarray(backend.embed_documents(SAMPLE_TEXTS))
+
+    cosine = np.sum(expected * actual, axis=1)
+    assert cosine.min() >= 0.999
@@ -0,0 +1,89 @@
+"""
+检索结果缓存测试
+"""
+from types import SimpleNamespace
+
+from src.services import query_cache as query_cache_module
+from src.services.query_cache import QueryResultCache
+
+
+RESULTS = [{"id": "c1", "content": "内容", "metadata": {"subject": "数学"}}]
+
+
+def test_key_normalizes_query_width_case_and_whitespace():
+    cache = QueryResultCache()
+    key = cache.make_key("teaching_materials", "ＡＢＣ  分数", {"subject": "数学"}, 5, mode="hybrid")
+
+    assert key == cache.make_key("teaching_materials", "abc 分数", {"subject": "数学"}, 5, mode="hybrid")
+    assert key != cache.make_key("teaching_materials", "abc 分数", {"subject": "数学"}, 5, mode="vector")
+    assert key != cache.make_key("teaching_materials", "abc 分数", None, 5, mode="hybrid")
+
+
+def test_hit_returns_a_copy():
+    cache = QueryResultCache()
+    key = cache.make_key("teaching_materials", "分数", None, 5)
+    cache.put("teaching_materials", key, RESULTS)
+
+    hit = cache.get("teaching_materials", key)
+    hit[0]["content"] = "被调用方修改"
+
+    assert cache.get("teaching_materials", key) == RESULTS
+    assert cache.stats()["hits"] == 2
+
+
+def test_generation_bump_invalidates_only_that_collection():
+    cache = QueryResultCache()
+    materials = cache.make_key("teaching_materials", "分数", None, 5)
+    plans = cache.make_key("learning_plans", "分数", None, 5)
+    cache.put("teaching_materials", materials, RESULTS)
+    cache.put("learning_plans", plans, RESULTS)
+
+    cache.bump_generation("teaching_materials")
+
+    assert cache.get("teaching_materials", materials) is None
+    assert cache.get("learning_plans", plans) == RESULTS
+    assert cache.stats()["invalidated"] == 1
+
+
+def test_result_computed_before_a_write_is_not_served():
+    cache = QueryResultCache()
+    key = cache.make_key("teaching_materials", "分数", None, 5)
+    generation = cache.current_generation("teaching_materials")
+    # 检索期间集合被写入
+    cache.bump_generation("teaching_materials")
+    cache.put("teaching_materials", key, RESULTS, generation=generation)
+
+    assert cache.get("teaching_materials", key) is None
+
+
+def test_ttl_and_lru(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(query_cache_module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    cache = QueryResultCache(max_entries=2, ttl_seconds=10)
+    keys = [cache.make_key("teaching_materials", query, None, 5) for query in ["一", "二", "三"]]
+    cache.put("teaching_materials", keys[0], RESULTS)
+    cache.put("teaching_materials", keys[1], RESULTS)
+    assert cache.get("teaching_materials", keys[0]) == RESULTS
+
+    cache.put("teaching_materials", keys[2], RESULTS)
+    assert cache.get("teaching_materials", keys[1]) is None
+
+    now[0] += 11
+    assert cache.get("teaching_materials", keys[0]) is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_rag_service_invalidates_on_ingestion(make_rag_service):
+    rag_service = make_rag_service(query_cache_enabled=True)
+    rag_service.store_teaching_materials([
+        {"material_id": "m1", "content": "勾股定理：直角三角形两直角边的平方和等于斜边的平方。", "metadata": {"subject": "数学"}}
+    ])
+
+    first = rag_service.search_teaching_materials("勾股定理", k=5, mode="vector")
+    assert rag_service.search_teaching_materials("勾股定理", k=5, mode="vector") == first
+    assert rag_service.query_cache.stats()["hits"] == 1
+
+    rag_service.store_teaching_material("m2", "勾股定理的证明方法有很多种。", {"subject": "数学"})
+    refreshed = rag_service.search_teaching_materials("勾股定理", k=5, mode="vector")
+
+    assert len(refreshed) == len(first) + 1
@@ -0,0 +1,83 @@
+"""
+RAG服务异步包装测试
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+
+def test_async_wrappers_run_on_rag_executor(make_rag_service):
+    rag_service = make_rag_service(rag_executor_workers=2)
+    calls = []
+
+    def search(query, k=5, **kwargs):
+        calls.append((threading.current_thread().name, query, k, kwargs))
+        return [{"id": query}]
+
+    rag_service.search_teaching_materials = search
+
+    async def run():
+        loop_thread = threading.current_thread().name
+        results = await rag_service.asearch_teaching_materials("勾股定理", k=2, subject="数学")
+        embedding = await rag_service.aembed_query("勾股定理")
+        return loop_thread, results, embedding
+
+    loop_thread, results, embedding = asyncio.run(run())
+
+    assert results == [{"id": "勾股定理"}]
+    thread_name, query, k, kwargs = calls[0]
+    assert thread_name.startswith("rag") and thread_name != loop_thread
+    assert (query, k, kwargs) == ("勾股定理", 2, {"subject": "数学"})
+    assert embedding == rag_service.embeddings.embed_query("勾股定理")
+
+
+def test_executor_limits_concurrency_and_keeps_loop_responsive(make_rag_service):
+    rag_service = make_rag_service(rag_executor_workers=2)
+    state = {"active": 0, "max": 0}
+    lock = threading.Lock()
+
+    def store(student_id, profile):
+        with lock:
+            state["active"] += 1
+            state["max"] = max(state["max"], state["active"])
+        time.sleep(0.05)
+        with lock:
+            state["active"] -= 1
+        return student_id
+
+    rag_service.store_student_profile = store
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        ticking = asyncio.create_task(ticker())
+        results = await asyncio.gather(*(rag_service.astore_student_profile(f"s{i}", {}) for i in range(6)))
+        ticking.cancel()
+        return results, ticks
+
+    results, ticks = asyncio.run(run())
+
+    assert results == [f"s{i}" for i in range(6)]
+    assert state["max"] == 2
+    # 同步调用阻塞期间事件循环仍在运行
+    assert ticks >= 10
+
+
+def test_async_wrapper_propagates_exceptions(make_rag_service):
+    rag_service = make_rag_service()
+
+    def broken(*args, **kwargs):
+        raise ValueError("向量库不可用")
+
+    rag_service.search_learning_plans = broken
+
+    with pytest.raises(ValueError, match="向量库不可用"):
+        asyncio.run(rag_service.asearch_learning_plans("计划"))
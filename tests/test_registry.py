@@ -0,0 +1,192 @@
+"""
+服务注册表测试
+"""
+import threading
+import time
+
+import pytest
+
+from src.core.config import settings
+
+
+@pytest.fixture
+def registry_module():
+    pytest.importorskip("chromadb")
+    pytest.importorskip("langchain")
+    from src.services import registry
+
+    return registry
+
+
+@pytest.fixture
+def registry(registry_module):
+    registry = registry_module.ServiceRegistry()
+    yield registry
+    registry.shutdown()
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.queries = []
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return [1.0]
+
+
+class FakeRAGService:
+    """可控制创建耗时的RAG服务替身"""
+    created = 0
+    release = None
+
+    def __init__(self):
+        if FakeRAGService.release is not None:
+            FakeRAGService.release.wait(5)
+        else:
+            time.sleep(0.05)
+        FakeRAGService.created += 1
+        self.embeddings = FakeEmbeddings()
+        self.closed = 0
+
+    def get_cache_stats(self):
+        return {}
+
+    def close(self):
+        self.closed += 1
+
+
+class FakeStats:
+    def stats(self):
+        return {}
+
+
+class FakeLLMService:
+    created = 0
+
+    def __init__(self):
+        FakeLLMService.created += 1
+        self.coalescer = FakeStats()
+        self.pool = FakeStats()
+
+
+@pytest.fixture
+def fake_services(registry_module, monkeypatch):
+    FakeRAGService.created = 0
+    FakeRAGService.release = None
+    FakeLLMService.created = 0
+    monkeypatch.setattr(registry_module, "RAGService", FakeRAGService)
+    monkeypatch.setattr(registry_module, "LLMService", FakeLLMService)
+    yield
+    if FakeRAGService.release is not None:
+        FakeRAGService.release.set()
+
+
+def test_concurrent_gets_construct_each_service_once(registry, fake_services):
+    results = []
+
+    def get():
+        results.append((registry.get_rag_service(), registry.get_llm_service()))
+
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert FakeRAGService.created == 1 and FakeLLMService.created == 1
+    assert len({id(rag) for rag, _ in results}) == 1
+    assert len({id(llm) for _, llm in results}) == 1
+
+
+def test_response_cache_only_when_enabled(registry, monkeypatch):
+    monkeypatch.setattr(settings, "teaching_cache_enabled", False)
+    assert registry.get_response_cache() is None
+
+    monkeypatch.setattr(settings, "teaching_cache_enabled", True)
+    assert registry.get_response_cache() is registry.get_response_cache()
+
+
+def test_warmup_loads_local_embeddings(registry, fake_services, monkeypatch):
+    monkeypatch.setattr(settings, "embeddings_provider", "local")
+
+    registry.warmup()
+
+    status = registry.get_metrics()["warmup"]
+    assert status["state"] == "done" and status["seconds"] is not None
+    assert registry.get_rag_service().embeddings.queries == ["warmup"]
+
+
+def test_warmup_skips_remote_embeddings(registry, fake_services, monkeypatch):
+    monkeypatch.setattr(settings, "embeddings_provider", "openai")
+
+    registry.warmup()
+
+    assert registry.get_rag_service().embeddings.queries == []
+
+
+def test_background_warmup_does_not_block(registry, fake_services, monkeypatch):
+    monkeypatch.setattr(settings, "embeddings_provider", "openai")
+    FakeRAGService.release = threading.Event()
+
+    started = time.perf_counter()
+    registry.start_background_warmup()
+    registry.start_background_warmup()
+
+    assert time.perf_counter() - started < 1
+    assert registry.get_metrics()["warmup"]["state"] == "running"
+
+    FakeRAGService.release.set()
+    registry._warmup_thread.join(5)
+    assert registry.get_metrics()["warmup"]["state"] == "done"
+    assert FakeRAGService.created == 1
+
+
+def test_warmup_failure_is_reported(registry, registry_module, monkeypatch):
+    def broken():
+        raise RuntimeError("向量库不可用")
+
+    monkeypatch.setattr(registry_module, "LLMService", FakeLLMService)
+    monkeypatch.setattr(registry_module, "RAGService", broken)
+
+    registry.start_background_warmup()
+    registry._warmup_thread.join(5)
+
+    assert registry.get_metrics()["warmup"] == {"state": "failed", "seconds": None, "error": "向量库不可用"}
+
+
+def test_shutdown_closes_services_and_allows_reinitialisation(registry, fake_services):
+    rag_service = registry.get_rag_service()
+    llm_service = registry.get_llm_service()
+    job_runner = registry.get_job_runner()
+
+    registry.shutdown()
+
+    assert rag_service.closed == 1
+    assert registry.get_metrics()["rag"] is None
+    assert registry.get_rag_service() is not rag_service
+    assert registry.get_llm_service() is not llm_service
+    assert registry.get_job_runner() is not job_runner
+    assert FakeRAGService.created == 2
+
+
+@pytest.mark.parametrize("background", [True, False])
+def test_startup_warmup_mode(registry_module, monkeypatch, background):
+    pytest.importorskip("fastapi")
+    from src import main
+
+    calls = []
+    monkeypatch.setattr(main, "ensure_directories", lambda: calls.append("directories"))
+    monkeypatch.setattr(main.Base.metadata, "create_all", lambda bind: calls.append("tables"))
+    monkeypatch.setattr(main.service_registry, "warmup", lambda: calls.append("warmup"))
+    monkeypatch.setattr(main.service_registry, "start_background_warmup", lambda: calls.append("background"))
+    monkeypatch.setattr(settings, "warmup_services_on_startup", True)
+    monkeypatch.setattr(settings, "warmup_in_background", background)
+
+    main.startup_services()
+
+    assert calls == ["directories", "tables", "background" if background else "warmup"]
+
+    calls.clear()
+    monkeypatch.setattr(settings, "warmup_services_on_startup", False)
+    main.startup_services()
+    assert calls == ["directories", "tables"]
@@ -0,0 +1,149 @@
+"""
+请求合并测试
+"""
+import asyncio
+
+import pytest
+
+from src.core.config import settings
+from src.services.request_coalescer import RequestCoalescer
+
+
+class Upstream:
+    def __init__(self, delay=0.05, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = False
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return "回答"
+
+
+def test_concurrent_requests_share_one_upstream_call():
+    coalescer = RequestCoalescer()
+    upstream = Upstream()
+
+    async def run():
+        return await asyncio.gather(*[coalescer.run("key", upstream) for _ in range(10)])
+
+    results = asyncio.run(run())
+
+    assert upstream.calls == 1
+    assert [result for result, _ in results] == ["回答"] * 10
+    assert sum(shared for _, shared in results) == 9
+    stats = coalescer.stats()
+    assert stats["upstream_calls"] == 1 and stats["coalesced"] == 9
+    assert stats["max_waiters"] == 10 and stats["inflight"] == 0
+
+
+def test_different_keys_and_sequential_requests_are_not_coalesced():
+    coalescer = RequestCoalescer()
+    upstream = Upstream(delay=0)
+
+    async def run():
+        await asyncio.gather(coalescer.run("a", upstream), coalescer.run("b", upstream))
+        await coalescer.run("a", upstream)
+
+    asyncio.run(run())
+
+    assert upstream.calls == 3
+    assert coalescer.stats()["coalesced"] == 0
+
+
+def test_error_is_delivered_to_every_waiter():
+    coalescer = RequestCoalescer()
+    upstream = Upstream(error=RuntimeError("上游失败"))
+
+    async def run():
+        return await asyncio.gather(*[coalescer.run("key", upstream) for _ in range(3)], return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert upstream.calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert coalescer.stats()["inflight"] == 0
+
+
+def test_cancelled_waiter_does_not_cancel_shared_call():
+    coalescer = RequestCoalescer()
+    upstream = Upstream()
+
+    async def run():
+        first = asyncio.ensure_future(coalescer.run("key", upstream))
+        second = asyncio.ensure_future(coalescer.run("key", upstream))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        result = await second
+        return first, result
+
+    first, result = asyncio.run(run())
+
+    assert first.cancelled()
+    assert result == ("回答", True)
+    assert not upstream.cancelled
+    assert upstream.calls == 1
+
+
+def test_all_waiters_cancelled_leaves_no_inflight_entry():
+    coalescer = RequestCoalescer()
+    upstream = Upstream(error=RuntimeError("上游失败"))
+
+    async def run():
+        waiter = asyncio.ensure_future(coalescer.run("key", upstream))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.sleep(0.1)
+        return waiter
+
+    waiter = asyncio.run(run())
+
+    assert waiter.cancelled()
+    assert coalescer.stats()["inflight"] == 0
+
+
+class FakeLLM:
+    model_name = "fake"
+    temperature = 0.7
+    max_tokens = 2000
+
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, input):
+        self.calls += 1
+        content = f"回答{self.calls}"
+        await asyncio.sleep(0.05)
+        return type("Response", (), {"content": content})()
+
+
+def test_get_response_coalesces_only_when_requested(monkeypatch):
+    pytest.importorskip("langchain_core")
+    from langchain_core.messages import SystemMessage
+    from src.services.llm_service import LLMService
+
+    llm = FakeLLM()
+    monkeypatch.setattr(LLMService, "_create_llm", staticmethod(lambda provider: llm))
+    monkeypatch.setattr(settings, "llm_provider", "claude")
+    monkeypatch.setattr(settings, "llm_fallback_providers", "")
+    service = LLMService()
+    messages = [SystemMessage(content="开场提示词")]
+
+    async def run(coalesce):
+        return await asyncio.gather(*[service.get_response(messages, coalesce=coalesce) for _ in range(3)])
+
+    independent = asyncio.run(run(False))
+    assert llm.calls == 3
+    assert len({content for content, _ in independent}) == 3
+
+    shared = asyncio.run(run(True))
+    assert llm.calls == 4
+    assert [usage.get("coalesced", False) for _, usage in shared].count(True) == 2
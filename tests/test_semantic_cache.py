@@ -0,0 +1,145 @@
+"""
+教学回答语义缓存测试
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import semantic_cache as semantic_cache_module
+from src.services.semantic_cache import SemanticResponseCache
+
+
+USAGE = {"total_tokens": 120, "total_cost": 0.01}
+
+
+def test_similar_question_in_same_bucket_hits():
+    cache = SemanticResponseCache(similarity_threshold=0.9)
+    key = cache.make_key("分数加法", "clarify", "五年级")
+    cache.put(key, [1.0, 0.0], "回答", USAGE, latency_ms=800)
+
+    hit = cache.get(key, [0.99, 0.05])
+
+    assert hit["response"] == "回答"
+    assert hit["saved_tokens"] == 120 and hit["saved_latency_ms"] == 800
+    assert cache.get(key, [0.0, 1.0]) is None
+    assert cache.get(cache.make_key("分数加法", "encourage", "五年级"), [1.0, 0.0]) is None
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2 and stats["saved_tokens"] == 120
+
+
+def test_key_normalizes_topic_and_level():
+    assert SemanticResponseCache.make_key(" 分数加法 ", "clarify", None) == SemanticResponseCache.make_key(
+        "分数加法", "clarify", ""
+    )
+
+
+def test_expired_entries_are_dropped(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache_module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    cache = SemanticResponseCache(ttl_seconds=10)
+    key = cache.make_key("分数加法", "clarify", "五年级")
+    cache.put(key, [1.0, 0.0], "回答", USAGE, latency_ms=1)
+
+    now[0] += 11
+
+    assert cache.get(key, [1.0, 0.0]) is None
+    assert cache.stats()["expired"] == 1 and cache.stats()["buckets"] == 0
+
+
+def test_lru_eviction():
+    cache = SemanticResponseCache(max_entries=2)
+    key = cache.make_key("分数加法", "clarify", "五年级")
+    cache.put(key, [1.0, 0.0, 0.0], "一", USAGE, latency_ms=1)
+    cache.put(key, [0.0, 1.0, 0.0], "二", USAGE, latency_ms=1)
+    assert cache.get(key, [1.0, 0.0, 0.0])["response"] == "一"
+
+    cache.put(key, [0.0, 0.0, 1.0], "三", USAGE, latency_ms=1)
+
+    assert cache.get(key, [0.0, 1.0, 0.0]) is None
+    assert cache.get(key, [1.0, 0.0, 0.0])["response"] == "一"
+    assert cache.stats()["evicted"] == 1
+
+
+@pytest.fixture
+def teaching_service():
+    pytest.importorskip("langchain_core")
+    pytest.importorskip("sqlalchemy")
+    from src.services.teaching_service import TeachingService
+
+    return TeachingService(db=None, llm_service=object(), rag_service=object(), response_cache=SemanticResponseCache())
+
+
+def make_turn(cache, student_name="王一"):
+    return {
+        "student_name": student_name,
+        "cache_key": cache.make_key("分数加法", "clarify", "五年级"),
+        "cache_embedding": [1.0, 0.0]
+    }
+
+
+def test_history_fingerprint():
+    history = [{"role": "user", "content": "什么是分数？"}, {"role": "assistant", "content": "分数表示整体的一部分。"}]
+
+    assert SemanticResponseCache.history_fingerprint([]) == ""
+    assert SemanticResponseCache.history_fingerprint(history) == SemanticResponseCache.history_fingerprint(
+        history + [{"role": "system", "content": "忽略"}]
+    )
+    assert SemanticResponseCache.history_fingerprint(history) != SemanticResponseCache.history_fingerprint(history[:1])
+    assert SemanticResponseCache.make_key("分数加法", "clarify", "五年级") != SemanticResponseCache.make_key(
+        "分数加法", "clarify", "五年级", SemanticResponseCache.history_fingerprint(history)
+    )
+
+
+def test_cached_response_is_not_served_to_a_different_history(teaching_service):
+    class Embeddings:
+        async def aembed_query(self, text):
+            return [1.0, 0.0]
+
+    teaching_service.rag_service = Embeddings()
+    cache = teaching_service.response_cache
+
+    def turn(history):
+        return {
+            "student_name": "王一",
+            "topic": "分数加法",
+            "strategy": "clarify",
+            "student_level": "五年级",
+            "cacheable": True,
+            "history": cache.history_fingerprint(history)
+        }
+
+    history = [{"role": "user", "content": "我叫王一"}, {"role": "assistant", "content": "你好！"}]
+    first = turn(history)
+    assert asyncio.run(teaching_service._lookup_cached_response(first, "为什么要通分？")) is None
+    teaching_service._store_cached_response(first, "通分后分母相同才能相加。", dict(USAGE), time.perf_counter())
+
+    assert asyncio.run(teaching_service._lookup_cached_response(turn([]), "为什么要通分？")) is None
+    hit = asyncio.run(teaching_service._lookup_cached_response(turn(list(history)), "为什么要通分？"))
+    assert hit["response"] == "通分后分母相同才能相加。"
+    assert hit["usage"]["cache"]["hit"] is True
+
+
+def test_cached_response_is_stored_verbatim(teaching_service):
+    cache = teaching_service.response_cache
+    turn = make_turn(cache)
+    # 回答不做姓名替换，包含姓名中单字的普通词语保持原样
+    response = "同学，我们一起来看一个例子：一加一等于二。"
+    usage = dict(USAGE)
+
+    teaching_service._store_cached_response(turn, response, usage, time.perf_counter())
+
+    assert usage["cache"] == {"hit": False}
+    assert cache.get(turn["cache_key"], [1.0, 0.0])["response"] == response
+
+
+def test_response_mentioning_student_name_is_not_cached(teaching_service):
+    cache = teaching_service.response_cache
+    turn = make_turn(cache)
+    usage = dict(USAGE)
+
+    teaching_service._store_cached_response(turn, "王一，你上次说的方法很好。", usage, time.perf_counter())
+
+    assert "cache" not in usage
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,151 @@
+"""
+分片集合测试
+"""
+import re
+
+import pytest
+
+from src.services.sharded_collection import ShardedCollection, _pinned_values, shard_suffix
+
+
+def test_shard_suffix_is_a_valid_collection_name():
+    for value in ["数学", "Math 101", "", "物理/化学"]:
+        assert re.fullmatch(r"[A-Za-z0-9_]+", shard_suffix(value))
+    assert shard_suffix("数学") != shard_suffix("物理")
+    assert shard_suffix("Math 101").startswith("Math_101_")
+    assert shard_suffix("") == "default"
+
+
+def test_pinned_values():
+    assert _pinned_values({"subject": "数学"}, "subject") == ["数学"]
+    assert _pinned_values({"subject": {"$eq": "数学"}}, "subject") == ["数学"]
+    assert _pinned_values({"$and": [{"type": "x"}, {"subject": {"$in": ["数学", "物理"]}}]}, "subject") == ["数学", "物理"]
+    assert _pinned_values({"$or": [{"subject": "数学"}, {"subject": "物理"}]}, "subject") is None
+    assert _pinned_values({"subject": {"$ne": "数学"}}, "subject") is None
+    assert _pinned_values(None, "subject") is None
+
+
+@pytest.fixture
+def make_sharded(tmp_path):
+    chromadb = pytest.importorskip("chromadb")
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    opened = []
+
+    def open_shard(collection_name, value):
+        opened.append(value)
+        return client.get_or_create_collection(collection_name, metadata={"shard_key": "subject", "shard_value": value})
+
+    def list_shards():
+        return {
+            collection.metadata["shard_value"]: collection.name
+            for collection in client.list_collections()
+            if collection.name.startswith("materials__")
+        }
+
+    collections = []
+
+    def make():
+        collection = ShardedCollection("materials", "subject", open_shard, list_shards, max_workers=2)
+        collections.append(collection)
+        return collection
+
+    make.opened = opened
+    yield make
+    for collection in collections:
+        collection.close()
+
+
+def write(collection, ids, subjects, embeddings):
+    collection.upsert(
+        ids=ids,
+        embeddings=embeddings,
+        documents=[f"文档{doc_id}" for doc_id in ids],
+        metadatas=[{"subject": subject, "doc": doc_id} for doc_id, subject in zip(ids, subjects)]
+    )
+
+
+def test_writes_are_routed_by_shard_key(make_sharded):
+    collection = make_sharded()
+    write(collection, ["a", "b", "c"], ["数学", "物理", "数学"], [[1, 0], [0, 1], [0.9, 0.1]])
+
+    assert collection.shard_counts() == {"数学": 2, "物理": 1}
+    assert collection.count() == 3
+    assert sorted(collection.get()["ids"]) == ["a", "b", "c"]
+
+    # 重新打开时按集合元数据找回已有分片
+    reopened = make_sharded()
+    assert reopened.shard_counts() == {"数学": 2, "物理": 1}
+
+
+def test_chunk_moving_shard_is_removed_from_old_shard(make_sharded):
+    collection = make_sharded()
+    write(collection, ["a", "b"], ["数学", "数学"], [[1, 0], [0, 1]])
+
+    write(collection, ["a"], ["物理"], [[1, 0]])
+
+    assert collection.shard_counts() == {"数学": 1, "物理": 1}
+    stored = collection.get(ids=["a"])
+    assert stored["ids"] == ["a"]
+    assert stored["metadatas"][0]["subject"] == "物理"
+    assert collection.query(query_embeddings=[[1, 0]], n_results=5)["ids"][0].count("a") == 1
+
+
+def test_query_merges_shards_by_distance(make_sharded):
+    collection = make_sharded()
+    write(collection, ["a", "b", "c"], ["数学", "物理", "化学"], [[1, 0], [0.8, 0.6], [0, 1]])
+
+    results = collection.query(query_embeddings=[[1, 0], [0, 1]], n_results=2, include=["distances", "metadatas"])
+
+    assert results["ids"] == [["a", "b"], ["c", "b"]]
+    assert results["distances"][0] == sorted(results["distances"][0])
+    assert results["documents"] is None
+
+    pinned = collection.query(query_embeddings=[[1, 0]], n_results=2, where={"subject": "物理"})
+    assert pinned["ids"] == [["b"]]
+
+
+def test_paged_get_spans_shards(make_sharded):
+    collection = make_sharded()
+    write(collection, ["a", "b", "c", "d", "e"], ["数学", "数学", "物理", "物理", "物理"], [[1, 0]] * 5)
+
+    pages = [collection.get(limit=2, offset=offset)["ids"] for offset in range(0, 6, 2)]
+
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert sorted(sum(pages, [])) == ["a", "b", "c", "d", "e"]
+
+
+def test_delete_by_where(make_sharded):
+    collection = make_sharded()
+    write(collection, ["a", "b", "c"], ["数学", "物理", "数学"], [[1, 0], [0, 1], [0.9, 0.1]])
+
+    collection.delete(where={"doc": "a"})
+    collection.delete(ids=["b"])
+
+    assert collection.get()["ids"] == ["c"]
+
+
+def test_rag_service_moves_chunks_when_subject_changes(make_rag_service):
+    rag_service = make_rag_service(teaching_shard_key="subject")
+    content = "勾股定理：直角三角形两直角边的平方和等于斜边的平方。"
+    rag_service.store_teaching_material("m1", content, {"subject": "数学"})
+
+    result = rag_service.store_teaching_material("m1", content, {"subject": "物理"})
+
+    assert result["embedded"] == 0
+    assert rag_service.teaching_materials_collection.shard_counts() == {"数学": 0, "物理": 1}
+    assert rag_service.search_teaching_materials("勾股定理", subject="数学", mode="vector") == []
+    assert len(rag_service.search_teaching_materials("勾股定理", subject="物理", mode="vector")) == 1
+
+
+def test_reshard_existing_collection(make_rag_service):
+    unsharded = make_rag_service()
+    unsharded.store_teaching_materials([
+        {"material_id": "m1", "content": "勾股定理。", "metadata": {"subject": "数学"}},
+        {"material_id": "m2", "content": "光合作用。", "metadata": {"subject": "生物"}},
+    ])
+    unsharded.close()
+
+    sharded = make_rag_service(teaching_shard_key="subject")
+    assert sharded.reshard_teaching_materials() == 2
+    assert sharded.teaching_materials_collection.shard_counts() == {"数学": 1, "生物": 1}
+    assert sharded.reshard_teaching_materials() == 0
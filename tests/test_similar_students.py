@@ -0,0 +1,50 @@
+"""
+相似学生批量查找测试
+"""
+PROFILES = {
+    "s1": {"name": "张三", "grade": "初二", "learning_style": "视觉型", "interests": ["几何", "数学竞赛"], "learning_goals": "提高几何证明能力"},
+    "s2": {"name": "李四", "grade": "初二", "learning_style": "视觉型", "interests": ["几何", "数学竞赛"], "learning_goals": "提高几何证明能力和解题速度"},
+    "s3": {"name": "王五", "grade": "高一", "learning_style": "听觉型", "interests": ["英语", "阅读"], "learning_goals": "扩大英语词汇量"},
+    "s4": {"name": "赵六", "grade": "高一", "learning_style": "听觉型", "interests": ["英语", "阅读", "写作"], "learning_goals": "扩大英语词汇量"},
+}
+
+
+class NoEmbeddings:
+    """批量查找应直接使用已存储的向量，调用嵌入模型即失败"""
+
+    def embed_query(self, text):
+        raise AssertionError("不应重新生成嵌入")
+
+    def embed_documents(self, texts):
+        raise AssertionError("不应重新生成嵌入")
+
+
+def test_batch_reuses_stored_embeddings_and_excludes_self(rag_service):
+    for student_id, profile in PROFILES.items():
+        rag_service.store_student_profile(student_id, profile)
+    rag_service.embeddings = NoEmbeddings()
+
+    results = rag_service.find_similar_students_batch(["s1", "s3", "missing", "s1"], k=2)
+
+    assert set(results) == {"s1", "s3"}
+    for student_id, similar in results.items():
+        ids = [item["id"] for item in similar]
+        assert student_id not in ids
+        assert len(ids) == 2
+    assert results["s1"][0]["id"] == "s2"
+    assert results["s3"][0]["id"] == "s4"
+    assert results["s1"][0]["metadata"]["name"] == "李四"
+
+
+def test_single_lookup_matches_batch(rag_service):
+    for student_id, profile in PROFILES.items():
+        rag_service.store_student_profile(student_id, profile)
+    rag_service.embeddings = NoEmbeddings()
+
+    similar = rag_service.find_similar_students("s2", k=3)
+
+    assert similar == rag_service.find_similar_students_batch(["s2"], k=3)["s2"]
+    assert similar[0]["id"] == "s1"
+    assert sorted(item["id"] for item in similar) == ["s1", "s3", "s4"]
+    assert rag_service.find_similar_students("missing") == []
+    assert rag_service.find_similar_students_batch([]) == {}
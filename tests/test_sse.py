@@ -0,0 +1,194 @@
+"""
+SSE流式接口测试
+"""
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+pytest.importorskip("chromadb")
+pytest.importorskip("langchain")
+
+import httpx  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from src.api.v1 import conversations as conversations_module  # noqa: E402
+from src.api.v1 import teaching as teaching_module  # noqa: E402
+from src.api.v1.sse import format_sse, open_event_stream  # noqa: E402
+from src.core.database import Base  # noqa: E402
+from src.main import app  # noqa: E402
+from src.models import Conversation, Message, Student  # noqa: E402
+from src.models.conversation import MessageRole  # noqa: E402
+from src.services import registry as registry_module  # noqa: E402
+
+
+class FakeLLMService:
+    """按预设片段流式输出，可在输出若干片段后抛出异常"""
+
+    def __init__(self, tokens, fail_after=None):
+        self.tokens = tokens
+        self.fail_after = fail_after
+
+    def count_tokens(self, text):
+        return len(text)
+
+    def create_conversation_continuation_prompt(self, history, student_info, turn_count):
+        return "继续了解学生的学习情况。", False
+
+    async def stream_response(self, messages, route=None):
+        if route is not None:
+            route["provider"] = "fake"
+        for i, token in enumerate(self.tokens):
+            if i == self.fail_after:
+                raise RuntimeError("上游连接中断")
+            await asyncio.sleep(0)
+            yield token
+
+    def estimate_usage(self, messages, response, provider=None):
+        return {"total_tokens": len(response), "provider": provider}
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(conversations_module, "SessionLocal", factory)
+    monkeypatch.setattr(teaching_module, "SessionLocal", factory)
+    yield factory
+    engine.dispose()
+
+
+@pytest.fixture
+def conversation_id(session_factory):
+    db = session_factory()
+    student = Student(name="王一", grade="初二")
+    db.add(student)
+    db.flush()
+    conversation = Conversation(student_id=student.id)
+    db.add(conversation)
+    db.commit()
+    conversation_id = conversation.id
+    db.close()
+    return conversation_id
+
+
+@pytest.fixture
+def use_llm():
+    def use(llm_service):
+        app.dependency_overrides[registry_module.get_llm_service] = lambda: llm_service
+        app.dependency_overrides[registry_module.get_rag_service] = lambda: object()
+    yield use
+    app.dependency_overrides.clear()
+
+
+def post(path, body):
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(path, json=body)
+    return asyncio.run(run())
+
+
+def parse_events(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def saved_messages(session_factory, conversation_id):
+    db = session_factory()
+    try:
+        return [
+            (message.role, message.content)
+            for message in db.query(Message).filter(
+                Message.conversation_id == conversation_id
+            ).order_by(Message.created_at).all()
+        ]
+    finally:
+        db.close()
+
+
+def test_format_sse():
+    assert format_sse("token", {"content": "你好"}) == 'event: token\ndata: {"content": "你好"}\n\n'
+
+
+def test_error_before_first_event_returns_http_error(session_factory, use_llm):
+    use_llm(FakeLLMService(["你好"]))
+
+    response = post("/api/v1/conversations/missing/continue/stream", {"message": "你好"})
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Conversation missing not found"
+    assert response.headers["content-type"].startswith("application/json")
+
+
+def test_teaching_stream_error_before_first_event_returns_http_error(session_factory, use_llm):
+    use_llm(FakeLLMService(["你好"]))
+
+    response = post("/api/v1/teaching/continue/stream", {
+        "session_id": "teach_missing_分数加法",
+        "student_response": "我不懂",
+        "conversation_history": []
+    })
+
+    assert response.status_code == 404
+    assert "missing" in response.json()["detail"]
+
+
+def test_done_event_persists_assistant_message(session_factory, conversation_id, use_llm):
+    use_llm(FakeLLMService(["我们", "先来", "看看分数。"]))
+
+    response = post(f"/api/v1/conversations/{conversation_id}/continue/stream", {"message": "我想学分数"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_events(response.text)
+    assert [event for event, _ in events] == ["start", "token", "token", "token", "done"]
+    assert events[-1][1]["response"] == "我们先来看看分数。"
+    assert saved_messages(session_factory, conversation_id) == [
+        (MessageRole.USER, "我想学分数"),
+        (MessageRole.ASSISTANT, "我们先来看看分数。")
+    ]
+
+
+def test_error_mid_stream_is_sent_as_event_and_nothing_is_saved(session_factory, conversation_id, use_llm):
+    use_llm(FakeLLMService(["我们", "先来"], fail_after=1))
+
+    response = post(f"/api/v1/conversations/{conversation_id}/continue/stream", {"message": "我想学分数"})
+
+    events = parse_events(response.text)
+    assert [event for event, _ in events] == ["start", "token", "error"]
+    assert events[-1][1] == {"detail": "上游连接中断"}
+    assert saved_messages(session_factory, conversation_id) == []
+
+
+def test_client_disconnect_leaves_no_half_written_message(session_factory, conversation_id, monkeypatch):
+    from src.services.conversation_service import ConversationService
+
+    closed = []
+    db = session_factory()
+    monkeypatch.setattr(db, "close", lambda close=db.close: (closed.append(True), close()))
+    service = ConversationService(db, llm_service=FakeLLMService(["我们", "先来", "看看分数。"]), rag_service=object())
+
+    async def run():
+        response = await open_event_stream(
+            service.stream_continue_conversation(conversation_id, "我想学分数"),
+            on_close=db.close
+        )
+        body = response.body_iterator
+        received = [await body.__anext__(), await body.__anext__()]
+        # 客户端在收到第一个文本片段后断开
+        await body.aclose()
+        return received
+
+    received = asyncio.run(run())
+
+    assert received[0].startswith("event: start") and received[1].startswith("event: token")
+    assert closed == [True]
+    assert saved_messages(session_factory, conversation_id) == []
@@ -0,0 +1,61 @@
+"""
+启动脚本与应用导入开销测试
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from start import parse_importtime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       412 |        412 |   _io
+import time:        95 |         95 |     _abc
+import time:       820 |       1327 |   abc
+import time:      1203 |       2942 | src.core.config
+Traceback (most recent call last):
+ModuleNotFoundError: No module named 'x'
+import time:        18 |         18 |         pydantic.version
+"""
+
+
+def test_parse_importtime():
+    assert parse_importtime(SAMPLE_IMPORTTIME) == [
+        ("_io", 412, 412, 1),
+        ("_abc", 95, 95, 2),
+        ("abc", 820, 1327, 1),
+        ("src.core.config", 1203, 2942, 0),
+        ("pydantic.version", 18, 18, 4),
+    ]
+    assert parse_importtime("") == []
+
+
+def test_importing_app_has_no_side_effects(tmp_path):
+    pytest.importorskip("fastapi")
+    pytest.importorskip("langchain")
+
+    # 在空目录中用全新解释器导入，检查新建的文件和已加载的重型依赖
+    script = (
+        "import json, os, sys\n"
+        "import src.main\n"
+        "heavy = ['chromadb', 'sentence_transformers', 'openai']\n"
+        "print(json.dumps({'files': os.listdir('.'), 'loaded': [m for m in heavy if m in sys.modules]}))\n"
+    )
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=str(tmp_path),
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120
+    )
+
+    assert result.returncode == 0, result.stderr
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    assert report == {"files": [], "loaded": []}
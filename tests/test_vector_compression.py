@@ -0,0 +1,126 @@
+"""
+紧凑向量存储测试
+"""
+import math
+
+import numpy as np
+import pytest
+
+from src.services.vector_compression import (
+    CompactCollection,
+    QuantizedVectorStore,
+    dequantize,
+    quantize,
+    truncate_embedding,
+)
+
+
+def normalized(*values):
+    norm = math.sqrt(sum(v * v for v in values))
+    return [v / norm for v in values]
+
+
+def test_truncate_renormalizes():
+    assert truncate_embedding([3.0, 4.0, 12.0], 2) == pytest.approx([0.6, 0.8])
+
+
+@pytest.mark.parametrize("method, tolerance", [("float16", 1e-3), ("int8", 1e-2)])
+def test_quantize_roundtrip(method, tolerance):
+    vector = np.random.default_rng(0).normal(size=64).astype(np.float32)
+    vector /= np.linalg.norm(vector)
+
+    data, scale = quantize(vector, method)
+    restored = dequantize(data, scale, method)
+
+    assert len(data) == 64 * (2 if method == "float16" else 1)
+    assert np.max(np.abs(restored - vector)) < tolerance
+
+
+def test_unknown_quantization_is_rejected():
+    with pytest.raises(ValueError):
+        quantize([1.0], "int4")
+
+
+def test_quantized_store(tmp_path):
+    store = QuantizedVectorStore(str(tmp_path / "vectors.db"), "int8")
+    store.put("a", ["v1", "v2"], [[1.0, 0.0], [0.0, 1.0]])
+    store.put("b", ["v1"], [[0.5, 0.5]])
+
+    vectors = store.get("a", ["v1", "v2", "missing"])
+    assert set(vectors) == {"v1", "v2"}
+    assert vectors["v1"] == pytest.approx([1.0, 0.0], abs=1e-2)
+
+    store.delete("a", ["v1"])
+    assert set(store.get("a", ["v1", "v2"])) == {"v2"}
+    store.delete("a")
+    assert store.get("a", ["v2"]) == {}
+    assert set(store.get("b", ["v1"])) == {"v1"}
+    store.close()
+
+
+@pytest.fixture
+def compact(tmp_path):
+    chromadb = pytest.importorskip("chromadb")
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    store = QuantizedVectorStore(str(tmp_path / "vectors.db"), "float16")
+
+    def make(rescore_multiplier):
+        collection = client.get_or_create_collection(f"compact_{rescore_multiplier}")
+        return CompactCollection(collection, store, dimensions=2, rescore_multiplier=rescore_multiplier)
+
+    yield make
+    store.close()
+
+
+def add_candidates(collection):
+    # 截断到前两维时a与查询完全相同，全维度下b更接近查询
+    collection.add(
+        ids=["a", "b"],
+        embeddings=[normalized(1, 0, 0, 1), normalized(0.8, 0.6, 0, 0)],
+        documents=["A", "B"],
+        metadatas=[{"subject": "数学"}, {"subject": "数学"}]
+    )
+
+
+def test_rescoring_uses_full_dimension_vectors(compact):
+    query = [normalized(1, 0, 1, 0)]
+
+    coarse = compact(rescore_multiplier=1)
+    add_candidates(coarse)
+    assert coarse.query(query_embeddings=query, n_results=1)["ids"] == [["a"]]
+
+    rescored = compact(rescore_multiplier=2)
+    add_candidates(rescored)
+    results = rescored.query(query_embeddings=query, n_results=1, include=["documents", "distances"])
+
+    assert results["ids"] == [["b"]]
+    assert results["documents"] == [["B"]]
+    full_distance = float(np.sum((np.array(normalized(0.8, 0.6, 0, 0)) - np.array(query[0])) ** 2))
+    assert results["distances"][0][0] == pytest.approx(full_distance, abs=1e-3)
+    assert results["metadatas"] is None and results["embeddings"] is None
+
+
+def test_get_returns_full_dimension_embeddings_and_delete_cleans_store(compact):
+    collection = compact(rescore_multiplier=2)
+    add_candidates(collection)
+
+    stored = collection.get(ids=["b"], include=["embeddings", "documents"])
+    assert stored["embeddings"][0] == pytest.approx(normalized(0.8, 0.6, 0, 0), abs=1e-3)
+    assert len(collection.collection.get(ids=["b"], include=["embeddings"])["embeddings"][0]) == 2
+
+    collection.delete(where={"subject": "数学"})
+    assert collection.count() == 0
+    assert collection.store.get(collection.name, ["a", "b"]) == {}
+
+
+def test_rag_service_in_compact_mode(make_rag_service):
+    rag_service = make_rag_service(vector_compact_mode=True, vector_compact_dimensions=8, vector_quantization="int8")
+    rag_service.store_teaching_materials([
+        {"material_id": "m1", "content": "勾股定理：直角三角形两直角边的平方和等于斜边的平方。", "metadata": {"subject": "数学"}},
+        {"material_id": "m2", "content": "光合作用在叶绿体中进行。", "metadata": {"subject": "生物"}},
+    ])
+
+    results = rag_service.search_teaching_materials("直角三角形的平方和", k=1, mode="vector")
+
+    assert isinstance(rag_service.teaching_materials_collection, CompactCollection)
+    assert results[0]["metadata"]["material_id"] == "m1"
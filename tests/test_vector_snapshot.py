@@ -0,0 +1,106 @@
+"""
+向量集合快照测试
+"""
+import numpy as np
+import pytest
+
+from src.core.config import settings
+from src.services.vector_snapshot import SnapshotWriter, iter_snapshot, read_manifest, write_manifest
+
+
+MATERIALS = [
+    {"material_id": "m1", "content": "分数的加法：同分母分数相加，分母不变，分子相加。", "metadata": {"subject": "数学"}},
+    {"material_id": "m2", "content": "光合作用是植物利用光能把二氧化碳和水转化为有机物的过程。", "metadata": {"subject": "生物"}},
+]
+
+
+def test_snapshot_roundtrip_in_batches(tmp_path):
+    directory = str(tmp_path / "snapshot")
+    writer = SnapshotWriter(directory, "items", count=5, dimensions=3, dtype="float16")
+    writer.append(["a", "b", "c"], [[1, 0, 0], [0, 1, 0], [0, 0, 1]], ["A", "B", "C"], [{"i": 0}, {"i": 1}, {"i": 2}])
+    writer.append(["d", "e"], [[0.5, 0.5, 0], [0, 0.5, 0.5]], ["D", "E"], [{"i": 3}, {"i": 4}])
+    assert writer.close() == 5
+    write_manifest(directory, {"embedding_model": "test", "collections": {"items": {"count": 5}}})
+
+    batches = list(iter_snapshot(directory, "items", batch_size=2))
+
+    assert [len(ids) for ids, _, _, _ in batches] == [2, 2, 1]
+    assert [doc for _, _, documents, _ in batches for doc in documents] == ["A", "B", "C", "D", "E"]
+    assert np.allclose(batches[2][1], [[0, 0.5, 0.5]])
+    assert read_manifest(directory)["collections"]["items"]["count"] == 5
+
+
+def test_writer_rejects_more_records_than_announced(tmp_path):
+    writer = SnapshotWriter(str(tmp_path), "items", count=1, dimensions=2)
+    with pytest.raises(ValueError):
+        writer.append(["a", "b"], [[1, 0], [0, 1]], ["A", "B"], [{}, {}])
+
+
+def test_incomplete_snapshot_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        read_manifest(str(tmp_path))
+
+
+def test_export_and_replace_import(rag_service, tmp_path):
+    directory = str(tmp_path / "snapshot")
+    rag_service.store_teaching_materials(MATERIALS)
+    total = rag_service.teaching_materials_collection.count()
+
+    counts = rag_service.export_snapshot(directory, collections=["teaching_materials"])
+    rag_service.store_teaching_material("m3", "额外的材料内容。", {"subject": "语文"})
+    embedded = rag_service.embeddings.embedded
+    imported = rag_service.import_snapshot(directory)
+
+    assert counts == imported == {"teaching_materials": total}
+    assert rag_service.teaching_materials_collection.count() == total
+    assert rag_service.embeddings.embedded == embedded
+    results = rag_service.search_teaching_materials("同分母分数相加", k=1)
+    assert results[0]["metadata"]["material_id"] == "m1"
+
+
+def test_replace_import_aborts_when_collection_cannot_be_cleared(rag_service, tmp_path, monkeypatch):
+    directory = str(tmp_path / "snapshot")
+    rag_service.store_teaching_materials(MATERIALS)
+    rag_service.export_snapshot(directory, collections=["teaching_materials"])
+
+    def fail(collection_name):
+        raise RuntimeError("删除失败")
+
+    monkeypatch.setattr(rag_service, "_delete_collection", fail)
+    with pytest.raises(RuntimeError, match="删除失败"):
+        rag_service.import_snapshot(directory)
+
+    monkeypatch.setattr(rag_service, "_reset_collection", lambda collection_name: None)
+    with pytest.raises(RuntimeError, match="中止导入"):
+        rag_service.import_snapshot(directory)
+
+
+def test_merge_import_invalidates_material_manifests(rag_service, tmp_path):
+    directory = str(tmp_path / "snapshot")
+    rag_service.store_teaching_materials(MATERIALS)
+    rag_service.export_snapshot(directory, collections=["teaching_materials"])
+    rag_service.store_teaching_material("m1", "分数的乘法：分子乘分子，分母乘分母。", {"subject": "数学"})
+    rag_service.store_teaching_material("m3", "额外的材料内容。", {"subject": "语文"})
+
+    rag_service.import_snapshot(directory, replace=False)
+
+    assert rag_service.material_manifests.get("m1") is None
+    assert rag_service.material_manifests.get("m2") is None
+    assert rag_service.material_manifests.get("m3") is not None
+    # 清单按集合中实际的文本块重建
+    rebuilt = rag_service._load_material_manifest("m1")
+    stored = rag_service.teaching_materials_collection.get(where={"material_id": "m1"}, include=["documents"])
+    assert len(rebuilt["chunk_hashes"]) >= 1
+    assert "分数的加法：同分母分数相加，分母不变，分子相加。" in stored["documents"]
+
+
+def test_import_rejects_other_embedding_model(rag_service, tmp_path, monkeypatch):
+    directory = str(tmp_path / "snapshot")
+    rag_service.store_teaching_materials(MATERIALS)
+    rag_service.export_snapshot(directory, collections=["teaching_materials"])
+
+    monkeypatch.setattr(settings, "embeddings_provider", "local")
+    monkeypatch.setattr(settings, "local_embeddings_model", "another-model")
+    with pytest.raises(ValueError):
+        rag_service.import_snapshot(directory)
+    assert rag_service.import_snapshot(directory, force=True)["teaching_materials"] > 0